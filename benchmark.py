@@ -0,0 +1,455 @@
+#!/usr/bin/env python3
+"""
+Pytuino benchmarks
+
+Measures the board engine, renderer and font headless, drawing to an ANSI
+interface that writes to a byte counter rather than a terminal.
+
+Microbenchmarks time single operations (tetromino position checks, moves,
+rotations, removing rows from dense boards, tetromino construction, font
+rendering, and drawing a full frame at each block size iface_check picks).
+The gravity timers of many games are timed both polled (each board checked
+every tick) and held in a TimerWheel.
+Macrobenchmarks play whole games (games per second headless, and frames per
+second/bytes per frame when rendered).
+
+Results can be written as JSON, and compared against a previous run (the
+baseline), in which case any metric worse than the tolerance is reported as a
+regression and the exit status is 1. Baselines are specific to the machine
+they were made on, so make one before changing anything:
+    python3 benchmark.py -o baseline.json
+    python3 benchmark.py -b baseline.json
+"""
+
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+
+from board_bitboard import TetrisBitBoard
+from board_tetris import TetrisBoard, Tetromino, TetrominoComposite
+from font import Font
+from game_clock import ManualClock
+from iface_ansi import PytuinoIface
+from iface_shadow import PytuinoIfaceShadow
+from sim_tetris import TetrisSim
+from timer_wheel import TimerWheel
+
+# Results file format version
+VERSION = 1
+
+# Metrics where smaller is better (any other metric is a rate, where bigger is better)
+LOWER_IS_BETTER = ('bytes_per_frame',)
+
+# Numbers of games for the gravity timer benchmarks
+TIMER_SESSIONS = (100, 1000, 10000)
+
+# Fewest bytes a frame of render_game can average (each moves the tetromino, so cursor moves and several box characters)
+RENDER_GAME_MIN_FRAME_BYTES = 32
+
+# Screen sizes (columns, rows) giving each block size (width, height) iface_check can choose for a 10x20 board
+SCREEN_SIZES = ((20, 24), (30, 24), (80, 24), (80, 50))
+
+###############################################################################
+class ByteCounter:
+###############################################################################
+    """
+    Output stream which counts the bytes written to it, and discards them
+    """
+
+    def __init__(self):
+        """ Initialise the count """
+        self.count = 0
+
+    def write(self, data):
+        """ Count the data written """
+        self.count += len(data)
+        return len(data)
+
+    def flush(self):
+        """ Nothing to flush """
+        pass
+
+def create_iface(columns, rows, shadow=False):
+    """
+    Create an ANSI interface of the given size, writing to a ByteCounter (returns the interface and it's counter)
+
+        shadow
+            Wrap the interface with PytuinoIfaceShadow
+    """
+    counter = ByteCounter()
+    # Keys are never read, so the interface has no input
+    iface = PytuinoIface(output=counter, input=-1, columns=columns, rows=rows)
+    if shadow:
+        iface = PytuinoIfaceShadow(iface)
+    return iface, counter
+
+def create_board(board_class, seed=0, fill_rows=10):
+    """
+    Create a board with the lower rows randomly filled (with a gap in each row), and a tetromino in play
+    """
+    board = board_class(clock=ManualClock(), seed=seed)
+    rnd = random.Random(seed)
+    for row_index in range(0, fill_rows):
+        row = board._board[row_index]
+        for column_index in range(0, board._columns):
+            row[column_index] = rnd.randrange(0, board._max_colours)
+        row[rnd.randrange(0, board._columns)] = 0
+    board._update_fill_()
+    board.get_next_tetromino()
+    board.tetromino_start()
+    return board
+
+def measure(operation, ops=1, setup=None, min_time=0.2, repeat=5):
+    """
+    Time an operation, returning the best rate (operations per second) of a number of runs
+
+        operation
+            Function to time
+        ops
+            Number of operations each call of the function makes
+        setup
+            Function called (untimed) before each call of operation
+        min_time
+            Minimum time of each run (in seconds)
+        repeat
+            Number of runs
+    """
+    best = None
+    for repeat_index in range(0, repeat):
+        calls = 0
+        elapsed = 0
+        if setup is None:
+            # Time batches of calls, doubling the size until the run is long enough
+            number = 1
+            while elapsed < min_time:
+                start = time.perf_counter()
+                for call_index in range(0, number):
+                    operation()
+                elapsed += time.perf_counter() - start
+                calls += number
+                number *= 2
+        else:
+            while elapsed < min_time:
+                setup()
+                start = time.perf_counter()
+                operation()
+                elapsed += time.perf_counter() - start
+                calls += 1
+        rate = (calls * ops) / elapsed
+        if best is None or rate > best:
+            best = rate
+    return best
+
+# Microbenchmarks
+###############################################################################
+def bench_check_tetromino_position(board_class, min_time):
+    """ Check every rotation of every tetromino at every column, over the filled part of the board """
+    board = create_board(board_class)
+    checks = []
+    for type in range(1, 8):
+        tetromino = Tetromino(type)
+        for tetromino_state in Tetromino.get_composite(type)._pieces:
+            for position_x in range(-1, board._columns):
+                for position_y in range(0, 12):
+                    checks.append((tetromino, tetromino_state, position_x, position_y))
+    def operation():
+        for check in checks:
+            board.check_tetromino_position(*check)
+    return { 'ops_per_sec': measure(operation, len(checks), min_time=min_time) }
+
+def bench_tetromino_move(board_class, min_time):
+    """ Move the current tetromino left and right """
+    board = create_board(board_class)
+    def operation():
+        board.tetromino_move(Tetromino.DIR_LEFT)
+        board.tetromino_move(Tetromino.DIR_RIGHT)
+    return { 'ops_per_sec': measure(operation, 2, min_time=min_time) }
+
+def bench_tetromino_rotate(board_class, min_time):
+    """ Rotate the current tetromino all the way round """
+    board = create_board(board_class)
+    def operation():
+        for rotation in range(0, 4):
+            board.tetromino_rotate(Tetromino.DIR_CLOCKWISE)
+    return { 'ops_per_sec': measure(operation, 4, min_time=min_time) }
+
+def bench_remove_completed_rows(board_class, min_time):
+    """ Remove the completed rows from a dense board (every other row of the lower 16 complete) """
+    board = create_board(board_class, fill_rows=0)
+    rnd = random.Random(0)
+    template = []
+    for row_index in range(0, 16):
+        row = [rnd.randrange(1, board._max_colours) for column_index in range(0, board._columns)]
+        if row_index % 2:
+            row[rnd.randrange(0, board._columns)] = 0
+        template.append(row)
+    def setup():
+        for row, template_row in zip(board._board, template):
+            row[:] = template_row
+        board._update_fill_()
+    def operation():
+        board.remove_completed_rows()
+    return { 'ops_per_sec': measure(operation, setup=setup, min_time=min_time) }
+
+def bench_tetromino_composite(min_time):
+    """ Create each of the tetrominos (with all their rotations) """
+    creators = (TetrominoComposite.createI, TetrominoComposite.createJ, TetrominoComposite.createL, TetrominoComposite.createO, TetrominoComposite.createS, TetrominoComposite.createT, TetrominoComposite.createZ)
+    def operation():
+        for creator in creators:
+            creator()
+    return { 'ops_per_sec': measure(operation, len(creators), min_time=min_time) }
+
+def bench_render_string(cached, min_time):
+    """ Render score strings with the box character font (through the cache, or rendering every time) """
+    strings = [f"{score:>8}" for score in range(0, 1000, 10)]
+    render_string = Font.render_string if cached else Font.render_string.__wrapped__
+    if cached:
+        # The score is the same from frame to frame
+        strings = strings[0:1]
+    def operation():
+        for string in strings:
+            render_string(string)
+    return { 'ops_per_sec': measure(operation, len(strings), min_time=min_time) }
+
+def bench_draw_board(columns, rows, min_time):
+    """ Draw a full frame (as after the screen has changed size) """
+    board = create_board(TetrisBoard)
+    board.update_score(4)
+    iface, counter = create_iface(columns, rows)
+    if not board.iface_check(iface):
+        raise Exception(f"Benchmark: screen too small: {columns}x{rows}")
+    def operation():
+        board._renderer_layout = True
+        board.draw_board(iface)
+        iface.redraw()
+    count = counter.count
+    operation()
+    bytes_per_frame = counter.count - count
+    return {
+        'block_size': f"{board._renderer_tetromino_block_width}x{board._renderer_tetromino_block_height}",
+        'ops_per_sec': measure(operation, min_time=min_time),
+        'bytes_per_frame': bytes_per_frame,
+    }
+
+def bench_gravity_timers(sessions, use_wheel, min_time):
+    """
+    Move the tetrominos of many boards down when due, 10ms at a time (as a server ticking every game)
+    Either polling every board (tetromino_move_auto), or only waking the boards due (TimerWheel)
+    """
+    clock = ManualClock()
+    rnd = random.Random(0)
+    boards = []
+    for session_index in range(0, sessions):
+        board = TetrisBoard(clock=clock, seed=session_index)
+        board.get_next_tetromino()
+        board.tetromino_start()
+        # Spread the games' timers out
+        board._tetromino_moved = rnd.randrange(0, board._tetroino_move_interval)
+        boards.append(board)
+
+    if use_wheel:
+        wheel = TimerWheel(clock=clock)
+        def gravity(board, timer_index):
+            board.tetromino_move(Tetromino.DIR_DOWN)
+            wheel.reschedule(timers[timer_index], clock.now() + board._tetroino_move_interval)
+        timers = [wheel.schedule(board._tetromino_moved + board._tetroino_move_interval, gravity, board, timer_index) for timer_index, board in enumerate(boards)]
+        def operation():
+            clock.advance(10)
+            wheel.advance()
+    else:
+        def operation():
+            clock.advance(10)
+            for board in boards:
+                if board.tetromino_move_auto():
+                    board.tetromino_move(Tetromino.DIR_DOWN)
+    return { 'ticks_per_sec': measure(operation, min_time=min_time) }
+
+# Macrobenchmarks
+###############################################################################
+def play_random(sim, seed, step_handler=None):
+    """
+    Play a game of random actions (with the same mix as sim_tetris), returning the number of steps
+    The game is played on from the sim's current board, so reset it first (and lay it out, if it's drawn)
+
+        seed
+            Seed for the actions
+        step_handler
+            Function called after each step
+    """
+    rnd = random.Random(seed)
+    actions = [TetrisSim.ACTION_LEFT, TetrisSim.ACTION_RIGHT, TetrisSim.ACTION_ROTATE_CLOCKWISE, TetrisSim.ACTION_TICK, TetrisSim.ACTION_TICK]
+    steps = 0
+    game_over = False
+    while not game_over:
+        state, lines, game_over = sim.step(rnd.choice(actions))
+        steps += 1
+        if not step_handler is None:
+            step_handler()
+    return steps
+
+def bench_games(board_class, min_time):
+    """ Play games of random actions headless """
+    sim = TetrisSim(board_class=board_class)
+    games = 0
+    steps = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < min_time * 5:
+        sim.reset(games)
+        steps += play_random(sim, games)
+        games += 1
+    elapsed = time.perf_counter() - start
+    return { 'games_per_sec': games / elapsed, 'steps_per_sec': steps / elapsed }
+
+def bench_render_game(shadow, min_time):
+    """ Play games of random actions, drawing every change (as Pytuino.play) """
+    iface, counter = create_iface(80, 24, shadow=shadow)
+    sim = TetrisSim(board_class=TetrisBoard)
+    frames = 0
+    def draw():
+        nonlocal frames
+        board = sim.get_board()
+        if board.needs_redraw():
+            board.draw_board(iface)
+            iface.redraw()
+            frames += 1
+    games = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < min_time * 5:
+        sim.reset(games)
+        board = sim.get_board()
+        if not board.iface_check(iface):
+            raise Exception("Benchmark: screen too small")
+        play_random(sim, games, draw)
+        if not sim.get_board() is board:
+            raise Exception("Benchmark: the board played isn't the one laid out")
+        games += 1
+    elapsed = time.perf_counter() - start
+    # Too few bytes means the board drawn has no layout (it isn't the one played)
+    bytes_per_frame = counter.count / frames
+    if bytes_per_frame < RENDER_GAME_MIN_FRAME_BYTES:
+        raise Exception(f"Benchmark: {bytes_per_frame:.1f} bytes/frame is too few, the game drawn isn't the one played")
+    return { 'frames_per_sec': frames / elapsed, 'bytes_per_frame': bytes_per_frame }
+
+def run_benchmarks(name_filter=None, min_time=0.2):
+    """
+    Run the benchmarks (those with names containing name_filter), returning the results by name
+    """
+    benchmarks = []
+    for board_class in (TetrisBoard, TetrisBitBoard):
+        benchmarks.append((f"check_tetromino_position[{board_class.__name__}]", bench_check_tetromino_position, (board_class, min_time)))
+        benchmarks.append((f"tetromino_move[{board_class.__name__}]", bench_tetromino_move, (board_class, min_time)))
+        benchmarks.append((f"tetromino_rotate[{board_class.__name__}]", bench_tetromino_rotate, (board_class, min_time)))
+        benchmarks.append((f"remove_completed_rows[{board_class.__name__}]", bench_remove_completed_rows, (board_class, min_time)))
+    benchmarks.append(("tetromino_composite", bench_tetromino_composite, (min_time,)))
+    benchmarks.append(("render_string[cached]", bench_render_string, (True, min_time)))
+    benchmarks.append(("render_string[uncached]", bench_render_string, (False, min_time)))
+    for columns, rows in SCREEN_SIZES:
+        benchmarks.append((f"draw_board[{columns}x{rows}]", bench_draw_board, (columns, rows, min_time)))
+    for sessions in TIMER_SESSIONS:
+        benchmarks.append((f"gravity_timers[poll,{sessions}]", bench_gravity_timers, (sessions, False, min_time)))
+        benchmarks.append((f"gravity_timers[wheel,{sessions}]", bench_gravity_timers, (sessions, True, min_time)))
+    for board_class in (TetrisBoard, TetrisBitBoard):
+        benchmarks.append((f"games[{board_class.__name__}]", bench_games, (board_class, min_time)))
+    benchmarks.append(("render_game[ansi]", bench_render_game, (False, min_time)))
+    benchmarks.append(("render_game[shadow]", bench_render_game, (True, min_time)))
+
+    results = {}
+    for name, benchmark, benchmark_args in benchmarks:
+        if not name_filter is None and not name_filter in name:
+            continue
+        result = benchmark(*benchmark_args)
+        results[name] = result
+        print(f"Benchmark: {name:<42}" + "	".join(f"{metric}: {format_value(value)}" for metric, value in result.items()), file=sys.stderr)
+    return results
+
+def format_value(value):
+    """ Format a metric value for display """
+    if isinstance(value, float):
+        return f"{value:.1f}" if value < 1000 else f"{value:.0f}"
+    return str(value)
+
+def compare_results(results, baseline, tolerance):
+    """
+    Compare results against a baseline, returning a list of regressions as (name, metric, baseline value, value)
+    Rates must be no more than tolerance (a fraction) below the baseline, and sizes no more than tolerance above it
+    Benchmarks missing from either are ignored (renamed, or filtered out)
+    """
+    regressions = []
+    for name, result in results.items():
+        baseline_result = baseline.get(name)
+        if baseline_result is None:
+            continue
+        for metric, value in result.items():
+            baseline_value = baseline_result.get(metric)
+            if not isinstance(value, (int, float)) or not isinstance(baseline_value, (int, float)):
+                continue
+            if metric in LOWER_IS_BETTER:
+                regressed = value > baseline_value * (1 + tolerance)
+            else:
+                regressed = value < baseline_value * (1 - tolerance)
+            change = ((value / baseline_value) - 1) * 100 if baseline_value else 0
+            print(f"Compare: {name:<42}{metric}: {format_value(baseline_value)} -> {format_value(value)} ({change:+.1f}%){'	REGRESSION' if regressed else ''}", file=sys.stderr)
+            if regressed:
+                regressions.append((name, metric, baseline_value, value))
+    return regressions
+
+# Main
+###############################################################################
+if __name__ == '__main__':
+    # Build option parser
+    parser = argparse.ArgumentParser(
+        description="Pytuino - Benchmark the board engine, renderer and font"
+    )
+    parser.add_argument(
+        "-o", "--output", help="Write the results as JSON to the given file ('-' for stdout).",
+        metavar="FILE"
+    )
+    parser.add_argument(
+        "-b", "--baseline", help="Compare the results against a previous results file, failing on a regression.",
+        metavar="FILE"
+    )
+    parser.add_argument(
+        "-t", "--tolerance", help="Allowed change in each metric before it's a regression (default: %(default)s).",
+        type=float, default=0.2
+    )
+    parser.add_argument(
+        "-k", "--filter", help="Only run benchmarks with names containing the given text.",
+        metavar="TEXT"
+    )
+    parser.add_argument(
+        "--quick", help="Shorter runs (less accurate, for checking the benchmarks work).",
+        action="store_true"
+    )
+    args = parser.parse_args()
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+        if baseline.get('version') != VERSION:
+            sys.exit(f"Benchmark: unsupported baseline version: {baseline.get('version')}")
+
+    results = run_benchmarks(args.filter, min_time=0.02 if args.quick else 0.2)
+    report = {
+        'version': VERSION,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'results': results,
+    }
+    if args.output == '-':
+        print(json.dumps(report, indent=2))
+    elif args.output:
+        with open(args.output, 'w') as output_file:
+            json.dump(report, output_file, indent=2)
+            output_file.write("\n")
+
+    if not baseline is None:
+        regressions = compare_results(results, baseline['results'], args.tolerance)
+        if regressions:
+            print(f"Benchmark: {len(regressions)} regression(s) against {args.baseline}", file=sys.stderr)
+            for name, metric, baseline_value, value in regressions:
+                print(f"REGRESSION: {name}	{metric}: {format_value(baseline_value)} -> {format_value(value)}", file=sys.stderr)
+            sys.exit(1)
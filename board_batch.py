@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+"""
+Pytuino batch Tetris engine
+
+Simulates many independent games in lockstep, with the boards of every game
+held in a single NumPy array. Each step applies one action to every game, and
+the collision checks, placing tetrominos, clearing lines and scoring are done
+as array operations across the whole batch rather than per board.
+
+The rules follow TetrisSim (so TetrisBoard): the 7-bag order from
+fill_tetromino_bag, the bounds and overlap rules of check_tetromino_position,
+no wall kicks, and the update_score table. Given the same seed and actions, a
+game in the batch is identical to a TetrisSim game (see test_pytuino.py).
+"""
+
+import random
+
+import numpy as np
+
+from board_tetris import Tetromino
+from sim_tetris import TetrisSim
+
+###############################################################################
+class TetrisBatch:
+###############################################################################
+    """
+    Batch of headless Tetris games, advanced together by step(actions)
+    """
+
+    # Tetromino types in the order they're added to the bag (see TetrisBoard.fill_tetromino_bag)
+    BAG_TYPES = (Tetromino.TETROMINO_I, Tetromino.TETROMINO_J, Tetromino.TETROMINO_L, Tetromino.TETROMINO_O,
+                 Tetromino.TETROMINO_S, Tetromino.TETROMINO_T, Tetromino.TETROMINO_Z)
+    # Number of bags added to the tetromino queue of each game at a time
+    BAG_CHUNK = 32
+    # Score for the number of lines removed at once (see TetrisBoard.update_score)
+    SCORE_TABLE = np.array([0, 40, 100, 300, 1200], dtype=np.int64)
+
+    def __init__(self, num_boards, columns=10, rows=20):
+        """
+        Initialise the batch (call reset to start the games)
+
+            num_boards
+                Number of games to simulate
+            columns
+                Board width
+            rows
+                Board height
+        """
+        self._num_boards = num_boards
+        self._columns = columns
+        self._rows = rows
+
+        # Blocks of each tetromino type/rotation as offsets from the bottom left of the tetromino
+        # Type 0 is unused (empty board cell)
+        self._cells_x = np.zeros((8, 4, 4), dtype=np.int64)
+        self._cells_y = np.zeros((8, 4, 4), dtype=np.int64)
+        self._colours = np.zeros(8, dtype=np.uint8)
+        # Starting position of each type (see TetrisBoard.tetromino_start)
+        self._spawn_x = np.zeros(8, dtype=np.int64)
+        self._spawn_y = np.zeros(8, dtype=np.int64)
+        for type in TetrisBatch.BAG_TYPES:
+            composite = Tetromino.get_composite(type)
+            self._colours[type] = composite._colour_index
+            for rotation in range(0, 4):
+                tetromino_state = composite._pieces[rotation]
+                cells = [(column_index, tetromino_state.get_rows() - 1 - row_index)
+                         for row_index, blocks in enumerate(tetromino_state.get_blocks())
+                         for column_index, cell in enumerate(blocks) if cell]
+                self._cells_x[type, rotation] = [cell[0] for cell in cells]
+                self._cells_y[type, rotation] = [cell[1] for cell in cells]
+            tetromino_state = composite._pieces[0]
+            self._spawn_x[type] = (columns // 2) - (tetromino_state.get_columns() // 2)
+            self._spawn_y[type] = rows - 1 if tetromino_state.get_columns() == 3 else rows
+
+        # Boards (game, row, column), row 0 is the bottom
+        # 4 extra rows are left empty above the board, for tetrominos spawning/being rotated there
+        self._boards = np.zeros((num_boards, rows + 4, columns), dtype=np.uint8)
+        # Current tetromino of each game
+        self._types = np.zeros(num_boards, dtype=np.int64)
+        self._rotations = np.zeros(num_boards, dtype=np.int64)
+        self._positions_x = np.zeros(num_boards, dtype=np.int64)
+        self._positions_y = np.zeros(num_boards, dtype=np.int64)
+        # Upcoming tetrominos of each game, and the index of the next one
+        self._rnds = []
+        self._queue = np.zeros((num_boards, 0), dtype=np.int64)
+        self._queue_index = np.zeros(num_boards, dtype=np.int64)
+        # Game statistics
+        self._scores = np.zeros(num_boards, dtype=np.int64)
+        self._lines = np.zeros(num_boards, dtype=np.int64)
+        self._pieces = np.zeros(num_boards, dtype=np.int64)
+        self._game_over = np.ones(num_boards, dtype=bool)
+
+    def _check_positions(self, indices, types, rotations, positions_x, positions_y):
+        """
+        Check whether the given tetrominos can exist at the given positions, on the boards of the given games
+        Returns an array of flags
+        """
+        cells_x = positions_x[:, None] + self._cells_x[types, rotations]
+        cells_y = positions_y[:, None] + self._cells_y[types, rotations]
+
+        # Check the bounds (add an extra 4 rows for spawning)
+        valid = ((cells_x >= 0) & (cells_x < self._columns) & (cells_y >= 0) & (cells_y < (self._rows + 4))).all(axis=1)
+
+        # Check whether this overlaps existing blocks on the board (clipped, as out of bounds cells are already invalid)
+        cells_x = np.clip(cells_x, 0, self._columns - 1)
+        cells_y = np.clip(cells_y, 0, self._rows + 3)
+        valid &= ~(self._boards[indices[:, None], cells_y, cells_x] != 0).any(axis=1)
+
+        return valid
+
+    def _fill_queue(self):
+        """
+        Add more bags of tetrominos to the queue of every game still being played, dropping the tetrominos they've all used
+        Games that are over only keep their next tetromino (at the front of the queue)
+        """
+        active = ~self._game_over
+        over = np.flatnonzero(self._game_over)
+        used = int(self._queue_index[active].min()) if active.any() else self._queue.shape[1]
+        next_over = self._queue[over, self._queue_index[over]]
+
+        bags = np.zeros((self._num_boards, TetrisBatch.BAG_CHUNK * len(TetrisBatch.BAG_TYPES)), dtype=np.int64)
+        for index in np.flatnonzero(active):
+            rnd = self._rnds[index]
+            pieces = []
+            for bag_index in range(0, TetrisBatch.BAG_CHUNK):
+                bag = list(TetrisBatch.BAG_TYPES)
+                rnd.shuffle(bag)
+                pieces.extend(bag)
+            bags[index] = pieces
+        self._queue = np.concatenate((self._queue[:, used:], bags), axis=1)
+        self._queue_index -= used
+        self._queue[over, 0] = next_over
+        self._queue_index[over] = 0
+
+    def _spawn(self, indices):
+        """
+        Start the next tetromino of the given games
+        """
+        if len(indices) == 0:
+            return
+        # Always leave the next tetromino in the queue
+        if int(self._queue_index[indices].max()) + 2 > self._queue.shape[1]:
+            self._fill_queue()
+
+        types = self._queue[indices, self._queue_index[indices]]
+        self._queue_index[indices] += 1
+        self._types[indices] = types
+        self._rotations[indices] = 0
+        self._positions_x[indices] = self._spawn_x[types]
+        self._positions_y[indices] = self._spawn_y[types]
+        self._pieces[indices] += 1
+
+    def _attach(self, indices):
+        """
+        Copy the current tetromino of the given games to their boards, remove full rows and update the scores
+        Games where the tetromino is (partly) above the board are over
+        Returns the number of lines removed from each of the given games
+        """
+        types = self._types[indices]
+        rotations = self._rotations[indices]
+        cells_x = self._positions_x[indices, None] + self._cells_x[types, rotations]
+        cells_y = self._positions_y[indices, None] + self._cells_y[types, rotations]
+
+        # If there are blocks outside of the board area, it's game over (nothing is copied)
+        over = (cells_y >= self._rows).any(axis=1)
+        self._game_over[indices[over]] = True
+        placed = ~over
+        indices = indices[placed]
+        self._boards[np.repeat(indices, 4), cells_y[placed].ravel(), cells_x[placed].ravel()] = np.repeat(self._colours[types[placed]], 4)
+
+        # Remove full rows, by moving them to the top of the board (in order) and clearing them
+        boards = self._boards[indices, :self._rows]
+        full = (boards != 0).all(axis=2)
+        lines = full.sum(axis=1)
+        cleared = lines > 0
+        if cleared.any():
+            boards = boards[cleared]
+            order = np.argsort(full[cleared], axis=1, kind='stable')
+            boards = np.take_along_axis(boards, order[:, :, None], axis=1)
+            boards[np.arange(self._rows)[None, :] >= (self._rows - lines[cleared])[:, None]] = 0
+            self._boards[indices[cleared], :self._rows] = boards
+
+        # Update score
+        self._scores[indices] += TetrisBatch.SCORE_TABLE[lines]
+        self._lines[indices] += lines
+
+        # Start the next tetromino
+        self._spawn(indices)
+
+        rtn = np.zeros(len(placed), dtype=np.int64)
+        rtn[placed] = lines
+        return rtn
+
+    def get_boards(self):
+        """ Return the boards of every game, as an array of (game, row, column) with row 0 the bottom """
+        return self._boards[:, :self._rows]
+
+    def get_game_over(self):
+        """ Return whether each game has finished """
+        return self._game_over
+
+    def get_lines(self):
+        """ Return the number of lines cleared in each game """
+        return self._lines
+
+    def get_next(self):
+        """ Return the type of the next tetromino of each game """
+        return self._queue[np.arange(self._num_boards), self._queue_index]
+
+    def get_pieces(self):
+        """ Return the number of tetrominos played in each game """
+        return self._pieces
+
+    def get_scores(self):
+        """ Return the score of each game """
+        return self._scores
+
+    def get_tetrominos(self):
+        """ Return the current tetromino of each game as arrays of (type, rotation, column, row) """
+        return self._types, self._rotations, self._positions_x, self._positions_y
+
+    def reset(self, seeds=None):
+        """
+        Start new games
+
+            seeds
+                Seed for the tetromino order of each game (default: seeded from the system)
+        """
+        if seeds is None:
+            seeds = [None] * self._num_boards
+        if len(seeds) != self._num_boards:
+            raise ValueError("TetrisBatch: need a seed for every game")
+
+        self._boards[:] = 0
+        self._rnds = [random.Random(seed) for seed in seeds]
+        self._queue = np.zeros((self._num_boards, 0), dtype=np.int64)
+        self._queue_index[:] = 0
+        self._scores[:] = 0
+        self._lines[:] = 0
+        self._pieces[:] = 0
+        self._game_over[:] = False
+        self._spawn(np.arange(self._num_boards))
+
+    def step(self, actions):
+        """
+        Apply an action (TetrisSim.ACTION_*) to every game, as TetrisSim.step does
+        Games which have finished are left unchanged
+        Returns a tuple of arrays of (lines cleared by this action, game over)
+
+            actions
+                Action of each game
+        """
+        actions = np.asarray(actions)
+        active = ~self._game_over
+
+        # Work out where each tetromino is trying to move to
+        positions_x = self._positions_x.copy()
+        positions_y = self._positions_y.copy()
+        rotations = self._rotations.copy()
+        positions_x[actions == TetrisSim.ACTION_LEFT] -= 1
+        positions_x[actions == TetrisSim.ACTION_RIGHT] += 1
+        rotations[actions == TetrisSim.ACTION_ROTATE_CLOCKWISE] += 1
+        rotations[actions == TetrisSim.ACTION_ROTATE_ANTICLOCKWISE] += 3
+        rotations %= 4
+        move_down = (actions == TetrisSim.ACTION_DOWN) | (actions == TetrisSim.ACTION_TICK)
+        positions_y[move_down] -= 1
+
+        # Move the tetrominos that fit
+        moving = active & (move_down | (actions == TetrisSim.ACTION_LEFT) | (actions == TetrisSim.ACTION_RIGHT) |
+                           (actions == TetrisSim.ACTION_ROTATE_CLOCKWISE) | (actions == TetrisSim.ACTION_ROTATE_ANTICLOCKWISE))
+        indices = np.nonzero(moving)[0]
+        valid = self._check_positions(indices, self._types[indices], rotations[indices], positions_x[indices], positions_y[indices])
+        indices = indices[valid]
+        self._positions_x[indices] = positions_x[indices]
+        self._positions_y[indices] = positions_y[indices]
+        self._rotations[indices] = rotations[indices]
+
+        # Tetrominos that couldn't move down are fixed to the board
+        affix = active & move_down
+        affix[indices] = False
+
+        # Hard drop, moving every dropping tetromino down a row at a time until they've all stopped
+        drop = active & (actions == TetrisSim.ACTION_DROP)
+        indices = np.nonzero(drop)[0]
+        while len(indices) > 0:
+            valid = self._check_positions(indices, self._types[indices], self._rotations[indices], self._positions_x[indices], self._positions_y[indices] - 1)
+            indices = indices[valid]
+            self._positions_y[indices] -= 1
+        affix |= drop
+
+        lines = np.zeros(self._num_boards, dtype=np.int64)
+        indices = np.nonzero(affix)[0]
+        if len(indices) > 0:
+            lines[indices] = self._attach(indices)
+
+        return lines, self._game_over.copy()
+
+# Main
+###############################################################################
+if __name__ == '__main__':
+    import time
+
+    actions = np.array([TetrisSim.ACTION_LEFT, TetrisSim.ACTION_RIGHT, TetrisSim.ACTION_ROTATE_CLOCKWISE, TetrisSim.ACTION_ROTATE_ANTICLOCKWISE,
+                        TetrisSim.ACTION_TICK, TetrisSim.ACTION_TICK, TetrisSim.ACTION_DROP])
+
+    # Report the speed
+    num_games = 4096
+    batch = TetrisBatch(num_games)
+    batch.reset(seeds=list(range(0, num_games)))
+    rng = np.random.default_rng(0)
+    num_steps = 0
+    start = time.perf_counter()
+    while not batch.get_game_over().all():
+        batch.step(rng.choice(actions, size=num_games))
+        num_steps += int((~batch.get_game_over()).sum())
+    elapsed = time.perf_counter() - start
+    print(f"Games: {num_games}	Steps: {num_steps}	Steps/sec: {num_steps/elapsed:.0f}")
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Pytuino Tetris Board (bitboard)
+
+Tetris board with each row held as an integer bit mask, so collision checks,
+attaching a tetromino and finding full rows are a few shifts and ANDs per row
+rather than a walk over every cell. The colour of each cell is still kept in
+the 2 dimensional list, but that is only used to render the board.
+"""
+
+from board_tetris import TetrisBoard
+
+###############################################################################
+class TetrisBitBoard(TetrisBoard):
+###############################################################################
+    """
+    Tetris board using bit masks for the occupied cells of each row
+    """
+
+    def __init__(self, columns=10, rows=20, colours=8, clock=None, seed=None):
+        """
+        Initialise the Tetris board
+        """
+        # Occupied cells of each row (bit 0 is the left column)
+        self._board_bits = []
+        # Mask of a full row
+        self._full_mask = (1 << columns) - 1
+
+        super().__init__(columns=columns, rows=rows, colours=colours, clock=clock, seed=seed)
+
+    def _add_row_(self):
+        """
+        Add a row of the correct size to the board
+        """
+        super()._add_row_()
+        self._board_bits.append(0)
+
+    def _update_fill_(self):
+        """
+        Recount the occupied cells of every row, after the board has been changed directly
+        """
+        super()._update_fill_()
+        self._update_bits_()
+
+    def _remove_rows_(self, row_indices):
+        """
+        Remove the given rows from the board (in a single pass)
+        """
+        super()._remove_rows_(row_indices)
+        self._board_bits = [mask for row_index, mask in enumerate(self._board_bits) if not row_index in row_indices]
+
+    def _row_complete_(self, row_index):
+        """
+        Check whether a row has no spaces
+        """
+        return self._board_bits[row_index] == self._full_mask
+
+    def _update_bits_(self):
+        """
+        Rebuild the row bit masks from the cells of the board
+        """
+        for row_index in range(0, len(self._board)):
+            mask = 0
+            row = self._board[row_index]
+            for column_index in range(0, self._columns):
+                if row[column_index]:
+                    mask |= 1 << column_index
+            self._board_bits[row_index] = mask
+
+    def check_tetromino_position(self, tetromino=None, tetromino_state=None, position_x=None, position_y=None):
+        """
+        Check whether the given tetromino can exist at the given position
+        """
+        if tetromino is None:
+            tetromino = self._tetromino
+        if tetromino_state is None:
+            tetromino_state = tetromino.get_state()
+        if position_x is None:
+            position_x = tetromino.get_posX()
+        if position_y is None:
+            position_y = tetromino.get_posY()
+
+        # Calculate the top of the tetromino in board co-ordinates
+        tmp_y = position_y + (tetromino_state.get_rows() - 1)
+        for mask in tetromino_state.get_masks():
+            if mask:
+                # Check the lower/upper row bounds (add an extra 4 rows for spawning)
+                if tmp_y < 0 or tmp_y >= (self._rows + 4):
+                    return False
+                # Move the row mask to the tetromino position, checking no blocks are shifted off the left edge
+                if position_x < 0:
+                    if mask & ((1 << -position_x) - 1):
+                        return False
+                    mask >>= -position_x
+                else:
+                    mask <<= position_x
+                # Check the right edge
+                if mask > self._full_mask:
+                    return False
+                # Check whether this overlaps existing blocks on the board
+                if tmp_y < self._rows and self._board_bits[tmp_y] & mask:
+                    return False
+            tmp_y -= 1
+
+        return True
+
+    def tetromino_attach(self):
+        """
+        Copy blocks from tetromino to the board, and clear current tetromino
+        """
+        tetromino_state = self._tetromino.get_state()
+        position_x = self._tetromino.get_posX()
+        position_y = self._tetromino.get_posY()
+
+        # Copy the colours (nothing is copied if it fails)
+        if not super().tetromino_attach():
+            return False
+
+        # Then the blocks
+        tmp_y = position_y + (tetromino_state.get_rows() - 1)
+        for mask in tetromino_state.get_masks():
+            if mask:
+                self._board_bits[tmp_y] |= mask << position_x if position_x >= 0 else mask >> -position_x
+            tmp_y -= 1
+
+        return True
+
+# Main
+###############################################################################
+if __name__ == '__main__':
+    tboard = TetrisBitBoard(seed=0)
+    tboard._fill_rand_()
+    print(tboard)
+    for row_index in range(tboard._rows-1, -1, -1):
+        print(f"{tboard._board_bits[row_index]:0{tboard._columns}b}"[::-1])
+    print(f"Removed: {tboard.remove_completed_rows()}")
@@ -7,11 +7,11 @@ Tetris board implemented as a 2 dimensional lists
 Reference: https://tetris.wiki/Tetris_Guideline
 """
 
-import datetime
 import math
 import random
 
 from font import Font
+from game_clock import MonotonicClock
 
 ###############################################################################
 class TetrominoSingle:
@@ -20,6 +20,8 @@ class TetrominoSingle:
     Class representing a single Tetris piece (tetromino) state
     """
 
+    __slots__ = ('_blocks', '_rows', '_columns', '_masks', '_bottoms')
+
     def __init__(self, blocks):
         """
         Initialise the basic struture of the tetromino
@@ -31,6 +33,25 @@ class TetrominoSingle:
         self._rows = len(blocks)
         self._columns = len(blocks[0])
 
+        # Bit mask of the blocks in each row (bit 0 is the left column)
+        self._masks = []
+        for row in blocks:
+            mask = 0
+            for column_index in range(0, self._columns):
+                if row[column_index]:
+                    mask |= 1 << column_index
+            self._masks.append(mask)
+
+        # Lowest block of each column, as rows up from the bottom of the tetromino (None for an empty column)
+        self._bottoms = []
+        for column_index in range(0, self._columns):
+            bottom = None
+            for row_index in range(self._rows-1, -1, -1):
+                if blocks[row_index][column_index]:
+                    bottom = self._rows - 1 - row_index
+                    break
+            self._bottoms.append(bottom)
+
     def __str__(self):
         rtn = ""
         for row in self._blocks:
@@ -45,8 +66,12 @@ class TetrominoSingle:
 
     def get_blocks(self):
         return self._blocks
+    def get_bottoms(self):
+        return self._bottoms
     def get_columns(self):
         return self._columns
+    def get_masks(self):
+        return self._masks
     def get_rows(self):
         return self._rows
 
@@ -252,6 +277,36 @@ class Tetromino:
     TETROMINO_Z = 7
     TETROMINO_TEST = 8
 
+    # Prototype of each type of tetromino
+    _composite_create = {
+        TETROMINO_I: TetrominoComposite.createI,
+        TETROMINO_J: TetrominoComposite.createJ,
+        TETROMINO_L: TetrominoComposite.createL,
+        TETROMINO_O: TetrominoComposite.createO,
+        TETROMINO_S: TetrominoComposite.createS,
+        TETROMINO_T: TetrominoComposite.createT,
+        TETROMINO_Z: TetrominoComposite.createZ,
+        TETROMINO_TEST: TetrominoComposite.createTest,
+    }
+    # Rotation states of each type of tetromino, created once on first use
+    _composites = {}
+
+    # Only the type, rotation and position are stored per tetromino
+    __slots__ = ('_type', '_composite', '_rotational_state', '_position_column', '_position_row')
+
+    @staticmethod
+    def get_composite(type):
+        """
+        Return the (shared) rotation states for the given type of tetromino
+        """
+        composite = Tetromino._composites.get(type)
+        if composite is None:
+            create = Tetromino._composite_create.get(type)
+            if not create is None:
+                composite = create()
+                Tetromino._composites[type] = composite
+        return composite
+
     def __init__(self, type):
         """
         Initialise the tetromino
@@ -261,29 +316,13 @@ class Tetromino:
         """
         self._type = type
 
-        self._composite = None
-        # Initialise from TetrominoComposite static method
-        if type == Tetromino.TETROMINO_I:
-            self._composite = TetrominoComposite.createI()
-        elif type == Tetromino.TETROMINO_J:
-            self._composite = TetrominoComposite.createJ()
-        elif type == Tetromino.TETROMINO_L:
-            self._composite = TetrominoComposite.createL()
-        elif type == Tetromino.TETROMINO_O:
-            self._composite = TetrominoComposite.createO()
-        elif type == Tetromino.TETROMINO_S:
-            self._composite = TetrominoComposite.createS()
-        elif type == Tetromino.TETROMINO_T:
-            self._composite = TetrominoComposite.createT()
-        elif type == Tetromino.TETROMINO_Z:
-            self._composite = TetrominoComposite.createZ()
-        elif type == Tetromino.TETROMINO_TEST:
-            self._composite = TetrominoComposite.createTest()
+        # Rotation states are shared by all tetrominos of the same type
+        self._composite = Tetromino._composites.get(type)
+        if self._composite is None:
+            self._composite = Tetromino.get_composite(type)
 
         # Tetromino rotational state
         self._rotational_state = 0
-        # Tetromino rotational state (previous)
-        self._rotational_state_prev = 0
 
         # Current position on the board
         self._position_column = None
@@ -301,6 +340,14 @@ class Tetromino:
         """ Return the current block positions for this tetromino """
         return self._composite._pieces[self._rotational_state]
 
+    def get_rotation(self):
+        """ Return the current rotational state (0-3) """
+        return self._rotational_state
+
+    def get_type(self):
+        """ Return the type of this tetromino """
+        return self._type
+
     def get_posX(self):
         return self._position_column
 
@@ -346,21 +393,41 @@ class TetrisBoard:
     Class implementing the state and methods of a Tetris board
     """
 
-    def __init__(self, columns=10, rows=20, colours=8):
+    def __init__(self, columns=10, rows=20, colours=8, clock=None, seed=None):
         """
         Initialise the Tetris board
+
+            clock
+                Clock used to time the tetromino moving down (default: MonotonicClock)
+            seed
+                Seed for the random number generator (default: seeded from the system)
         """
+        # Clock for timed events
+        if clock is None:
+            clock = MonotonicClock()
+        self._clock = clock
+
         # Need a random number generator for various actions (including initialisation)
-        self._rnd = random.Random()
+        self._seed = seed
+        self._rnd = random.Random(seed)
 
         self._columns = columns
         self._rows = rows
         self._board = []
+        # Number of occupied cells in each row of the board
+        self._board_fill = []
         self._fill_rows_()
+        # Height of the highest block in each column (0 for an empty column)
+        self._column_heights = [0] * columns
+        # Rows blocks have been added to since completed rows were last removed
+        self._rows_attached = set()
+        # Functions called with the removed rows when lines are cleared (see add_lines_cleared_handler)
+        self._lines_cleared_handlers = []
         self._max_colours = colours
 
-        # Tetromino 'bag'
+        # Tetromino 'bag', and the number of times it's been filled
         self._tetromino_bag = []
+        self._tetromino_bags = 0
         self.fill_tetromino_bag()
         # Current tetromino
         self._tetromino = None
@@ -392,6 +459,23 @@ class TetrisBoard:
         self._renderer_ntetro_offset_column = 0
         self._renderer_ntetro_offset_row = 0
         self._renderer_ntetro_num = 1
+        # Attribute tables (see _renderer_attributes), and the interface they were built for
+        self._renderer_attr_iface = None
+        self._renderer_attr_tables = {}
+        # Flag: Board has changed since it was last drawn
+        self._renderer_redraw = True
+        # Rows removed since the board was last drawn (board row indices, in order of removal)
+        # Only tracked once the board has been laid out for an interface
+        self._renderer_rows_removed = None
+        # Flag: Clear the screen and draw everything on the next draw (the layout has changed)
+        self._renderer_layout = True
+        # Override colour the screen was last drawn with
+        self._renderer_override_colour = None
+        # Score text last drawn (None if it needs to be drawn in full)
+        self._renderer_score_drawn = None
+        # Segments of each board row as on screen (None if it needs drawing), and the board rows the tetromino (and ghost) were drawn over
+        self._renderer_rows_drawn = None
+        self._renderer_tetromino_rows = set()
 
     def __str__(self):
         rtn = ""
@@ -421,6 +505,20 @@ class TetrisBoard:
         Add a row of the correct size to the board
         """
         self._board.append([0] * self._columns)
+        self._board_fill.append(0)
+
+    def _remove_rows_(self, row_indices):
+        """
+        Remove the given rows from the board (in a single pass)
+        """
+        self._board = [row for row_index, row in enumerate(self._board) if not row_index in row_indices]
+        self._board_fill = [fill for row_index, fill in enumerate(self._board_fill) if not row_index in row_indices]
+
+    def _row_complete_(self, row_index):
+        """
+        Check whether a row has no spaces
+        """
+        return self._board_fill[row_index] == self._columns
 
     def _fill_rows_(self):
         """
@@ -437,6 +535,26 @@ class TetrisBoard:
             row = self._board[row_index]
             for i in range(self._columns):
                 row[i] = self._rnd.randrange(0, self._max_colours)
+        self._update_fill_()
+
+    def _update_fill_(self):
+        """
+        Recount the occupied cells of every row, after the board has been changed directly
+        """
+        for row_index in range(0, len(self._board)):
+            self._board_fill[row_index] = self._columns - self._board[row_index].count(0)
+        for column_index in range(0, self._columns):
+            self._update_column_height_(column_index, len(self._board))
+        # Any row could now be complete
+        self._rows_attached = set(range(0, self._rows))
+
+    def _update_column_height_(self, column_index, height):
+        """
+        Set the height of a column, by searching down from the given height for it's highest block
+        """
+        while height > 0 and self._board[height-1][column_index] == 0:
+            height -= 1
+        self._column_heights[column_index] = height
 
     def check_tetromino_position(self, tetromino=None, tetromino_state=None, position_x=None, position_y=None):
         """
@@ -473,6 +591,38 @@ class TetrisBoard:
 
         return True
 
+    def get_column_heights(self):
+        """ Return the height of the highest block in each column """
+        return self._column_heights
+
+    def get_drop_position(self, tetromino=None, tetromino_state=None, position_x=None, position_y=None):
+        """
+        Return the row the given tetromino would land on if dropped from the given position
+        If position_y is None, it's dropped from above the board
+        """
+        if tetromino is None:
+            tetromino = self._tetromino
+        if tetromino_state is None:
+            tetromino_state = tetromino.get_state()
+        if position_x is None:
+            position_x = tetromino.get_posX()
+
+        # Rest the tetromino on the highest column below it (the tetromino's lowest row can be empty, so can drop below row 0)
+        drop_y = None
+        column_index = position_x
+        for bottom in tetromino_state.get_bottoms():
+            if not bottom is None and (drop_y is None or self._column_heights[column_index] - bottom > drop_y):
+                drop_y = self._column_heights[column_index] - bottom
+            column_index += 1
+
+        # The tetromino is below the top of the stack (under an overhang), so step down to where it stops
+        if not position_y is None and drop_y > position_y:
+            drop_y = position_y
+            while self.check_tetromino_position(tetromino, tetromino_state, position_x, drop_y - 1):
+                drop_y -= 1
+
+        return drop_y
+
     def get_current_tetromino(self, remove=True):
         """ Return the active tetromino """
         return self._tetromino
@@ -487,7 +637,7 @@ class TetrisBoard:
         if remove and self._tetromino is None:
             rtn = self._tetromino_bag.pop(0)
             self._tetromino = rtn
-            self._tetromino_moved = math.floor(datetime.datetime.now().timestamp() * 1000)
+            self._tetromino_moved = self._clock.now()
         else:
             rtn = self._tetromino_bag[0]
 
@@ -513,41 +663,107 @@ class TetrisBoard:
 
         # Randomise the list
         self._rnd.shuffle(self._tetromino_bag)
+        self._tetromino_bags += 1
+
+    def get_snapshot(self):
+        """
+        Return the state of the game as a dictionary, which can be restored with set_snapshot
+            board: Tuple of rows (bottom first), each a tuple of cells (0 for empty)
+            tetromino: Current tetromino as (type, rotation, column, row), or None
+            bag: Tuple of the types of tetromino left in the bag
+            bags: Number of times the bag has been filled
+            score: Current score
+            random: State of the random number generator (optional when restoring, if the board has a seed)
+        """
+        tetromino = self._tetromino
+        if not tetromino is None:
+            tetromino = (tetromino.get_type(), tetromino.get_rotation(), tetromino.get_posX(), tetromino.get_posY())
+        return {
+            'board': tuple(tuple(row) for row in self._board[0:self._rows]),
+            'tetromino': tetromino,
+            'bag': tuple(tetromino.get_type() for tetromino in self._tetromino_bag),
+            'bags': self._tetromino_bags,
+            'score': self._score,
+            'random': self._rnd.getstate(),
+        }
+
+    def set_snapshot(self, snapshot):
+        """
+        Restore the state of the game from a snapshot (see get_snapshot)
+        The board must have been created with the same size as the board the snapshot was taken from
+        Snapshots without the random state (from a replay) also need the board to have the same seed
+        """
+        if not snapshot.get('random') is None:
+            self._rnd.setstate(snapshot['random'])
+        else:
+            # Put the random number generator in the same state, by repeating the shuffles of the bag
+            if self._seed is None:
+                raise Exception("Pytuino: snapshot has no random state, and the board has no seed to rebuild it from")
+            self._rnd = random.Random(self._seed)
+            for bag_index in range(0, snapshot['bags']):
+                self._rnd.shuffle([0] * 7)
+        self._tetromino_bags = snapshot['bags']
+        self._tetromino_bag = [Tetromino(type) for type in snapshot['bag']]
+
+        for row_index in range(0, len(self._board)):
+            row = self._board[row_index]
+            row[:] = snapshot['board'][row_index] if row_index < self._rows else [0] * self._columns
+        self._update_fill_()
+
+        self._tetromino = None
+        if not snapshot['tetromino'] is None:
+            type, rotation, position_x, position_y = snapshot['tetromino']
+            self._tetromino = Tetromino(type)
+            self._tetromino._rotational_state = rotation
+            self._tetromino.set_position(position_x, position_y)
+            self._tetromino_moved = self._clock.now()
+
+        self._score = snapshot['score']
+        self._renderer_layout = True
+        self._renderer_redraw = True
+
+    def add_lines_cleared_handler(self, handler):
+        """
+        Register a function to be called when lines are cleared
+        It's passed the removed rows as a list of board row indices, in order of removal (top first)
+        """
+        self._lines_cleared_handlers.append(handler)
 
     def remove_completed_rows(self):
         """
         Removes any full rows, and inserts replacements at the top of the board
+        Only the rows blocks have been attached to since the last call are checked
         Return the number of removed lines
         """
-        removed_lines = 0
-
-        # Scan in reverse order as rows can be removed
-        for row_index in range(self._rows-1, -1, -1):
-            # Select row
-            row = self._board[row_index]
+        if not self._rows_attached:
+            return 0
 
-            remove_row = True
-            # Checking each cell
-            for cell in row:
-                # For a space
-                if cell == 0:
-                    # Which if it exists, we can ignore the row
-                    remove_row = False
-                    break
-            if remove_row:
-                # Remove selected row
-                self._board.pop(row_index)
-                removed_lines += 1
+        # Reverse order, so each index is still valid after the rows above it are removed
+        removed_rows = [row_index for row_index in sorted(self._rows_attached, reverse=True) if self._row_complete_(row_index)]
+        self._rows_attached = set()
+        if len(removed_rows) == 0:
+            return 0
 
-        # Added any needed rows
+        # Remove selected rows, and add replacements
+        self._remove_rows_(set(removed_rows))
         self._fill_rows_()
 
-        return removed_lines
+        # Blocks above the removed rows have moved down (the highest block may have been removed)
+        for column_index in range(0, self._columns):
+            height = self._column_heights[column_index]
+            self._update_column_height_(column_index, height - sum(1 for row_index in removed_rows if row_index < height))
+
+        for handler in self._lines_cleared_handlers:
+            handler(removed_rows)
+
+        return len(removed_rows)
 
     def tetromino_attach(self):
         """
         Copy blocks from tetromino to the board, and clear current tetromino
         """
+        self._renderer_redraw = True
+
         tetromino_state = self._tetromino.get_state()
         position_x = self._tetromino.get_posX()
         position_y = self._tetromino.get_posY()
@@ -564,6 +780,10 @@ class TetrisBoard:
                         return False
                     else:
                         self._board[tmp_y][tmp_x] = cell
+                        self._board_fill[tmp_y] += 1
+                        self._rows_attached.add(tmp_y)
+                        if self._column_heights[tmp_x] <= tmp_y:
+                            self._column_heights[tmp_x] = tmp_y + 1
                 tmp_x += 1
             tmp_y -= 1
 
@@ -572,16 +792,36 @@ class TetrisBoard:
 
         return True
 
+    def tetromino_drop(self):
+        """
+        Move the current tetromino straight down as far as it will go (hard drop)
+        Returns the number of rows it moved
+        """
+        position_y = self._tetromino.get_posY()
+        drop_y = self.get_drop_position(position_y=position_y)
+        if drop_y < position_y:
+            self._tetromino.set_position(self._tetromino.get_posX(), drop_y)
+            self._renderer_redraw = True
+        return position_y - drop_y
+
     def tetromino_move_auto(self):
         """
         Move the current tetromino down after a period of time
+        Returns the number of moves down that are due (if the game has stalled, there can be more than 1)
         """
-        now = math.floor(datetime.datetime.now().timestamp() * 1000)
-        if now >= (self._tetromino_moved + self._tetroino_move_interval):
-            self._tetromino_moved = now
-            return True
+        steps = (self._clock.now() - self._tetromino_moved) // self._tetroino_move_interval
+        if steps > 0:
+            # Step the timer on by whole intervals, so the timing doesn't drift
+            self._tetromino_moved += steps * self._tetroino_move_interval
+            return steps
         else:
-            return False
+            return 0
+
+    def tetromino_move_auto_timeout(self):
+        """
+        Return the time (in milliseconds) until the current tetromino should be moved down automatically
+        """
+        return max(0, (self._tetromino_moved + self._tetroino_move_interval) - self._clock.now())
 
     def tetromino_move(self, direction):
         """
@@ -601,6 +841,7 @@ class TetrisBoard:
 
         if self.check_tetromino_position(position_x=tmp_x, position_y=tmp_y):
             self._tetromino.set_position(tmp_x, tmp_y)
+            self._renderer_redraw = True
             return True
 
         return False
@@ -611,6 +852,7 @@ class TetrisBoard:
         """
         if self.check_tetromino_position(tetromino_state=self._tetromino.rotate(direction, test=True)):
             self._tetromino.rotate(direction)
+            self._renderer_redraw = True
 
     def tetromino_start(self):
         """
@@ -625,6 +867,7 @@ class TetrisBoard:
                 fudge_y = -1
             # Set position
             self._tetromino.set_position(math.floor(self._columns/2)-math.floor(tetromino_state.get_columns()/2), self._rows + fudge_y)
+            self._renderer_redraw = True
 
     def update_score(self, lines):
         """
@@ -638,18 +881,59 @@ class TetrisBoard:
             self._score += 300
         if lines == 4:
             self._score += 1200
+        if lines > 0:
+            self._renderer_redraw = True
 
 # Interface related methods
 ###############################################################################
-    def colour_override(self, iface, colour_default, colour_override):
+    # Bytes sent to draw, as estimated by _renderer_scroll_saves
+    # Box drawing character (UTF-8)
+    RENDERER_COST_BOX_CHARACTER = 3
+    # Cursor move and attribute changes, starting a line of the board
+    RENDERER_COST_BOARD_LINE = 16
+    # Scroll region, scroll and resetting the region, for each removed row
+    RENDERER_COST_SCROLL = 16
+    # Cursor move and attribute changes, starting a line of the score
+    RENDERER_COST_SCORE_LINE = 8
+    # Score drawn as text (when it's too small for the font)
+    RENDERER_COST_SCORE_TEXT = 32
+
+    def _renderer_attributes(self, iface, override_colour):
         """
-        Used to override the default colour with override, if set
-        Returns color_pair
+        Return the attribute table for the given interface and override colour, building it if needed
+        The table holds attribute words already combined with their colour (see iface.attr_combine):
+            (list of cell attributes indexed by cell value (None for empty), border attributes, text attributes)
         """
-        if colour_override is None:
-            return iface.color_pair(colour_default)
-        else:
-            return iface.color_pair(colour_override)
+        # Tables are only valid for the interface they were built for
+        if not self._renderer_attr_iface is iface:
+            self._renderer_attr_iface = iface
+            self._renderer_attr_tables = {}
+
+        table = self._renderer_attr_tables.get(override_colour)
+        if table is None:
+            cell_attributes = [None]
+            for cell in range(1, 256):
+                colour = cell if override_colour is None else override_colour
+                cell_attributes.append(iface.attr_combine(iface.TXT_NORMAL, iface.color_pair(colour)))
+            border_colour = 8 if override_colour is None else override_colour
+            text_colour = 255 if override_colour is None else override_colour
+            table = (cell_attributes, iface.attr_combine(iface.TXT_BOLD, iface.color_pair(border_colour)), iface.attr_combine(iface.TXT_BOLD, iface.color_pair(text_colour)))
+            self._renderer_attr_tables[override_colour] = table
+        return table
+
+    def _renderer_cell_runs(self, cells, cell_attributes):
+        """
+        Group a row of cells in to runs that share the same attributes
+        Returns a list of [attributes (None for empty), number of cells]
+        """
+        runs = []
+        for cell in cells:
+            attributes = cell_attributes[cell]
+            if len(runs) > 0 and runs[-1][0] == attributes:
+                runs[-1][1] += 1
+            else:
+                runs.append([attributes, 1])
+        return runs
 
     def iface_check(self, iface, tetro_blk_width=1, tetro_blk_height=1):
         """
@@ -700,75 +984,255 @@ class TetrisBoard:
         self._renderer_ntetro_offset_row = 0
         self._renderer_ntetro_num = 1
 
+        # Layout may have changed
+        self._renderer_redraw = True
+        self._renderer_layout = True
+        if self._renderer_rows_removed is None:
+            self._renderer_rows_removed = []
+            self.add_lines_cleared_handler(self._renderer_lines_cleared)
+
         return True
 
+    def _renderer_lines_cleared(self, removed_rows):
+        """
+        Lines cleared handler, the removed rows are scrolled off the screen on the next draw
+        """
+        self._renderer_rows_removed.extend(removed_rows)
+        self._renderer_redraw = True
+
+    def needs_redraw(self):
+        """ Return whether the board has changed since it was last drawn """
+        return self._renderer_redraw
+
+    def draw_rows_removed(self, iface):
+        """
+        Shift the board rows on screen to match any removed rows, using the terminal's scroll region
+        If the interface can't scroll, the rows will just be redrawn
+        Returns the number of screen lines scrolled
+        """
+        scrolled = 0
+        if not self._renderer_rows_removed:
+            return scrolled
+        for row_index in self._renderer_rows_removed:
+            # Rows above the removed row move down, with a blank row inserted at the top of the board
+            row_bottom = self._renderer_board_row_offset_top + ((self._rows - row_index) * self._renderer_tetromino_block_height) - 1
+            if not iface.scroll_region(self._renderer_board_row_offset_top, row_bottom, self._renderer_tetromino_block_height):
+                break
+            scrolled += self._renderer_tetromino_block_height
+            # The rows drawn moved down with the screen, under a blank row (without the border)
+            if not self._renderer_rows_drawn is None:
+                del self._renderer_rows_drawn[row_index]
+                self._renderer_rows_drawn.append(None)
+            self._renderer_tetromino_rows = set(row - 1 if row > row_index else row for row in self._renderer_tetromino_rows if row != row_index)
+        self._renderer_rows_removed = []
+        return scrolled
+
+    def _renderer_scroll_saves(self, iface):
+        """
+        Return whether scrolling the screen for the removed rows sends fewer bytes than redrawing the rows that move
+        (the scroll region is the full width of the screen, so a scrolled score has to be drawn again)
+        """
+        block_width = self._renderer_tetromino_block_width
+        block_height = self._renderer_tetromino_block_height
+        lowest_row = min(self._renderer_rows_removed)
+        screen_columns = iface.get_size()[0]
+
+        # Rows from the lowest removed up to where the top of the stack was change
+        # (rows the tetromino was drawn over are redrawn either way)
+        redraw_cost = 0
+        for row_index in range(lowest_row, min(max(self._column_heights) + len(self._renderer_rows_removed), self._rows)):
+            if row_index in self._renderer_tetromino_rows:
+                continue
+            filled = self._board_fill[row_index]
+            line_cost = ((filled * TetrisBoard.RENDERER_COST_BOX_CHARACTER) + (self._columns - filled)) * block_width
+            redraw_cost += (line_cost + TetrisBoard.RENDERER_COST_BOARD_LINE) * block_height
+
+        scroll_cost = TetrisBoard.RENDERER_COST_SCROLL * len(self._renderer_rows_removed)
+        if self._renderer_score_show:
+            first_row, last_row = self._renderer_score_rows()
+            region_bottom = self._renderer_board_row_offset_top + ((self._rows - lowest_row) * block_height) - 1
+            if first_row <= region_bottom:
+                # Erased, then drawn in full
+                lines = len(self._renderer_rows_removed) * block_height
+                erase_columns = screen_columns - self._renderer_board_column_offset_right - 2
+                scroll_cost += (erase_columns + TetrisBoard.RENDERER_COST_SCORE_LINE) * (last_row - first_row + 1 + lines)
+                if self._renderer_score_use_font:
+                    for frow in Font.render_string("SCORE:") + Font.render_string(f"{self._score:0{self._renderer_score_digits}}"):
+                        scroll_cost += len(frow.encode("utf-8")) + TetrisBoard.RENDERER_COST_SCORE_LINE
+                else:
+                    scroll_cost += TetrisBoard.RENDERER_COST_SCORE_TEXT
+        return scroll_cost < redraw_cost
+
+    def _renderer_score_rows(self):
+        """
+        Return the first and last screen rows of the score
+        """
+        if self._renderer_score_use_font:
+            first_row = self._renderer_score_offset_row - Font.character_width
+            return (first_row, first_row + len(Font.render_string("SCORE:")) + len(Font.render_string("0")) - 1)
+        return (self._renderer_score_offset_row, self._renderer_score_offset_row + 1)
+
+    def _renderer_score_erase(self, iface, lines):
+        """
+        Erase the score after the screen has been scrolled down the given number of lines under it
+        (the scroll region is the full width of the screen, so the score moved with the board rows)
+        The score is then drawn in full by draw_score
+        """
+        if not self._renderer_score_show:
+            return
+        first_row, last_row = self._renderer_score_rows()
+        # The score is to the right of the board
+        first_column = self._renderer_board_column_offset_right + 2
+        screen_columns, screen_rows = iface.get_size()
+        blank_txt = " " * (screen_columns - first_column)
+        for row in range(max(first_row, 0), min(last_row + lines + 1, screen_rows)):
+            iface.print_str(blank_txt, columns=first_column, rows=row)
+        self._renderer_score_drawn = None
+
     def draw_board(self, iface, override_colour=None):
-        """ Render the game (includng score, etc) to the screen """
-        # Clear screen
-        iface.clear_screen()
+        """
+        Render the game (includng score, etc) to the screen
+        The screen is only cleared when the layout changes, otherwise just the parts which can change are drawn
+        """
+        self._renderer_redraw = False
+
+        # Check whether everything needs drawing
+        full_redraw = self._renderer_layout or override_colour != self._renderer_override_colour or not self._renderer_attr_iface is iface
+        self._renderer_layout = False
+        self._renderer_override_colour = override_colour
+        cell_attributes, border_attributes, text_attributes = self._renderer_attributes(iface, override_colour)
+
+        if not full_redraw:
+            # Move rows above any removed rows, if that's cheaper than redrawing them (which happens below)
+            if self._renderer_rows_removed and not self._renderer_scroll_saves(iface):
+                self._renderer_rows_removed = []
+            scrolled = self.draw_rows_removed(iface)
+            if scrolled > 0:
+                self._renderer_score_erase(iface, scrolled)
+
+        if full_redraw:
+            # Clear screen
+            self._renderer_rows_removed = []
+            self._renderer_score_drawn = None
+            self._renderer_rows_drawn = [None] * self._rows
+            iface.clear_screen()
+
+            # Draw bottom
+            bottom_txt = u'\u255A' + (u'\u2550' * (self._columns * self._renderer_tetromino_block_width)) + u'\u255D'
+            iface.print_str(bottom_txt, columns=self._renderer_board_column_offset_left, rows=self._renderer_board_row_offset_bottom, attributes=border_attributes)
+        else:
+            # Erase the tetromino from above the board (the board rows it was over are redrawn below)
+            blank_txt = " " * (self._columns * self._renderer_tetromino_block_width)
+            for row in range(max(self._renderer_board_row_offset_top - (4 * self._renderer_tetromino_block_height), 0), self._renderer_board_row_offset_top):
+                iface.print_str(blank_txt, columns=self._renderer_board_column_offset_left + 1, rows=row)
 
-        # Draw board with border
+        # Draw board with border, skipping rows already on screen (unless the tetromino was drawn over them)
+        rows_drawn = self._renderer_rows_drawn
         row_count = 0
         for row_index in range(self._rows-1, -1, -1):
+            # Build the row as runs of cells sharing the same colour
+            row_segments = []
+            for attributes, count in self._renderer_cell_runs(self._board[row_index], cell_attributes):
+                if not attributes is None:
+                    row_segments.append((u'\u2592' * (count * self._renderer_tetromino_block_width), attributes))
+                else:
+                    # Empty cells are drawn plain, so they match blank lines inserted on screen
+                    row_segments.append((" " * (count * self._renderer_tetromino_block_width), None))
+            row_segments.append((u'\u2551', border_attributes))
+            if row_segments == rows_drawn[row_index] and not row_index in self._renderer_tetromino_rows:
+                row_count += self._renderer_tetromino_block_height
+                continue
+            rows_drawn[row_index] = row_segments
+
             for repeat_row in range(0, self._renderer_tetromino_block_height):
-                iface.print_str(u'\u2551', columns=self._renderer_board_column_offset_left, rows=self._renderer_board_row_offset_top + row_count, attributes=iface.TXT_BOLD, colour=self.colour_override(iface, 8, override_colour))
-                row = self._board[row_index]
-                for cell in row:
-                    if cell > 0:
-                        cell_txt = u'\u2592' * self._renderer_tetromino_block_width
-                        iface.print_str(cell_txt, attributes=iface.TXT_NORMAL, colour=self.colour_override(iface, cell, override_colour))
-                    else:
-                        cell_txt = " " * self._renderer_tetromino_block_width
-                        iface.print_str(cell_txt, attributes=iface.TXT_BOLD, colour=self.colour_override(iface, cell, override_colour))
-                iface.print_str(u'\u2551', attributes=iface.TXT_BOLD, colour=self.colour_override(iface, 8, override_colour))
+                iface.print_str(u'\u2551', columns=self._renderer_board_column_offset_left, rows=self._renderer_board_row_offset_top + row_count, attributes=border_attributes)
+                for segment_txt, segment_attributes in row_segments:
+                    iface.print_str(segment_txt, attributes=segment_attributes)
                 row_count += 1
-        # Draw bottom
-        iface.print_str(u'\u255A', columns=self._renderer_board_column_offset_left, rows=self._renderer_board_row_offset_top + row_count, attributes=iface.TXT_BOLD, colour=self.colour_override(iface, 8, override_colour))
-        for repeat_column in range(0, self._columns * self._renderer_tetromino_block_width):
-            iface.print_str(u'\u2550', attributes=iface.TXT_BOLD, colour=self.colour_override(iface, 8, override_colour))
-        iface.print_str(u'\u255D', attributes=iface.TXT_BOLD, colour=self.colour_override(iface, 8, override_colour))
 
         # Show score
         if self._renderer_score_show:
-            #score_label_txt = "Score:"
-            score_label_txt = "SCORE:"
-            score_txt = f"{self._score:0{self._renderer_score_digits}}"
-            if self._renderer_score_use_font:
-                tmp_row = self._renderer_score_offset_row - Font.character_width
-                fdata = Font.render_string(score_label_txt)
-                for frow in fdata:
-                    iface.print_str(frow, columns=self._renderer_score_offset_column-math.floor(len(frow)/2), rows=tmp_row, attributes=iface.TXT_BOLD, colour=self.colour_override(iface, 255, override_colour))
-                    tmp_row += 1
-                fdata = Font.render_string(score_txt)
-                for frow in fdata:
-                    iface.print_str(frow, columns=self._renderer_score_offset_column-math.floor(len(frow)/2), rows=tmp_row, attributes=iface.TXT_BOLD, colour=self.colour_override(iface, 255, override_colour))
-                    tmp_row += 1
-
-            else:
-                iface.print_str(score_label_txt, columns=self._renderer_score_offset_column-math.floor(len(score_label_txt)/2), rows=self._renderer_score_offset_row, attributes=iface.TXT_BOLD, colour=self.colour_override(iface, 255, override_colour))
-                iface.print_str(score_txt, columns=self._renderer_score_offset_column-6, rows=self._renderer_score_offset_row+1, attributes=iface.TXT_BOLD, colour=self.colour_override(iface, 255, override_colour))
+            self.draw_score(iface, text_attributes)
 
         # Draw current tetromino
+        self._renderer_tetromino_rows = set()
         if not self._tetromino is None and not (self._tetromino.get_posX() is None or self._tetromino.get_posY() is None):
             # Get the block configuration to draw
             tetromino_state = self._tetromino.get_state()
 
-            # Calculate tetromino position
-            tetromino_position_x = self._renderer_board_column_offset_left + 1 + (self._renderer_tetromino_block_width * self._tetromino.get_posX())
-            tetromino_position_y = self._renderer_board_row_offset_bottom - (self._renderer_tetromino_block_height * (self._tetromino.get_posY() + tetromino_state.get_rows()))
+            # Draw where the tetromino will land (ghost piece), unless the board is greyed out
+            if override_colour is None:
+                drop_y = self.get_drop_position(position_y=self._tetromino.get_posY())
+                if drop_y < self._tetromino.get_posY():
+                    self._draw_tetromino(iface, tetromino_state, self._tetromino.get_posX(), drop_y, cell_attributes, u'\u2591')
 
             # Draw Tetromino
-            for blocks in tetromino_state.get_blocks():
+            self._draw_tetromino(iface, tetromino_state, self._tetromino.get_posX(), self._tetromino.get_posY(), cell_attributes, u'\u2592')
+
+    def _draw_tetromino(self, iface, tetromino_state, position_x, position_y, cell_attributes, block_txt):
+        """
+        Draw the blocks of a tetromino state at the given board position, using the given block character
+        """
+        # Calculate tetromino position
+        tetromino_position_x = self._renderer_board_column_offset_left + 1 + (self._renderer_tetromino_block_width * position_x)
+        tetromino_position_y = self._renderer_board_row_offset_bottom - (self._renderer_tetromino_block_height * (position_y + tetromino_state.get_rows()))
+        # The board rows drawn over are redrawn on the next draw
+        self._renderer_tetromino_rows.update(range(max(position_y, 0), min(position_y + tetromino_state.get_rows(), self._rows)))
+
+        for blocks in tetromino_state.get_blocks():
+            # Runs of blocks sharing the same colour, empty cells are skipped
+            runs = self._renderer_cell_runs(blocks, cell_attributes)
+            for repeat_row in range(0, self._renderer_tetromino_block_height):
                 # Set cursor position
-                for repeat_row in range(0, self._renderer_tetromino_block_height):
-                    iface.set_position(tetromino_position_x, tetromino_position_y)
-                    for cell in blocks:
-                        if cell > 0:
-                            cell_txt = u'\u2592' * self._renderer_tetromino_block_width
-                            iface.print_str(cell_txt, attributes=iface.TXT_NORMAL, colour=self.colour_override(iface, cell, override_colour))
-                        else:
-                            iface.skip_ch(self._renderer_tetromino_block_width)
-                    tetromino_position_y += 1
+                iface.set_position(tetromino_position_x, tetromino_position_y)
+                for attributes, count in runs:
+                    if not attributes is None:
+                        iface.print_str(block_txt * (count * self._renderer_tetromino_block_width), attributes=attributes)
+                    else:
+                        iface.skip_ch(count * self._renderer_tetromino_block_width)
+                tetromino_position_y += 1
+
+    def draw_score(self, iface, text_attributes):
+        """
+        Draw the score, only the digits which have changed since it was last drawn are redrawn
+        """
+        #score_label_txt = "Score:"
+        score_label_txt = "SCORE:"
+        score_txt = f"{self._score:0{self._renderer_score_digits}}"
+        score_drawn = self._renderer_score_drawn
+        if score_txt == score_drawn:
+            return
+        # Draw in full if the score has grown past the digits shown
+        if not score_drawn is None and len(score_drawn) != len(score_txt):
+            score_drawn = None
+        self._renderer_score_drawn = score_txt
+
+        if self._renderer_score_use_font:
+            tmp_row = self._renderer_score_offset_row - Font.character_width
+            if score_drawn is None:
+                fdata = Font.render_string(score_label_txt)
+                for frow in fdata:
+                    iface.print_str(frow, columns=self._renderer_score_offset_column-math.floor(len(frow)/2), rows=tmp_row, attributes=text_attributes)
+                    tmp_row += 1
+                fdata = Font.render_string(score_txt)
+                for frow in fdata:
+                    iface.print_str(frow, columns=self._renderer_score_offset_column-math.floor(len(frow)/2), rows=tmp_row, attributes=text_attributes)
+                    tmp_row += 1
+            else:
+                # Redraw the glyphs of the changed digits
+                tmp_row += len(Font.render_string(score_label_txt))
+                score_column = self._renderer_score_offset_column - math.floor((len(score_txt) * Font.character_width)/2)
+                for digit_index in range(0, len(score_txt)):
+                    if score_txt[digit_index] != score_drawn[digit_index]:
+                        digit_row = tmp_row
+                        for frow in Font.render_string(score_txt[digit_index]):
+                            iface.print_str(frow, columns=score_column + (digit_index * Font.character_width), rows=digit_row, attributes=text_attributes)
+                            digit_row += 1
+
+        else:
+            if score_drawn is None:
+                iface.print_str(score_label_txt, columns=self._renderer_score_offset_column-math.floor(len(score_label_txt)/2), rows=self._renderer_score_offset_row, attributes=text_attributes)
+            iface.print_str(score_txt, columns=self._renderer_score_offset_column-6, rows=self._renderer_score_offset_row+1, attributes=text_attributes)
 
     def draw_gameover(self, iface):
         """
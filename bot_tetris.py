@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""
+Pytuino Tetris bot
+
+Plays Tetris by trying every placement of the current tetromino that can be
+reached from where it is (rotating, sliding and moving down, so including
+placements tucked under overhangs), and scoring the resulting boards with a
+heuristic. Optionally the next tetromino is placed on each of the resulting
+boards as well (look-ahead).
+
+Boards are handled as tuples of row bit masks (bit 0 is the left column), the
+same as TetrisBitBoard. The placements found for a board and tetromino are
+memoized, as the same positions come up repeatedly in the look-ahead.
+
+Heuristic reference: https://codemyroad.wordpress.com/2013/04/14/tetris-ai-the-near-perfect-player/
+"""
+
+import collections
+import functools
+
+from board_tetris import Tetromino
+from sim_tetris import TetrisSim
+
+###############################################################################
+class TetrisBot:
+###############################################################################
+    """
+    Tetris player, choosing the moves for the current tetromino on a TetrisBoard
+    """
+
+    # Heuristic weights (aggregate height, lines cleared, holes, bumpiness)
+    WEIGHTS = (-0.510066, 0.760666, -0.35663, -0.184483)
+
+    # Moves tried from each position, as (action, rotation change, column change, row change)
+    MOVES = (
+        (TetrisSim.ACTION_LEFT, 0, -1, 0),
+        (TetrisSim.ACTION_RIGHT, 0, 1, 0),
+        (TetrisSim.ACTION_ROTATE_CLOCKWISE, 1, 0, 0),
+        (TetrisSim.ACTION_ROTATE_ANTICLOCKWISE, 3, 0, 0),
+        (TetrisSim.ACTION_DOWN, 0, 0, -1),
+    )
+
+    def __init__(self, lookahead=True, weights=None, cache_size=65536):
+        """
+        Initialise the bot
+
+            lookahead
+                Also place the next tetromino when scoring a placement
+            weights
+                Heuristic weights (default: WEIGHTS)
+            cache_size
+                Number of boards to keep the placements of
+        """
+        self._lookahead = lookahead
+        self._weights = TetrisBot.WEIGHTS if weights is None else weights
+
+        # Memoized placements of a tetromino on a board, and the heuristic score of a board
+        self.enumerate_placements = functools.lru_cache(maxsize=cache_size)(self._enumerate_placements)
+        self.score_board = functools.lru_cache(maxsize=cache_size)(self._score_board)
+
+    @staticmethod
+    def board_rows(board):
+        """
+        Return the occupied cells of a TetrisBoard as a tuple of row bit masks (bottom first)
+        """
+        board_bits = getattr(board, '_board_bits', None)
+        if not board_bits is None:
+            return tuple(board_bits[0:board._rows])
+
+        rows = []
+        for row_index in range(0, board._rows):
+            mask = 0
+            row = board._board[row_index]
+            for column_index in range(0, board._columns):
+                if row[column_index]:
+                    mask |= 1 << column_index
+            rows.append(mask)
+        return tuple(rows)
+
+    @staticmethod
+    def spawn_position(type, columns, rows):
+        """
+        Return the starting (rotation, column, row) of a tetromino on a board (see TetrisBoard.tetromino_start)
+        """
+        tetromino_state = Tetromino.get_composite(type)._pieces[0]
+        fudge_y = -1 if tetromino_state.get_columns() == 3 else 0
+        return (0, (columns // 2) - (tetromino_state.get_columns() // 2), rows + fudge_y)
+
+    @staticmethod
+    def _fits(rows, columns, masks, position_x, position_y):
+        """
+        Check whether tetromino row masks fit on the board at the given position (see TetrisBitBoard.check_tetromino_position)
+        """
+        full_mask = (1 << columns) - 1
+        num_rows = len(rows)
+
+        tmp_y = position_y + (len(masks) - 1)
+        for mask in masks:
+            if mask:
+                # Check the lower/upper row bounds (add an extra 4 rows for spawning)
+                if tmp_y < 0 or tmp_y >= (num_rows + 4):
+                    return False
+                # Move the row mask to the tetromino position, checking no blocks are shifted off the left edge
+                if position_x < 0:
+                    if mask & ((1 << -position_x) - 1):
+                        return False
+                    mask >>= -position_x
+                else:
+                    mask <<= position_x
+                # Check the right edge, and whether this overlaps existing blocks on the board
+                if mask > full_mask or (tmp_y < num_rows and rows[tmp_y] & mask):
+                    return False
+            tmp_y -= 1
+
+        return True
+
+    def _enumerate_placements(self, rows, columns, type, rotation, position_x, position_y):
+        """
+        Find every position the tetromino can come to rest in, starting from the given position
+        Placements leaving blocks above the board (game over) are not included
+        Returns a tuple of (actions, board rows after the placement, lines cleared)
+        The actions (TetrisSim.ACTION_*) move the tetromino to it's placement and drop it
+        """
+        pieces = [tetromino_state.get_masks() for tetromino_state in Tetromino.get_composite(type)._pieces]
+        num_rows = len(rows)
+
+        # Breadth first search of the positions reachable, so each placement has the shortest list of actions
+        start = (rotation, position_x, position_y)
+        if not TetrisBot._fits(rows, columns, pieces[rotation], position_x, position_y):
+            return ()
+        parents = { start: None }
+
+        # Above the highest block, the tetromino can move anywhere the board edges allow
+        # So move straight down to there first, rather than searching every row above the stack
+        stack_height = num_rows
+        while stack_height > 0 and rows[stack_height-1] == 0:
+            stack_height -= 1
+        while position_y > stack_height:
+            move = (rotation, position_x, position_y - 1)
+            parents[move] = (start, TetrisSim.ACTION_DOWN)
+            start = move
+            position_y -= 1
+        queue = collections.deque([start])
+        placements = []
+        placed_boards = set()
+        while len(queue) > 0:
+            position = queue.popleft()
+            rotation, position_x, position_y = position
+
+            for action, change_rotation, change_x, change_y in TetrisBot.MOVES:
+                move = ((rotation + change_rotation) % 4, position_x + change_x, position_y + change_y)
+                if move in parents:
+                    continue
+                if TetrisBot._fits(rows, columns, pieces[move[0]], move[1], move[2]):
+                    parents[move] = (position, action)
+                    queue.append(move)
+                elif action == TetrisSim.ACTION_DOWN:
+                    # Can't move down, so the tetromino would be attached here
+                    masks = pieces[rotation]
+                    board = list(rows)
+                    tmp_y = position_y + (len(masks) - 1)
+                    above = False
+                    for mask in masks:
+                        if mask:
+                            if tmp_y >= num_rows:
+                                above = True
+                                break
+                            board[tmp_y] |= mask << position_x if position_x >= 0 else mask >> -position_x
+                        tmp_y -= 1
+                    if above:
+                        continue
+
+                    # Remove full rows
+                    full_mask = (1 << columns) - 1
+                    board = [mask for mask in board if mask != full_mask]
+                    lines = num_rows - len(board)
+                    board = tuple(board + ([0] * lines))
+                    # Rotations of symmetric tetrominos can give the same board
+                    if board in placed_boards:
+                        continue
+                    placed_boards.add(board)
+
+                    # Work back to the start for the actions, dropping (rather than moving down) at the end
+                    actions = [TetrisSim.ACTION_DROP]
+                    parent = parents[position]
+                    while not parent is None and parent[1] == TetrisSim.ACTION_DOWN:
+                        parent = parents[parent[0]]
+                    while not parent is None:
+                        actions.append(parent[1])
+                        parent = parents[parent[0]]
+                    actions.reverse()
+                    placements.append((tuple(actions), board, lines))
+
+        return tuple(placements)
+
+    def _score_board(self, rows, columns):
+        """
+        Return the heuristic score of a board (without the lines cleared)
+        """
+        heights = [0] * columns
+        holes = 0
+        # Scan down from the top, finding the highest block of each column and the spaces below them
+        covered = 0
+        for row_index in range(len(rows)-1, -1, -1):
+            mask = rows[row_index]
+            top = mask & ~covered
+            while top:
+                column_mask = top & -top
+                heights[column_mask.bit_length() - 1] = row_index + 1
+                top ^= column_mask
+            holes += (covered & ~mask).bit_count()
+            covered |= mask
+
+        bumpiness = 0
+        for column_index in range(0, columns - 1):
+            bumpiness += abs(heights[column_index] - heights[column_index + 1])
+
+        return (self._weights[0] * sum(heights)) + (self._weights[2] * holes) + (self._weights[3] * bumpiness)
+
+    def choose(self, board):
+        """
+        Choose the placement of the current tetromino on the given TetrisBoard
+        Returns the list of actions (TetrisSim.ACTION_*) to make, or None if there is no placement
+        """
+        tetromino = board.get_current_tetromino()
+        if tetromino is None:
+            return None
+        rows = TetrisBot.board_rows(board)
+        columns = board._columns
+
+        next_type = None
+        if self._lookahead:
+            next_type = board.get_next_tetromino(remove=False).get_type()
+
+        best_score = None
+        best_actions = None
+        for actions, placed_rows, lines in self.enumerate_placements(rows, columns, tetromino.get_type(), tetromino.get_rotation(), tetromino.get_posX(), tetromino.get_posY()):
+            score = self.score_board(placed_rows, columns) + (self._weights[1] * lines)
+
+            # Add the best placement of the next tetromino (if it can be placed)
+            if not next_type is None:
+                next_score = None
+                for next_actions, next_rows, next_lines in self.enumerate_placements(placed_rows, columns, next_type, *TetrisBot.spawn_position(next_type, columns, len(rows))):
+                    tmp_score = self.score_board(next_rows, columns) + (self._weights[1] * (lines + next_lines))
+                    if next_score is None or tmp_score > next_score:
+                        next_score = tmp_score
+                if not next_score is None:
+                    score = next_score
+
+            if best_score is None or score > best_score:
+                best_score = score
+                best_actions = actions
+
+        return None if best_actions is None else list(best_actions)
+
+# Main
+###############################################################################
+if __name__ == '__main__':
+    import time
+
+    # Play some games, and report how well (and fast) the bot plays
+    bot = TetrisBot()
+    sim = TetrisSim()
+    num_games = 3
+    max_pieces = 500
+    for seed in range(0, num_games):
+        start = time.perf_counter()
+        state = sim.reset(seed)
+        game_over = False
+        while not game_over and state['pieces'] <= max_pieces:
+            actions = bot.choose(sim.get_board())
+            if actions is None:
+                break
+            for action in actions:
+                state, lines, game_over = sim.step(action)
+        elapsed = time.perf_counter() - start
+        print(f"Game: {seed}	Pieces: {state['pieces']}	Lines: {state['lines']}	Score: {state['score']}	Pieces/sec: {state['pieces']/elapsed:.1f}")
+    print(f"Placement cache: {bot.enumerate_placements.cache_info()}")
@@ -5,6 +5,8 @@ Sizeable font for text displays
 Provides a sizeable font for text terminals using the box drawing characters
 """
 
+import functools
+
 ###############################################################################
 class Glyph:
 ###############################################################################
@@ -109,100 +111,8 @@ class Glyph:
         """
         Class to encapsulate a single character
         """
-        self._glyph = []
-
-        if character == ' ':
-            self._glyph = self._create(self.GLYPH_SPACE)
-        if character == '.':
-            self._glyph = self._create(self.GLYPH_PERIOD)
-        if character == ':':
-            self._glyph = self._create(self.GLYPH_COLON)
-
-        if character == '0':
-            self._glyph = self._create(self.GLYPH_0)
-        if character == '1':
-            self._glyph = self._create(self.GLYPH_1)
-        if character == '2':
-            self._glyph = self._create(self.GLYPH_2)
-        if character == '3':
-            self._glyph = self._create(self.GLYPH_3)
-        if character == '4':
-            self._glyph = self._create(self.GLYPH_4)
-        if character == '5':
-            self._glyph = self._create(self.GLYPH_5)
-        if character == '6':
-            self._glyph = self._create(self.GLYPH_6)
-        if character == '7':
-            self._glyph = self._create(self.GLYPH_7)
-        if character == '8':
-            self._glyph = self._create(self.GLYPH_8)
-        if character == '9':
-            self._glyph = self._create(self.GLYPH_9)
-
-        if character == 'A':
-            self._glyph = self._create(self.GLYPH_A)
-        if character == 'B':
-            self._glyph = self._create(self.GLYPH_B)
-        if character == 'C':
-            self._glyph = self._create(self.GLYPH_C)
-        if character == 'D':
-            self._glyph = self._create(self.GLYPH_D)
-        if character == 'E':
-            self._glyph = self._create(self.GLYPH_E)
-        if character == 'F':
-            self._glyph = self._create(self.GLYPH_F)
-        if character == 'G':
-            self._glyph = self._create(self.GLYPH_G)
-        if character == 'H':
-            self._glyph = self._create(self.GLYPH_H)
-        if character == 'I':
-            self._glyph = self._create(self.GLYPH_I)
-        if character == 'J':
-            self._glyph = self._create(self.GLYPH_J)
-        if character == 'K':
-            self._glyph = self._create(self.GLYPH_K)
-        if character == 'L':
-            self._glyph = self._create(self.GLYPH_L)
-        if character == 'M':
-            self._glyph = self._create(self.GLYPH_M)
-        if character == 'N':
-            self._glyph = self._create(self.GLYPH_N)
-        if character == 'O':
-            self._glyph = self._create(self.GLYPH_O)
-        if character == 'P':
-            self._glyph = self._create(self.GLYPH_P)
-        if character == 'Q':
-            self._glyph = self._create(self.GLYPH_Q)
-        if character == 'R':
-            self._glyph = self._create(self.GLYPH_R)
-        if character == 'S':
-            self._glyph = self._create(self.GLYPH_S)
-        if character == 'T':
-            self._glyph = self._create(self.GLYPH_T)
-        if character == 'U':
-            self._glyph = self._create(self.GLYPH_U)
-        if character == 'V':
-            self._glyph = self._create(self.GLYPH_V)
-        if character == 'W':
-            self._glyph = self._create(self.GLYPH_W)
-        if character == 'X':
-            self._glyph = self._create(self.GLYPH_X)
-        if character == 'Y':
-            self._glyph = self._create(self.GLYPH_Y)
-        if character == 'Z':
-            self._glyph = self._create(self.GLYPH_Z)
-
-
-    def _create(self, prototype):
-        """
-        Concatenate glyph components together
-        """
-        glyph = []
-        for row in prototype:
-            tmp_row = u"".join(row)
-            glyph.append(tmp_row)
-
-        return glyph
+        # Unsupported characters have no rows
+        self._glyph = list(GLYPH_TABLE.get(character, ()))
 
     def __str__(self):
         rtn = u""
@@ -219,6 +129,19 @@ class Glyph:
     def get_height(self):
         return len(self._glyph)
 
+# Rendered rows of each supported character, built once from the glyph prototypes
+GLYPH_TABLE = { character: tuple(u"".join(row) for row in prototype) for character, prototype in (
+    (' ', Glyph.GLYPH_SPACE), ('.', Glyph.GLYPH_PERIOD), (':', Glyph.GLYPH_COLON),
+    ('0', Glyph.GLYPH_0), ('1', Glyph.GLYPH_1), ('2', Glyph.GLYPH_2), ('3', Glyph.GLYPH_3), ('4', Glyph.GLYPH_4),
+    ('5', Glyph.GLYPH_5), ('6', Glyph.GLYPH_6), ('7', Glyph.GLYPH_7), ('8', Glyph.GLYPH_8), ('9', Glyph.GLYPH_9),
+    ('A', Glyph.GLYPH_A), ('B', Glyph.GLYPH_B), ('C', Glyph.GLYPH_C), ('D', Glyph.GLYPH_D), ('E', Glyph.GLYPH_E),
+    ('F', Glyph.GLYPH_F), ('G', Glyph.GLYPH_G), ('H', Glyph.GLYPH_H), ('I', Glyph.GLYPH_I), ('J', Glyph.GLYPH_J),
+    ('K', Glyph.GLYPH_K), ('L', Glyph.GLYPH_L), ('M', Glyph.GLYPH_M), ('N', Glyph.GLYPH_N), ('O', Glyph.GLYPH_O),
+    ('P', Glyph.GLYPH_P), ('Q', Glyph.GLYPH_Q), ('R', Glyph.GLYPH_R), ('S', Glyph.GLYPH_S), ('T', Glyph.GLYPH_T),
+    ('U', Glyph.GLYPH_U), ('V', Glyph.GLYPH_V), ('W', Glyph.GLYPH_W), ('X', Glyph.GLYPH_X), ('Y', Glyph.GLYPH_Y),
+    ('Z', Glyph.GLYPH_Z),
+) }
+
 ###############################################################################
 class Font:
 ###############################################################################
@@ -228,27 +151,23 @@ class Font:
 
     character_width = 3
 
+    # Number of rendered strings to keep (score label, score, game over, ...)
+    render_cache_size = 64
+
     @staticmethod
+    @functools.lru_cache(maxsize=render_cache_size)
     def render_string(string):
         """
         Convert the given string in to the equivalent box character glyphs
+        Returns a tuple of rows, rendered strings are cached (the score is redrawn every frame)
+        Unsupported characters are skipped
         """
-        rtn = []
-
-        if len(string) > 0:
-            glyphs = []
-            # Convert characters to glyphs
-            for char in string:
-                glyphs.append(Glyph(char))
+        glyphs = [GLYPH_TABLE[char] for char in string if char in GLYPH_TABLE]
+        if len(glyphs) == 0:
+            return ()
 
-            # Generate string by concating each row of the glyphs
-            for i in range(0, glyphs[0].get_height()):
-                rtn_row = u""
-                for glyph in glyphs:
-                    rtn_row += glyph.get_data()[i]
-                rtn.append(rtn_row)
-
-        return rtn
+        # Generate string by concating each row of the glyphs
+        return tuple(u"".join(glyph_rows) for glyph_rows in zip(*glyphs))
 
 # Main
 ###############################################################################
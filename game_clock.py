@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Pytuino game clocks
+
+Clocks provide the current time (in milliseconds) to the game. The monotonic
+clock is used for play, as it is cheap to read and isn't affected by changes
+to the system time. The manual clock only moves when told to, for tests and
+replays.
+"""
+
+import time
+
+###############################################################################
+class MonotonicClock:
+###############################################################################
+    """
+    Clock based on the system monotonic timer
+    """
+
+    def now(self):
+        """ Return the current time in milliseconds """
+        return time.monotonic_ns() // 1000000
+
+###############################################################################
+class ManualClock:
+###############################################################################
+    """
+    Clock that is moved forward explicitly
+    """
+
+    def __init__(self, start=0):
+        """
+        Initialise the clock
+
+            start
+                Starting time in milliseconds
+        """
+        self._now = start
+
+    def advance(self, milliseconds):
+        """ Move the clock forward by the given number of milliseconds """
+        self._now += milliseconds
+
+    def now(self):
+        """ Return the current time in milliseconds """
+        return self._now
+
+    def set(self, milliseconds):
+        """ Set the current time in milliseconds """
+        self._now = milliseconds
+
+# Main
+###############################################################################
+if __name__ == '__main__':
+    clock = MonotonicClock()
+    start = clock.now()
+    time.sleep(0.1)
+    print(f"Slept for: {clock.now() - start}ms")
+
+    clock = ManualClock()
+    clock.advance(1000)
+    print(f"Manual clock: {clock.now()}ms")
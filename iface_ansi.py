@@ -0,0 +1,832 @@
+#!/usr/bin/env python3
+"""
+Pytuino interface (ANSI/VT100)
+
+Pytuino has a number of interface options, this drives a terminal directly
+using ANSI/VT100 escape sequences written to a byte stream (a pty, a socket,
+a serial device file). The cursor position and current attributes are
+tracked so escape sequences are only sent when they are actually needed, and
+output is buffered until redraw so each frame is sent with a single write.
+Cursor moves use whichever sequence costs the fewest bytes.
+
+The rate the link to the terminal can carry (a configured baud rate, or
+measured from how fast the output queue drains) is tracked, so a frame can be
+held back while the last is still being sent (see link_wait), rather than
+queueing frames the terminal shows ever later.
+"""
+
+import os
+import select
+import sys
+import time
+
+from game_clock import MonotonicClock
+
+###############################################################################
+class PytuinoIface:
+###############################################################################
+    """
+    Provides an ANSI/VT100 escape sequence based interface to the display/keyboard
+    """
+
+    # Key codes (same values as curses)
+    KEY_DOWN = 0x102
+    KEY_UP = 0x103
+    KEY_LEFT = 0x104
+    KEY_RIGHT = 0x105
+    KEY_RESIZE = 0x19A
+
+    # Attributes (colour pair index is held in bits 8-15, as curses)
+    TXT_NORMAL = 0
+    TXT_BOLD = 0x10000
+    TXT_REVERSE = 0x20000
+
+    COLOUR_DEFAULT = -1
+    COLOUR_BLACK = 0
+    COLOUR_RED = 1
+    COLOUR_GREEN = 2
+    COLOUR_YELLOW = 3
+    COLOUR_BLUE = 4
+    COLOUR_MAGENTA = 5
+    COLOUR_CYAN = 6
+    COLOUR_WHITE = 7
+    COLOUR_ORANGE = COLOUR_WHITE + 1
+    COLOUR_PINK = COLOUR_WHITE + 2
+    COLOUR_GREY = COLOUR_WHITE + 3
+
+    # Extended colours as (256 colour palette index, 8 colour fallback)
+    COLOUR_EXTENDED = {
+        COLOUR_ORANGE: (208, COLOUR_YELLOW),
+        COLOUR_PINK: (205, COLOUR_MAGENTA),
+        COLOUR_GREY: (244, COLOUR_WHITE),
+    }
+
+    # Attribute state of a freshly reset terminal (bold, reverse, foreground, background)
+    SGR_RESET = (False, False, COLOUR_DEFAULT, COLOUR_DEFAULT)
+
+    # Time between checks of the output queue, while the link rate is unknown (in seconds)
+    LINK_POLL_INTERVAL = 0.01
+    # Shortest time the output queue is sampled over to measure the link rate (in seconds)
+    LINK_SAMPLE_TIME = 0.05
+
+    def __init__(self, output=None, input=None, columns=None, rows=None, colours=256, has_scroll_region=True, baud=None, clock=None):
+        """
+        Initialise ANSI interface handling
+
+        output
+            Binary stream to write to (default: stdout)
+        input
+            File object, or file descriptor, to read keys from (default: stdin)
+            -1 for none, the keys are then given to the interface with feed (a socket read by an event loop)
+        columns
+            Screen width (default: terminal size if output is a terminal, otherwise 80)
+        rows
+            Screen height (default: terminal size if output is a terminal, otherwise 24)
+        colours
+            Number of colours supported by the terminal (0 disables colour)
+        has_scroll_region
+            Whether the terminal supports scroll regions (DECSTBM) and insert line (IL)
+        baud
+            Rate of the link to the terminal in bits per second (default: measured, if the output queue can be read)
+        clock
+            Clock the link is timed against (default: MonotonicClock)
+        """
+        if output is None:
+            output = sys.stdout.buffer
+        if input is None:
+            input = sys.stdin
+        self._output = output
+        self._input_fd = input if isinstance(input, int) else input.fileno()
+        # Keys read, but not yet returned
+        self._input_buffer = b""
+        # Flag: Screen has changed size (reported as KEY_RESIZE)
+        self._resized = False
+
+        if clock is None:
+            clock = MonotonicClock()
+        self._clock = clock
+        # Link rate (in bytes per second, 10 bits a byte as 8N1), None until measured
+        self._link_rate = None if baud is None else baud / 10
+        self._link_rate_measured = baud is None
+        # File descriptor the output queue is read from (None if it can't be)
+        self._link_fd = None
+        try:
+            self._link_fd = self._output.fileno()
+        except (AttributeError, OSError, ValueError):
+            pass
+        if self._link_queue() is None:
+            self._link_fd = None
+        # Output queue when last sampled as (time, bytes)
+        self._link_sample = None
+        # Time the data written will have been sent by (estimated from the link rate, if the queue can't be read)
+        self._link_clear_time = 0
+        # Average size of a frame (in bytes)
+        self._frame_bytes = None
+
+        # Put the terminal(s) in to a mode suitable for direct control
+        self._terminal_modes = []
+        self._set_terminal_mode()
+        # Flag: A line feed only moves the cursor down (keeping it's column), as output processing is off
+        # Otherwise (sockets, pipes, a terminal that translates NL) where it leaves the cursor is unknown
+        self._line_feed_down = False
+        try:
+            self._line_feed_down = self._output.fileno() in [mode[0] for mode in self._terminal_modes]
+        except (AttributeError, OSError, ValueError):
+            pass
+
+        # Store screen size
+        if columns is None or rows is None:
+            tmp_columns, tmp_rows = 80, 24
+            try:
+                tmp_columns, tmp_rows = os.get_terminal_size(self._output.fileno())
+            except (AttributeError, OSError, ValueError):
+                pass
+            if columns is None:
+                columns = tmp_columns
+            if rows is None:
+                rows = tmp_rows
+        self._columns = columns
+        self._rows = rows
+
+        # Store terminal capabilities
+        self._has_scroll_region = has_scroll_region
+
+        # Store max colours
+        self._max_colours = colours
+        self._has_color = colours > 0
+
+        # Colour pairs (index: (foreground, background))
+        self._colour_pairs = {}
+        # Cache of attribute words to attribute states
+        self._sgr_states = {}
+
+        # Output buffer, sent on redraw
+        self._buffer = []
+        # Bytes of a frame the output couldn't take (a full non-blocking stream), sent first by the next redraw
+        self._output_pending = b""
+        # Terminal cursor position (None if unknown)
+        self._cursor_column = None
+        self._cursor_row = None
+        # Position of the next print
+        self._position_column = 0
+        self._position_row = 0
+        # Terminal attribute state (None if unknown)
+        self._sgr_state = None
+        # Text/attribute state of each cell on the terminal (None if unknown)
+        self._screen_txt = [[' '] * self._columns for i in range(self._rows)]
+        self._screen_attr = [[None] * self._columns for i in range(self._rows)]
+
+        # Initialise colour pairs
+        self.init_pair(1, PytuinoIface.COLOUR_CYAN, PytuinoIface.COLOUR_BLACK)
+        self.init_pair(2, PytuinoIface.COLOUR_BLUE, PytuinoIface.COLOUR_BLACK)
+        self.init_pair(3, PytuinoIface.COLOUR_ORANGE, PytuinoIface.COLOUR_BLACK)
+        self.init_pair(4, PytuinoIface.COLOUR_YELLOW, PytuinoIface.COLOUR_BLACK)
+        self.init_pair(5, PytuinoIface.COLOUR_GREEN, PytuinoIface.COLOUR_BLACK)
+        self.init_pair(6, PytuinoIface.COLOUR_RED, PytuinoIface.COLOUR_BLACK)
+        self.init_pair(7, PytuinoIface.COLOUR_MAGENTA, PytuinoIface.COLOUR_BLACK)
+        self.init_pair(8, PytuinoIface.COLOUR_PINK, PytuinoIface.COLOUR_BLACK)
+
+        self.init_pair(254, PytuinoIface.COLOUR_GREY, PytuinoIface.COLOUR_BLACK)
+        self.init_pair(255, PytuinoIface.COLOUR_WHITE, PytuinoIface.COLOUR_BLACK)
+
+        # Make cursor invisible, and start from a blank screen
+        self._emit("\x1b[?25l")
+        self.clear_screen()
+        self.redraw()
+
+    def _set_terminal_mode(self):
+        """
+        Turn off echo/line buffering on input, and output processing (so a line feed only moves down)
+        """
+        try:
+            import termios
+        except ImportError:
+            return
+
+        tmp_fds = []
+        if isinstance(self._input_fd, int):
+            tmp_fds.append((self._input_fd, True))
+        try:
+            tmp_fds.append((self._output.fileno(), False))
+        except (AttributeError, OSError, ValueError):
+            pass
+
+        for fd, is_input in tmp_fds:
+            if not os.isatty(fd) or fd in [mode[0] for mode in self._terminal_modes]:
+                continue
+            self._terminal_modes.append((fd, termios.tcgetattr(fd)))
+            mode = termios.tcgetattr(fd)
+            if is_input:
+                mode[3] &= ~(termios.ECHO | termios.ICANON)
+                mode[6][termios.VMIN] = 1
+                mode[6][termios.VTIME] = 0
+            mode[1] &= ~termios.OPOST
+            termios.tcsetattr(fd, termios.TCSAFLUSH, mode)
+
+    def _emit(self, txt):
+        """
+        Add text/escape sequence to the output buffer
+        """
+        self._buffer.append(txt)
+
+    def _move_cursor(self, column, row):
+        """
+        Move the terminal cursor to the given position (if not already there)
+        """
+        if column == self._cursor_column and row == self._cursor_row:
+            return
+        self._emit(self._plan_move(column, row))
+        self._cursor_column = column
+        self._cursor_row = row
+
+    def _plan_move(self, column, row):
+        """
+        Return the cheapest (fewest bytes) sequence moving the cursor to the given position
+
+        Chooses between an absolute move (CUP), relative moves (CUU/CUD/CUF/CUB),
+        carriage return/line feeds (only when the output is a terminal with output
+        processing off), backspaces, or rewriting the characters known to be under
+        the cursor
+        """
+        # Absolute move
+        if column == 0:
+            best = "\x1b[H" if row == 0 else f"\x1b[{row+1}H"
+        else:
+            best = f"\x1b[{row+1};{column+1}H"
+        if self._cursor_column is None or self._cursor_row is None:
+            return best
+
+        # Vertical component (column is unchanged)
+        move_rows = row - self._cursor_row
+        if move_rows == 0:
+            vertical = ""
+        elif move_rows > 0:
+            vertical = "\x1b[B" if move_rows == 1 else f"\x1b[{move_rows}B"
+            if move_rows < len(vertical) and self._line_feed_down:
+                vertical = "\n" * move_rows
+        else:
+            vertical = "\x1b[A" if move_rows == -1 else f"\x1b[{-move_rows}A"
+        if len(vertical) >= len(best):
+            return best
+
+        # Horizontal component, either from the current column or from the left edge
+        # (rewritten characters may be more than 1 byte, so compare encoded lengths)
+        best_cost = len(best)
+        move = vertical + self._plan_move_horizontal(self._cursor_column, column, row)
+        move_cost = len(move.encode("utf-8"))
+        if move_cost < best_cost:
+            best, best_cost = move, move_cost
+        if column < self._cursor_column:
+            move = vertical + "\r" + self._plan_move_horizontal(0, column, row)
+            move_cost = len(move.encode("utf-8"))
+            if move_cost < best_cost:
+                best, best_cost = move, move_cost
+
+        return best
+
+    def _plan_move_horizontal(self, column_from, column_to, row):
+        """
+        Return the cheapest sequence moving the cursor along a row
+        """
+        move_columns = column_to - column_from
+        if move_columns == 0:
+            return ""
+        if move_columns < 0:
+            move = "\x1b[D" if move_columns == -1 else f"\x1b[{-move_columns}D"
+            if -move_columns < len(move):
+                move = "\b" * -move_columns
+            return move
+
+        move = "\x1b[C" if move_columns == 1 else f"\x1b[{move_columns}C"
+        # Rewrite the characters under the cursor, if they are known and use the current attributes
+        if move_columns <= len(move) and not self._sgr_state is None:
+            screen_attr = self._screen_attr[row]
+            for tmp_column in range(column_from, column_to):
+                if screen_attr[tmp_column] != self._sgr_state:
+                    return move
+            rewrite = u"".join(self._screen_txt[row][column_from:column_to])
+            if len(rewrite.encode("utf-8")) < len(move):
+                move = rewrite
+        return move
+
+    def _sgr_colour(self, colour, base):
+        """
+        Return the SGR parameter selecting the given colour (base: 30 foreground, 40 background)
+        """
+        if colour < 0:
+            return str(base + 9)
+        if colour in PytuinoIface.COLOUR_EXTENDED:
+            extended = PytuinoIface.COLOUR_EXTENDED[colour]
+            if self._max_colours >= 256:
+                return f"{base + 8};5;{extended[0]}"
+            colour = extended[1]
+        return str(base + colour)
+
+    def _sgr_state_of(self, attr_combined):
+        """
+        Return the attribute state for the given attribute word
+        """
+        state = self._sgr_states.get(attr_combined)
+        if state is None:
+            foreground, background = PytuinoIface.COLOUR_DEFAULT, PytuinoIface.COLOUR_DEFAULT
+            if self._has_color:
+                foreground, background = self._colour_pairs.get((attr_combined >> 8) & 0xFF, (foreground, background))
+            state = (bool(attr_combined & PytuinoIface.TXT_BOLD), bool(attr_combined & PytuinoIface.TXT_REVERSE), foreground, background)
+            self._sgr_states[attr_combined] = state
+        return state
+
+    def _set_attributes(self, attr_combined):
+        """
+        Change the terminal attributes to those given (if not already set)
+        """
+        state = self._sgr_state_of(attr_combined)
+        if state == self._sgr_state:
+            return
+        self._emit(self._sgr_change(self._sgr_state, state))
+        self._sgr_state = state
+
+    def _sgr_change(self, current, state):
+        """
+        Return the SGR sequence changing the terminal from one attribute state to another (current None if unknown)
+        """
+        params = []
+        # Attributes can only be turned off by a reset
+        if current is None or (current[0] and not state[0]) or (current[1] and not state[1]):
+            params.append("0")
+            current = PytuinoIface.SGR_RESET
+        if state[0] and not current[0]:
+            params.append("1")
+        if state[1] and not current[1]:
+            params.append("7")
+        if state[2] != current[2]:
+            params.append(self._sgr_colour(state[2], 30))
+        if state[3] != current[3]:
+            params.append(self._sgr_colour(state[3], 40))
+        return f"\x1b[{';'.join(params)}m"
+
+    def close(self):
+        """
+        Returns the terminal to the original settings
+        """
+        self._set_attributes(PytuinoIface.TXT_NORMAL)
+        self._move_cursor(0, self._rows - 1)
+        self._emit("\x1b[?25h\r\n")
+        self.redraw()
+
+        try:
+            import termios
+        except ImportError:
+            return
+        for fd, mode in reversed(self._terminal_modes):
+            termios.tcsetattr(fd, termios.TCSAFLUSH, mode)
+        self._terminal_modes = []
+
+    def attr_combine(self, attributes=None, colour=None):
+        """
+        Combine attributes and colour in to a single attribute word
+        This can be passed to print_str as attributes (with no colour), saving the work on each call
+
+        attributes
+            Attributes to use
+        colour
+            Colour attributes
+        """
+        attr_combined = 0
+        if not attributes is None:
+            attr_combined |= attributes
+        if not colour is None and self._has_color:
+            attr_combined |= colour
+        return attr_combined
+
+    def clear_screen(self):
+        """
+        Clear the screen
+        """
+        # Erase uses the current background colour
+        self._set_attributes(PytuinoIface.TXT_NORMAL)
+        self._emit("\x1b[H\x1b[2J")
+        self._cursor_column = 0
+        self._cursor_row = 0
+        self._screen_txt = [[' '] * self._columns for i in range(self._rows)]
+        self._screen_attr = [[self._sgr_state] * self._columns for i in range(self._rows)]
+
+    def get_size(self):
+        """ Return the screen size as (columns, rows) """
+        return (self._columns, self._rows)
+
+    def color_pair(self, colour_index):
+        """Equivalent of curses color_pair"""
+        return (colour_index & 0xFF) << 8
+
+    def _read_input(self):
+        """
+        Read any waiting input in to the input buffer
+        """
+        if not isinstance(self._input_fd, int) or self._input_fd < 0:
+            return
+        while select.select([self._input_fd], [], [], 0)[0]:
+            data = os.read(self._input_fd, 64)
+            if not data:
+                break
+            self._input_buffer += data
+
+    def feed(self, data):
+        """
+        Add input received elsewhere to the keys waiting to be returned
+
+        data
+            Bytes received from the terminal
+        """
+        self._input_buffer += data
+
+    def resize(self, columns, rows):
+        """
+        Change the screen size (as reported by the terminal), the next key returned is KEY_RESIZE
+        The screen is cleared on the next redraw
+
+        columns
+            Screen width
+        rows
+            Screen height
+        """
+        if columns == self._columns and rows == self._rows:
+            return
+        self._columns = columns
+        self._rows = rows
+        self.clear_screen()
+        self._resized = True
+
+    def get_key(self):
+        """
+        Return a key(code) if any are pressed (non blocking), otherwise -1
+        """
+        if self._resized:
+            self._resized = False
+            return PytuinoIface.KEY_RESIZE
+        if len(self._input_buffer) < 3:
+            self._read_input()
+        if len(self._input_buffer) == 0:
+            return -1
+        # Fed input can split an escape sequence, so wait for the rest of it
+        if self._input_fd == -1 and self._input_buffer in (b"\x1b", b"\x1b[", b"\x1bO"):
+            return -1
+
+        # Cursor keys (ESC [ x, or ESC O x in application mode)
+        if self._input_buffer[0] == 0x1b and len(self._input_buffer) >= 3 and self._input_buffer[1] in b"[O":
+            key = {
+                ord('A'): PytuinoIface.KEY_UP,
+                ord('B'): PytuinoIface.KEY_DOWN,
+                ord('C'): PytuinoIface.KEY_RIGHT,
+                ord('D'): PytuinoIface.KEY_LEFT,
+            }.get(self._input_buffer[2])
+            if not key is None:
+                self._input_buffer = self._input_buffer[3:]
+                return key
+
+        key = self._input_buffer[0]
+        self._input_buffer = self._input_buffer[1:]
+        return key
+
+    def wait_key(self, timeout=None):
+        """
+        Wait for a key press, returning the key(code), or -1 if none is pressed before the timeout
+        With no input to wait on (fed input), it returns straight away
+
+        timeout
+            Maximum time to wait in seconds (None waits forever)
+        """
+        if len(self._input_buffer) == 0 and not self._resized and isinstance(self._input_fd, int) and self._input_fd >= 0:
+            select.select([self._input_fd], [], [], None if timeout is None else max(0, timeout))
+        return self.get_key()
+
+    def get_keyframe(self):
+        """
+        Return the screen as last sent by redraw, encoded as bytes that draw it on a terminal in any state
+        Sent to a terminal joining part way through (a spectator), or one that has missed frames, after which
+        it's in the state the interface expects, so is sent the following frames as normal
+        """
+        parts = ["\x1b[?25l\x1b[0m\x1b[H\x1b[2J"]
+        current = PytuinoIface.SGR_RESET
+        cursor_column = 0
+        cursor_row = 0
+        for row in range(0, self._rows):
+            screen_txt = self._screen_txt[row]
+            screen_attr = self._screen_attr[row]
+            for column in range(0, self._columns):
+                attr = screen_attr[column]
+                if attr is None:
+                    attr = PytuinoIface.SGR_RESET
+                # Blank cells are already there after the erase
+                if screen_txt[column] == ' ' and attr == PytuinoIface.SGR_RESET:
+                    continue
+                if column != cursor_column or row != cursor_row:
+                    parts.append(f"\x1b[{row+1};{column+1}H")
+                if attr != current:
+                    parts.append(self._sgr_change(current, attr))
+                    current = attr
+                parts.append(screen_txt[column])
+                cursor_column = column + 1
+                cursor_row = row
+
+        # Leave the terminal as the interface expects it
+        if not self._cursor_column is None and not self._cursor_row is None:
+            parts.append(f"\x1b[{self._cursor_row+1};{self._cursor_column+1}H")
+        if not self._sgr_state is None and self._sgr_state != current:
+            parts.append(self._sgr_change(current, self._sgr_state))
+        return u"".join(parts).encode("utf-8")
+
+    def init_pair(self, index, foreground, background):
+        """
+        Create colour pairs which are later refenced when inserting text
+
+        index
+            Index of colour pair ro create
+        foreground
+            Foreground colour
+        background
+            Background colour
+        """
+        self._colour_pairs[index] = (foreground, background)
+        self._sgr_states = {}
+
+    def print_str(self, txt, columns=None, rows=None, attributes=None, colour=None):
+        """
+        Print a string on screen
+
+        txt
+            String to display
+        cols
+            Column offset
+        rows
+            Row offset
+        attributes
+            Attributes to use (or attributes combined with colour by attr_combine)
+        colour
+            Colour attributes
+        """
+        if not (columns is None and rows is None):
+            self._position_column = columns
+            self._position_row = rows
+
+        column = self._position_column
+        self._position_column += len(txt)
+
+        # Clip to the screen (writing past the right edge would wrap)
+        if self._position_row < 0 or self._position_row >= self._rows:
+            return
+        if column < 0:
+            txt = txt[-column:]
+            column = 0
+        if column + len(txt) > self._columns:
+            txt = txt[:self._columns - column]
+        if len(txt) == 0:
+            return
+
+        # Attributes are already combined if there's no colour
+        if colour is None:
+            attr_combined = 0 if attributes is None else attributes
+        else:
+            attr_combined = self.attr_combine(attributes, colour)
+
+        self._move_cursor(column, self._position_row)
+        self._set_attributes(attr_combined)
+        self._emit(txt)
+        self._screen_txt[self._cursor_row][column:column+len(txt)] = txt
+        self._screen_attr[self._cursor_row][column:column+len(txt)] = [self._sgr_state] * len(txt)
+
+        self._cursor_column += len(txt)
+        # At the right edge the cursor position depends on the terminal's wrap handling
+        if self._cursor_column >= self._columns:
+            self._cursor_column = None
+            self._cursor_row = None
+
+    def redraw(self):
+        """
+        Send the buffered frame to the terminal in a single write
+        If the output is non-blocking and full, what it didn't take is sent by the next redraw (see is_frame_pending)
+        """
+        if len(self._buffer) == 0 and len(self._output_pending) == 0:
+            return
+        frame = u"".join(self._buffer).encode("utf-8")
+        self._buffer = []
+        frame_bytes = len(frame)
+        data = self._output_pending + frame
+        self._output_pending = b""
+        # Raw streams can accept less than the whole frame, or nothing (None) when non-blocking and full
+        while len(data) > 0:
+            try:
+                written = self._output.write(data)
+            except BlockingIOError as err:
+                written = None
+                data = data[err.characters_written:]
+            if written is None:
+                self._output_pending = data
+                break
+            data = data[written:]
+        try:
+            self._output.flush()
+        except AttributeError:
+            pass
+
+        # Track the data in flight on the link
+        now = self._clock.now() / 1000
+        if self._frame_bytes is None:
+            self._frame_bytes = frame_bytes
+        else:
+            self._frame_bytes += (frame_bytes - self._frame_bytes) / 8
+        if self._link_rate:
+            self._link_clear_time = max(self._link_clear_time, now) + (frame_bytes / self._link_rate)
+        if not self._link_fd is None:
+            self._link_sample = (now, self._link_queue())
+
+    def _link_queue(self):
+        """
+        Return the number of bytes written, but not yet sent by the link (TIOCOUTQ), or None if it can't be read
+        """
+        if self._link_fd is None:
+            return None
+        try:
+            import fcntl
+            import struct
+            import termios
+            return struct.unpack("i", fcntl.ioctl(self._link_fd, termios.TIOCOUTQ, b"\0\0\0\0"))[0]
+        except (ImportError, AttributeError, OSError):
+            return None
+
+    def _link_queued(self):
+        """
+        Return the number of bytes still to be sent by the link, measuring the link rate as they drain
+        """
+        now = self._clock.now() / 1000
+        # Estimate from the link rate (if given), the queue only shows what the near end holds (a pty's is always empty)
+        estimated = 0
+        if not self._link_rate_measured:
+            estimated = max(0, (self._link_clear_time - now) * self._link_rate)
+        queued = self._link_queue()
+        if queued is None:
+            return estimated
+        if not self._link_rate_measured:
+            return max(queued, estimated)
+
+        if not self._link_sample is None:
+            sample_time, sample_queued = self._link_sample
+            if sample_queued > 0 and now - sample_time >= PytuinoIface.LINK_SAMPLE_TIME:
+                rate = (sample_queued - queued) / (now - sample_time)
+                if rate <= 0:
+                    # Nothing sent (flow control), which says nothing about the rate
+                    pass
+                elif queued > 0:
+                    # Sending throughout, so this is the rate (smoothed)
+                    self._link_rate = rate if self._link_rate is None else self._link_rate + ((rate - self._link_rate) / 4)
+                elif self._link_rate is None or rate > self._link_rate:
+                    # Emptied part way through, so the rate is at least this
+                    self._link_rate = rate
+                self._link_sample = (now, queued)
+        return queued
+
+    def is_frame_pending(self):
+        """ Return whether part of a frame is still to be written, as the output was full (redraw once link_wait returns 0) """
+        return len(self._output_pending) > 0
+
+    def link_wait(self):
+        """
+        Return the time (in seconds) until the link to the terminal has sent everything written, 0 if it has
+        A frame written sooner would only queue behind the last one
+        """
+        queued = self._link_queued() + len(self._output_pending)
+        if queued <= 0:
+            return 0
+        if not self._link_rate:
+            return PytuinoIface.LINK_POLL_INTERVAL
+        return queued / self._link_rate
+
+    def get_link_stats(self):
+        """
+        Return the link statistics as a dictionary
+            rate: Link rate in bytes per second (None if unknown)
+            frame_bytes: Average size of a frame in bytes (None before the first)
+            frame_time: Time to send an average frame in seconds (None if unknown)
+        """
+        frame_time = None
+        if self._link_rate and not self._frame_bytes is None:
+            frame_time = self._frame_bytes / self._link_rate
+        return {
+            'rate': self._link_rate,
+            'frame_bytes': self._frame_bytes,
+            'frame_time': frame_time,
+        }
+
+    def scroll_region(self, top, bottom, lines):
+        """
+        Scroll the screen rows top to bottom (inclusive) down by the given number of lines
+        Blank lines are inserted at the top, and lines scrolled past the bottom are lost
+        Returns False if the terminal can't scroll
+
+        top
+            First row of the region
+        bottom
+            Last row of the region
+        lines
+            Number of lines to scroll
+        """
+        if not self._has_scroll_region:
+            return False
+
+        # Inserted lines use the current background colour
+        self._set_attributes(PytuinoIface.TXT_NORMAL)
+        # Set the scroll region, insert lines at it's top, then reset the region (which homes the cursor)
+        self._emit(f"\x1b[{top+1};{bottom+1}r")
+        self._emit("\x1b[H" if top == 0 else f"\x1b[{top+1}H")
+        self._emit("\x1b[L" if lines == 1 else f"\x1b[{lines}L")
+        self._emit("\x1b[r")
+        self._cursor_column = 0
+        self._cursor_row = 0
+
+        # Apply the same change to the screen model
+        self._screen_txt[top:bottom+1] = [[' '] * self._columns for i in range(lines)] + self._screen_txt[top:bottom+1-lines]
+        self._screen_attr[top:bottom+1] = [[self._sgr_state] * self._columns for i in range(lines)] + self._screen_attr[top:bottom+1-lines]
+        return True
+
+    def set_position(self, cols, rows):
+        """
+        Move cursor to given position
+        """
+        self._position_column = cols
+        self._position_row = rows
+
+    def skip_ch(self, skip_chars=1):
+        """
+        Move cursor forward 1 character
+        """
+        self._position_column += skip_chars
+
+# Main
+###############################################################################
+if __name__ == '__main__':
+    import math
+    import time
+
+    ptoi = None
+    err = None
+    try:
+        ptoi = PytuinoIface()
+
+        ptoi.init_pair(1, PytuinoIface.COLOUR_WHITE, PytuinoIface.COLOUR_BLACK)
+        ptoi.init_pair(2, PytuinoIface.COLOUR_CYAN, PytuinoIface.COLOUR_BLACK)
+
+        hello_str = "Hello World"
+        quit_str = "Press Q to quit"
+        # Current position
+        cur_column = 0
+        cur_row = 0
+        # Next position will add these values
+        add_column = 1
+        add_row = 1
+
+        while True:
+            ptoi.clear_screen()
+
+            # Truncate sring when it's tail is off screen
+            tmp_len = ptoi._columns - cur_column
+            if tmp_len > len(hello_str):
+                tmp_len = len(hello_str)
+            ptoi.print_str(hello_str[0:tmp_len], columns=cur_column, rows=cur_row, attributes=PytuinoIface.TXT_BOLD, colour=ptoi.color_pair(2))
+
+            # Update co-ordinates
+            if add_column == 1:
+                if cur_column == (ptoi._columns - 1):
+                    add_column = -1
+            else:
+                if cur_column == 0:
+                    add_column = 1
+            if add_row == 1:
+                if cur_row == (ptoi._rows - 1):
+                    add_row = -1
+            else:
+                if cur_row == 0:
+                    add_row = 1
+            cur_column += add_column
+            cur_row += add_row
+
+            ptoi.print_str(quit_str, columns=math.floor((ptoi._columns-len(quit_str))/2), rows=(ptoi._rows-1), attributes=PytuinoIface.TXT_BOLD, colour=ptoi.color_pair(1))
+
+            ptoi.redraw()
+
+            # Check for quit key
+            key = ptoi.get_key()
+            if key == ord('Q'):
+                break
+
+            time.sleep(0.05)
+
+    except Exception as e:
+        err = e
+    finally:
+        if not ptoi is None:
+            ptoi.close()
+        if not err is None:
+            raise err
+
+        # Print info on exit
+        print(f"Screen size: {ptoi._columns}x{ptoi._rows}")
+        print(f"Number of colours: {ptoi._max_colours}")
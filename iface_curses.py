@@ -18,6 +18,7 @@ class PytuinoIface:
     KEY_LEFT = curses.KEY_LEFT
     KEY_RIGHT = curses.KEY_RIGHT
     KEY_UP = curses.KEY_UP
+    KEY_RESIZE = curses.KEY_RESIZE
 
     TXT_BOLD = curses.A_BOLD
     TXT_NORMAL = curses.A_NORMAL
@@ -99,6 +100,10 @@ class PytuinoIface:
         """
         self._stdscreen.erase()
 
+    def get_size(self):
+        """ Return the screen size as (columns, rows) """
+        return (self._columns, self._rows)
+
     def color_pair(self, colour_index):
         """Wrapper of curses color_pair"""
         return curses.color_pair(colour_index)
@@ -108,10 +113,30 @@ class PytuinoIface:
         Return a key(code) if any are pressed (non blocking)
         """
         try:
-            return self._stdscreen.getch()
+            key = self._stdscreen.getch()
         except Exception:
             return ""
 
+        # Update the stored screen size when the terminal is resized
+        if key == curses.KEY_RESIZE:
+            self._rows, self._columns = self._stdscreen.getmaxyx()
+
+        return key
+
+    def wait_key(self, timeout=None):
+        """
+        Wait for a key press, returning the key(code), or -1 if none is pressed before the timeout
+
+        timeout
+            Maximum time to wait in seconds (None waits forever)
+        """
+        # Let curses block (in select/poll) rather than polling
+        self._stdscreen.timeout(-1 if timeout is None else max(0, int(timeout * 1000 + 0.999)))
+        try:
+            return self.get_key()
+        finally:
+            self._stdscreen.nodelay(True)
+
     def init_pair(self, index, foreground, background):
         """
         Create colour pairs which are later refenced when inserting text
@@ -125,6 +150,23 @@ class PytuinoIface:
         """
         curses.init_pair(index, foreground, background)
 
+    def attr_combine(self, attributes=None, colour=None):
+        """
+        Combine attributes and colour in to a single attribute word
+        This can be passed to print_str as attributes (with no colour), saving the work on each call
+
+        attributes
+            Attributes to use
+        colour
+            Colour attributes
+        """
+        attr_combined = 0
+        if not attributes is None:
+            attr_combined |= attributes
+        if not colour is None and self._stdscreen_has_color is True:
+            attr_combined |= colour
+        return attr_combined
+
     def print_str(self, txt, columns=None, rows=None, attributes=None, colour=None):
         """
         Print a string on screen
@@ -136,30 +178,46 @@ class PytuinoIface:
         rows
             Row offset
         attributes
-            Attributes to use
+            Attributes to use (or attributes combined with colour by attr_combine)
         colour
             Colour attributes
         """
-        if columns is None and rows is None:
-            if attributes is None and (colour is None or self._stdscreen_has_color is False):
+        if attributes is None and (colour is None or self._stdscreen_has_color is False):
+            if columns is None and rows is None:
                 self._stdscreen.addstr(txt)
             else:
-                attr_combined = 0
-                if not attributes is None:
-                    attr_combined |= attributes
-                if not colour is None and self._stdscreen_has_color is True:
-                    attr_combined |= colour
-                self._stdscreen.addstr(txt, attr_combined)
-        else:
-            if attributes is None and (colour is None or self._stdscreen_has_color is False):
                 self._stdscreen.addstr(rows, columns, txt)
-            else:
-                attr_combined = 0
-                if not attributes is None:
-                    attr_combined |= attributes
-                if not colour is None and self._stdscreen_has_color is True:
-                    attr_combined |= colour
-                self._stdscreen.addstr(rows, columns, txt, attr_combined)
+            return
+
+        # Attributes are already combined if there's no colour
+        if colour is None:
+            attr_combined = attributes
+        else:
+            attr_combined = self.attr_combine(attributes, colour)
+        if columns is None and rows is None:
+            self._stdscreen.addstr(txt, attr_combined)
+        else:
+            self._stdscreen.addstr(rows, columns, txt, attr_combined)
+
+    def is_frame_pending(self):
+        """ Return whether a frame has been held back, never (curses paces it's own output) """
+        return False
+
+    def link_wait(self):
+        """
+        Return the time (in seconds) until the terminal can take another frame, always 0 (curses paces it's own output)
+        """
+        return 0
+
+    def get_link_stats(self):
+        """
+        Return the link statistics as a dictionary (see the ANSI interface), always unknown (curses paces it's own output)
+        """
+        return {
+            'rate': None,
+            'frame_bytes': None,
+            'frame_time': None,
+        }
 
     def redraw(self):
         """
@@ -167,6 +225,13 @@ class PytuinoIface:
         """
         return self._stdscreen.refresh()
 
+    def scroll_region(self, top, bottom, lines):
+        """
+        Scroll the screen rows top to bottom down, not supported (curses does it's own line optimisation)
+        Returns False so the rows are redrawn instead
+        """
+        return False
+
     def set_position(self, cols, rows):
         """
         Move cursor to given position
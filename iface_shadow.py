@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+"""
+Pytuino interface (shadow buffer)
+
+Wraps another Pytuino interface, and keeps a shadow copy of the last frame
+displayed. Only the cells which differ from that frame are passed on to the
+wrapped interface when the screen is redrawn.
+
+While the wrapped interface's link is still sending the last frame, redraws
+are held back. Later changes are drawn over the held frame, so once the link
+is free the latest state is sent (as the cells changed since the last frame
+sent), and the states in between are dropped.
+"""
+
+###############################################################################
+class PytuinoIfaceShadow:
+###############################################################################
+    """
+    Damage tracking wrapper around a Pytuino interface
+    """
+
+    # Attribute of a blank cell (attributes, colour)
+    CELL_BLANK_ATTR = (None, None)
+
+    def __init__(self, iface):
+        """
+        Initialise the shadow buffers
+
+        iface
+            Interface to pass changed cells on to
+        """
+        self._iface = iface
+
+        # Take the interface constants from the wrapped interface
+        self.KEY_DOWN = iface.KEY_DOWN
+        self.KEY_LEFT = iface.KEY_LEFT
+        self.KEY_RIGHT = iface.KEY_RIGHT
+        self.KEY_UP = iface.KEY_UP
+        self.KEY_RESIZE = iface.KEY_RESIZE
+        self.TXT_BOLD = iface.TXT_BOLD
+        self.TXT_NORMAL = iface.TXT_NORMAL
+        self.TXT_REVERSE = iface.TXT_REVERSE
+
+        # Size of the shadow buffers
+        self._shadow_columns = 0
+        self._shadow_rows = 0
+        # Frame being drawn (back), and the frame on screen (front)
+        # Each is a list of rows, with the text and attributes of a row held in separate lists
+        self._back_txt = []
+        self._back_attr = []
+        self._front_txt = []
+        self._front_attr = []
+        # Flag: Repaint the whole screen on the next redraw
+        self._repaint = True
+        # Flag: A frame has been held back, as the link was busy
+        self._frame_pending = False
+        # Flag: The frame being drawn has changed since the last redraw
+        self._frame_changed = False
+        # Statistics
+        self.frames_sent = 0
+        self.frames_dropped = 0
+
+        # Cursor position
+        self._cursor_column = 0
+        self._cursor_row = 0
+
+        self._check_size()
+
+    @property
+    def _columns(self):
+        return self._iface._columns
+
+    @property
+    def _rows(self):
+        return self._iface._rows
+
+    @property
+    def _max_colours(self):
+        return self._iface._max_colours
+
+    def _blank_rows(self):
+        """
+        Return a blank set of text and attribute rows the size of the screen
+        """
+        txt = [[' '] * self._shadow_columns for i in range(self._shadow_rows)]
+        attr = [[self.CELL_BLANK_ATTR] * self._shadow_columns for i in range(self._shadow_rows)]
+        return txt, attr
+
+    def _check_size(self):
+        """
+        Resize the shadow buffers (forcing a repaint) if the screen size has changed
+        """
+        if self._shadow_columns == self._iface._columns and self._shadow_rows == self._iface._rows:
+            return
+        self._shadow_columns = self._iface._columns
+        self._shadow_rows = self._iface._rows
+        self._back_txt, self._back_attr = self._blank_rows()
+        self._front_txt, self._front_attr = self._blank_rows()
+        self._repaint = True
+
+    def close(self):
+        """
+        Returns the terminal to the original settings
+        """
+        self._iface.close()
+
+    def attr_combine(self, attributes=None, colour=None):
+        """
+        Combine attributes and colour in to a single attribute word
+        """
+        return self._iface.attr_combine(attributes, colour)
+
+    def clear_screen(self):
+        """
+        Clear the frame being drawn (the screen is only updated on redraw)
+        """
+        self._check_size()
+        self._back_txt, self._back_attr = self._blank_rows()
+        self._frame_changed = True
+
+    def get_size(self):
+        """ Return the screen size of the interface as (columns, rows) """
+        return self._iface.get_size()
+
+    def color_pair(self, colour_index):
+        """Wrapper of the interface color_pair"""
+        return self._iface.color_pair(colour_index)
+
+    def get_keyframe(self):
+        """
+        Return the frame on screen (the front buffer, as sent by the last redraw), encoded by the wrapped interface
+        as bytes that draw it on a terminal in any state
+        """
+        return self._iface.get_keyframe()
+
+    def get_key(self):
+        """
+        Return a key(code) if any are pressed (non blocking)
+        """
+        return self._iface.get_key()
+
+    def wait_key(self, timeout=None):
+        """
+        Wait for a key press, returning the key(code), or -1 if none is pressed before the timeout
+        """
+        return self._iface.wait_key(timeout)
+
+    def init_pair(self, index, foreground, background):
+        """
+        Create colour pairs which are later refenced when inserting text
+        """
+        self._iface.init_pair(index, foreground, background)
+        # Cells already on screen may have changed colour
+        self.invalidate()
+
+    def invalidate(self):
+        """
+        Repaint the whole screen on the next redraw
+        """
+        self._repaint = True
+
+    def is_frame_pending(self):
+        """ Return whether a frame has been held back, here or by the wrapped interface (redraw once link_wait returns 0) """
+        return self._frame_pending or self._iface.is_frame_pending()
+
+    def link_wait(self):
+        """
+        Return the time (in seconds) until the link to the terminal can take another frame, 0 if it can now
+        """
+        return self._iface.link_wait()
+
+    def get_link_stats(self):
+        """
+        Return the link statistics of the wrapped interface as a dictionary (see the ANSI interface)
+        """
+        return self._iface.get_link_stats()
+
+    def get_frame_stats(self):
+        """
+        Return the frame statistics as a dictionary
+            sent: Frames sent to the interface
+            dropped: Frames replaced by a later frame before the link was free to send them
+        """
+        return {
+            'sent': self.frames_sent,
+            'dropped': self.frames_dropped,
+        }
+
+    def print_str(self, txt, columns=None, rows=None, attributes=None, colour=None):
+        """
+        Print a string in to the frame being drawn
+
+        txt
+            String to display
+        cols
+            Column offset
+        rows
+            Row offset
+        attributes
+            Attributes to use (or attributes combined with colour by attr_combine)
+        colour
+            Colour attributes
+        """
+        if not (columns is None and rows is None):
+            self._cursor_column = columns
+            self._cursor_row = rows
+
+        column = self._cursor_column
+        row = self._cursor_row
+        self._cursor_column += len(txt)
+
+        # Clip the string to the screen
+        if row < 0 or row >= self._shadow_rows:
+            return
+        start = max(column, 0)
+        end = min(column + len(txt), self._shadow_columns)
+        if start >= end:
+            return
+        self._back_txt[row][start:end] = txt[start-column:end-column]
+        self._back_attr[row][start:end] = [(attributes, colour)] * (end - start)
+        self._frame_changed = True
+
+    def redraw(self):
+        """
+        Pass the cells that have changed since the last redraw to the interface, and update the screen
+        The frame is held back if the link is still busy with the last one
+        """
+        if self._iface.link_wait() > 0:
+            # A frame already held back is replaced by this one (if anything has been drawn since)
+            if self._frame_pending and self._frame_changed:
+                self.frames_dropped += 1
+            self._frame_pending = True
+            self._frame_changed = False
+            # Carry on with what the wrapped interface has left of the last frame
+            if self._iface.is_frame_pending():
+                self._iface.redraw()
+            return None
+        self._frame_pending = False
+        self._frame_changed = False
+        self.frames_sent += 1
+
+        self._check_size()
+
+        if self._repaint:
+            self._iface.clear_screen()
+            self._front_txt, self._front_attr = self._blank_rows()
+            self._repaint = False
+
+        for row in range(0, self._shadow_rows):
+            back_txt = self._back_txt[row]
+            back_attr = self._back_attr[row]
+            front_txt = self._front_txt[row]
+            front_attr = self._front_attr[row]
+
+            # Skip unchanged rows
+            if back_txt == front_txt and back_attr == front_attr:
+                continue
+
+            column = 0
+            while column < self._shadow_columns:
+                if back_txt[column] == front_txt[column] and back_attr[column] == front_attr[column]:
+                    column += 1
+                    continue
+
+                # Collect the run of changed cells sharing the same attributes
+                attr = back_attr[column]
+                start = column
+                column += 1
+                while column < self._shadow_columns and back_attr[column] == attr and \
+                        (back_txt[column] != front_txt[column] or front_attr[column] != attr):
+                    column += 1
+                self._iface.print_str(u"".join(back_txt[start:column]), columns=start, rows=row, attributes=attr[0], colour=attr[1])
+
+            # Screen now matches this row
+            self._front_txt[row] = back_txt[:]
+            self._front_attr[row] = back_attr[:]
+
+        return self._iface.redraw()
+
+    def scroll_region(self, top, bottom, lines):
+        """
+        Scroll the screen rows top to bottom (inclusive) down by the given number of lines
+        Blank lines are inserted at the top, and lines scrolled past the bottom are lost
+        Returns False if the interface can't scroll (the rows are redrawn instead)
+
+        top
+            First row of the region
+        bottom
+            Last row of the region
+        lines
+            Number of lines to scroll
+        """
+        self._check_size()
+        if self._repaint or top < 0 or bottom >= self._shadow_rows or lines <= 0 or top + lines > bottom:
+            return False
+        if not self._iface.scroll_region(top, bottom, lines):
+            return False
+
+        # Apply the same change to the frame on screen, and the frame being drawn (as drawn over the screen)
+        blank_txt, blank_attr = self._blank_rows()
+        self._front_txt[top:bottom+1] = blank_txt[:lines] + self._front_txt[top:bottom+1-lines]
+        self._front_attr[top:bottom+1] = blank_attr[:lines] + self._front_attr[top:bottom+1-lines]
+        blank_txt, blank_attr = self._blank_rows()
+        self._back_txt[top:bottom+1] = blank_txt[:lines] + self._back_txt[top:bottom+1-lines]
+        self._back_attr[top:bottom+1] = blank_attr[:lines] + self._back_attr[top:bottom+1-lines]
+        self._frame_changed = True
+        return True
+
+    def set_position(self, cols, rows):
+        """
+        Move cursor to given position
+        """
+        self._cursor_column = cols
+        self._cursor_row = rows
+
+    def skip_ch(self, skip_chars=1):
+        """
+        Move cursor forward 1 character
+        """
+        self._cursor_column += skip_chars
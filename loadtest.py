@@ -0,0 +1,401 @@
+#!/usr/bin/env python3
+"""
+Pytuino server load test
+
+Opens simulated terminal clients to the game server over loopback, ramping
+up the number of clients in steps, to find how many games a host can serve.
+
+Each client presses keys (random, a script, or those of a bot playing it's
+own game), and parses everything the server sends in to a virtual screen, as
+a real terminal would. Every probe interval the client also sends Ctrl-L,
+which makes the server redraw the whole screen, and the time until the
+screen is cleared is the input to update latency (the same path as any key
+press, but with a response that can't be mistaken for gravity moving the
+tetromino).
+
+For each step the latency percentiles, bytes received per second, and the
+server's CPU use (read from /proc, so Linux only) are reported. The ramp
+stops at the first step where a latency percentile crosses it's SLO.
+
+The clients are spread over a number of processes, so the load generator
+doesn't become the bottleneck. The server is started as a separate process,
+unless the address of a running one is given. Many clients need a raised
+open file limit (ulimit -n).
+"""
+
+import argparse
+import asyncio
+import concurrent.futures
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+
+from server import TelnetParser
+from vt_screen import VirtualScreen
+
+# Keys pressed, by script character
+SCRIPT_KEYS = {
+    '<': b"\x1b[D",
+    '>': b"\x1b[C",
+    'v': b"\x1b[B",
+    'z': b"z",
+    'x': b"x",
+    ' ': b" ",
+}
+# Key making the server redraw the whole screen (Ctrl-L)
+PROBE_KEY = b"\x0c"
+
+###############################################################################
+class LoadClient:
+###############################################################################
+    """
+    A simulated terminal playing a game on the server
+    """
+
+    def __init__(self, host, port, mode="random", seed=0, key_interval=0.15, probe_interval=1.0, probe_timeout=10.0, script="<>zxv "):
+        """
+        Initialise the client
+
+            host, port
+                Server address
+            mode
+                How keys are chosen: random, script (repeating script), or bot (the moves of a bot playing it's own game)
+            seed
+                Seed for the random keys/bot's game
+            key_interval
+                Average time between key presses (in seconds)
+            probe_interval
+                Time between latency probes (in seconds)
+            probe_timeout
+                Time after which a probe with no response is counted as lost (in seconds)
+            script
+                Keys of the script (see SCRIPT_KEYS)
+        """
+        self._host = host
+        self._port = port
+        self._mode = mode
+        self._rnd = random.Random(seed)
+        self._seed = seed
+        self._key_interval = key_interval
+        self._probe_interval = probe_interval
+        self._probe_timeout = probe_timeout
+        self._script = [SCRIPT_KEYS[char] for char in script]
+        self._script_index = 0
+
+        self._screen = VirtualScreen()
+        self._telnet = TelnetParser()
+        # Time the outstanding probe was sent (None if there is none), and the screen clears seen when it was sent
+        self._probe_sent = None
+        self._probe_clears = 0
+        # Bot playing it's own game, and the keys for it's current tetromino
+        self._sim = None
+        self._bot = None
+        self._bot_keys = []
+
+        # Results
+        self.latencies = []
+        self.probes_lost = 0
+        self.keys = 0
+        self.connected = False
+
+    def _next_key(self):
+        """
+        Return the next key to press
+        """
+        if self._mode == "script":
+            key = self._script[self._script_index]
+            self._script_index = (self._script_index + 1) % len(self._script)
+            return key
+        if self._mode == "bot":
+            from sim_tetris import TetrisSim
+            if self._bot is None:
+                from bot_tetris import TetrisBot
+                self._bot = TetrisBot(lookahead=False)
+                self._sim = TetrisSim()
+                self._sim.reset(self._seed)
+                self._bot_action_keys = {
+                    TetrisSim.ACTION_LEFT: SCRIPT_KEYS['<'],
+                    TetrisSim.ACTION_RIGHT: SCRIPT_KEYS['>'],
+                    TetrisSim.ACTION_DOWN: SCRIPT_KEYS['v'],
+                    TetrisSim.ACTION_ROTATE_CLOCKWISE: SCRIPT_KEYS['x'],
+                    TetrisSim.ACTION_ROTATE_ANTICLOCKWISE: SCRIPT_KEYS['z'],
+                    TetrisSim.ACTION_DROP: SCRIPT_KEYS[' '],
+                }
+            if not self._bot_keys:
+                if self._sim.is_game_over():
+                    self._sim.reset(self._rnd.randrange(1 << 32))
+                actions = self._bot.choose(self._sim.get_board()) or [TetrisSim.ACTION_DROP]
+                for action in actions:
+                    self._sim.step(action)
+                self._bot_keys = [self._bot_action_keys[action] for action in actions]
+            return self._bot_keys.pop(0)
+        return self._rnd.choice(list(SCRIPT_KEYS.values()))
+
+    async def _read(self, reader):
+        """
+        Parse the output of the server in to the virtual screen, timing the responses to probes
+        """
+        while True:
+            data = await reader.read(65536)
+            if not data:
+                break
+            self._screen.feed(self._telnet.feed(data))
+            if not self._probe_sent is None and self._screen.clears > self._probe_clears:
+                self.latencies.append((time.perf_counter() - self._probe_sent) * 1000)
+                self._probe_sent = None
+
+    async def run(self, duration, connected):
+        """
+        Play for the given time (in seconds) once every client is connected
+
+            connected
+                asyncio.Event set when the clients are all connected
+        """
+        reader, writer = await asyncio.open_connection(self._host, self._port)
+        self.connected = True
+        read_task = asyncio.create_task(self._read(reader))
+        await connected.wait()
+
+        loop = asyncio.get_running_loop()
+        end = loop.time() + duration
+        next_probe = loop.time() + self._rnd.uniform(0, self._probe_interval)
+        try:
+            while loop.time() < end and not read_task.done():
+                writer.write(self._next_key())
+                self.keys += 1
+                if loop.time() >= next_probe:
+                    if not self._probe_sent is None and time.perf_counter() - self._probe_sent > self._probe_timeout:
+                        self.probes_lost += 1
+                        self._probe_sent = None
+                    if self._probe_sent is None:
+                        self._probe_clears = self._screen.clears
+                        self._probe_sent = time.perf_counter()
+                        writer.write(PROBE_KEY)
+                    next_probe += self._probe_interval
+                await asyncio.sleep(self._rnd.uniform(0.5, 1.5) * self._key_interval)
+            # Give the last probe time to be answered
+            while not self._probe_sent is None and not read_task.done() and time.perf_counter() - self._probe_sent < self._probe_timeout:
+                await asyncio.sleep(0.01)
+            if not self._probe_sent is None:
+                self.probes_lost += 1
+            writer.write(b"Q")
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+            read_task.cancel()
+
+def run_clients(host, port, clients, duration, options, seed_base):
+    """
+    Run a number of clients in this process (a worker), returning their combined results as a dictionary
+    """
+    async def run():
+        tmp_clients = [LoadClient(host, port, seed=seed_base + client_index, **options) for client_index in range(0, clients)]
+        connected = asyncio.Event()
+        tasks = [asyncio.create_task(client.run(duration, connected)) for client in tmp_clients]
+        # Start playing once connected (or failed to)
+        while not all(client.connected or task.done() for client, task in zip(tmp_clients, tasks)):
+            await asyncio.sleep(0.01)
+        connected.set()
+        errors = [result for result in await asyncio.gather(*tasks, return_exceptions=True) if isinstance(result, Exception)]
+        return {
+            'latencies': [latency for client in tmp_clients for latency in client.latencies],
+            'bytes': sum(client._screen.bytes for client in tmp_clients),
+            'keys': sum(client.keys for client in tmp_clients),
+            'probes_lost': sum(client.probes_lost for client in tmp_clients),
+            'errors': len(errors),
+        }
+    return asyncio.run(run())
+
+def percentile(values, percent):
+    """ Return the given percentile of the values (nearest rank), or None if there are none """
+    if len(values) == 0:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, max(0, int(round(percent / 100 * len(values))) - 1))]
+
+def process_cpu_time(pid):
+    """ Return the CPU time (user and system, in seconds) used by a process so far """
+    with open(f"/proc/{pid}/stat") as stat:
+        # The command name is in brackets (and can contain spaces)
+        fields = stat.read().rsplit(')', 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+
+def parse_slo(txt):
+    """
+    Parse a latency SLO given as pNN=MILLISECONDS (e.g. p95=100)
+    """
+    try:
+        name, limit = txt.split('=')
+        if not name.startswith('p'):
+            raise ValueError()
+        return (float(name[1:]), float(limit))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Bad SLO (expected pNN=MILLISECONDS): {txt}")
+
+def run_step(args, host, port, clients, server_pid):
+    """
+    Run a step of the ramp with the given number of clients, returning the results as a dictionary
+    """
+    options = {
+        'mode': args.mode,
+        'key_interval': args.key_interval,
+        'probe_interval': args.probe_interval,
+        'script': args.script,
+    }
+    processes = max(1, min(args.processes, clients))
+    cpu_start = None if server_pid is None else process_cpu_time(server_pid)
+    start = time.perf_counter()
+    with concurrent.futures.ProcessPoolExecutor(max_workers=processes) as executor:
+        futures = []
+        for process_index in range(0, processes):
+            # Spread the clients evenly over the processes
+            process_clients = (clients // processes) + (1 if process_index < clients % processes else 0)
+            futures.append(executor.submit(run_clients, host, port, process_clients, args.duration, options, process_index * clients))
+        results = [future.result() for future in futures]
+    elapsed = time.perf_counter() - start
+    cpu = None if server_pid is None else (process_cpu_time(server_pid) - cpu_start) / elapsed * 100
+
+    latencies = [latency for result in results for latency in result['latencies']]
+    step = {
+        'clients': clients,
+        'seconds': round(elapsed, 2),
+        'probes': len(latencies),
+        'probes_lost': sum(result['probes_lost'] for result in results),
+        'errors': sum(result['errors'] for result in results),
+        'keys_per_sec': sum(result['keys'] for result in results) / elapsed,
+        # Keys pressed against the rate asked for, low if the clients can't keep up (the load test is measuring itself)
+        'key_rate_percent': sum(result['keys'] for result in results) / (clients * args.duration / args.key_interval) * 100,
+        'bytes_per_sec': sum(result['bytes'] for result in results) / elapsed,
+        'server_cpu_percent': cpu,
+    }
+    for percent, limit in args.slo:
+        step[f"p{percent:g}_ms"] = percentile(latencies, percent)
+    step['p50_ms'] = percentile(latencies, 50)
+    return step
+
+def start_server(args):
+    """
+    Start the server as a separate process, returning the process and the port it's listening on
+    """
+    command = [sys.executable, "-u", os.path.join(os.path.dirname(os.path.abspath(__file__)), "server.py"), "-p", "0", "--max-sessions", str(max(args.ramp) + 1)]
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+    # The server reports the address it's listening on
+    line = process.stdout.readline()
+    if not line.startswith("Listening on "):
+        process.kill()
+        raise Exception(f"Loadtest: server didn't start: {line}")
+    return process, int(line.rsplit(':', 1)[1])
+
+# Main
+###############################################################################
+if __name__ == '__main__':
+    # Build option parser
+    parser = argparse.ArgumentParser(
+        description="Pytuino - Load test the game server with simulated terminal clients"
+    )
+    parser.add_argument(
+        "-c", "--connect", help="Address of a running server (default: start one). Its CPU use is only reported with --server-pid.",
+        metavar="HOST:PORT"
+    )
+    parser.add_argument(
+        "--server-pid", help="Process ID of the running server, to report it's CPU use.",
+        type=int
+    )
+    parser.add_argument(
+        "-r", "--ramp", help="Numbers of clients of each step (default: %(default)s).",
+        type=lambda txt: [int(clients) for clients in txt.split(',')], default=[10, 50, 100, 200, 400]
+    )
+    parser.add_argument(
+        "-d", "--duration", help="Length of each step in seconds (default: %(default)s).",
+        type=float, default=10
+    )
+    parser.add_argument(
+        "-m", "--mode", help="How clients choose keys (default: %(default)s).",
+        choices=("random", "script", "bot"), default="random"
+    )
+    parser.add_argument(
+        "--script", help=f"Keys pressed in script mode, from '{''.join(SCRIPT_KEYS)}' (default: '%(default)s').",
+        default="<>zxv "
+    )
+    parser.add_argument(
+        "-k", "--key-interval", help="Average time between key presses in seconds (default: %(default)s).",
+        type=float, default=0.15
+    )
+    parser.add_argument(
+        "--probe-interval", help="Time between latency probes in seconds (default: %(default)s).",
+        type=float, default=1.0
+    )
+    parser.add_argument(
+        "-s", "--slo", help="Latency SLO as pNN=MILLISECONDS (repeatable, default: p95=100 and p99=250).",
+        type=parse_slo, action="append"
+    )
+    parser.add_argument(
+        "-p", "--processes", help="Number of client processes (default: number of CPUs less one for the server).",
+        type=int, default=max(1, (os.cpu_count() or 2) - 1)
+    )
+    parser.add_argument(
+        "--keep-going", help="Run every step, even after an SLO is crossed.",
+        action="store_true"
+    )
+    parser.add_argument(
+        "-o", "--output", help="Write the results as JSON to the given file.",
+        metavar="FILE"
+    )
+    args = parser.parse_args()
+    if args.slo is None:
+        args.slo = [(95.0, 100.0), (99.0, 250.0)]
+    for char in args.script:
+        if not char in SCRIPT_KEYS:
+            parser.error(f"Unknown script key: '{char}'")
+
+    server_process = None
+    server_pid = args.server_pid
+    if args.connect:
+        host, port = args.connect.rsplit(':', 1)
+        port = int(port)
+    else:
+        host = "127.0.0.1"
+        server_process, port = start_server(args)
+        server_pid = server_process.pid
+
+    steps = []
+    crossed = None
+    try:
+        for clients in args.ramp:
+            step = run_step(args, host, port, clients, server_pid)
+            steps.append(step)
+            cpu = "-" if step['server_cpu_percent'] is None else f"{step['server_cpu_percent']:.0f}%"
+            latencies = "	".join(f"p{percent:g}: {'-' if step[f'p{percent:g}_ms'] is None else format(step[f'p{percent:g}_ms'], '.1f')}ms" for percent in [50.0] + [percent for percent, limit in args.slo])
+            print(f"Clients: {clients}	{latencies}	Bytes/sec: {step['bytes_per_sec']:.0f}	Keys/sec: {step['keys_per_sec']:.0f}	Server CPU: {cpu}	Probes lost: {step['probes_lost']}	Errors: {step['errors']}")
+            if step['key_rate_percent'] < 90:
+                print(f"Warning: clients only pressed {step['key_rate_percent']:.0f}% of the keys asked for, the load generator is saturated (more CPUs/processes needed)")
+
+            # Check the SLOs (lost probes, or no probes at all, count as crossing them)
+            for percent, limit in args.slo:
+                value = step[f"p{percent:g}_ms"]
+                if value is None or value > limit or step['probes_lost'] > 0:
+                    crossed = (clients, percent, limit, value)
+                    break
+            if not crossed is None and not args.keep_going:
+                break
+    except KeyboardInterrupt:
+        print("Interrupted")
+    finally:
+        if not server_process is None:
+            server_process.terminate()
+            server_process.wait()
+
+    if crossed is None:
+        print(f"SLOs met up to {steps[-1]['clients'] if steps else 0} clients")
+    else:
+        clients, percent, limit, value = crossed
+        print(f"SLO p{percent:g} <= {limit:g}ms crossed at {clients} clients" + ("" if value is None else f" ({value:.1f}ms)"))
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            json.dump({ 'slo': [{ 'percentile': percent, 'ms': limit } for percent, limit in args.slo], 'crossed_at': None if crossed is None else crossed[0], 'steps': steps }, output_file, indent=2)
+            output_file.write("\n")
@@ -6,12 +6,13 @@ A text based Tetris implementation
 """
 
 import argparse
-import time
+import os
+import random
 
 from board_tetris import TetrisBoard, Tetromino
+from sim_tetris import TetrisSim
 
-import curses
-from iface_curses import PytuinoIface
+from iface_shadow import PytuinoIfaceShadow
 
 ###############################################################################
 class Pytuino:
@@ -22,24 +23,62 @@ class Pytuino:
 
     # Version number
     version=0.1
+    # Time between the bot's moves in demo mode (in seconds)
+    demo_move_interval = 0.1
+
+    def __init__(self, debug=False, iface=None, demo=False, record=None):
+        # Debug moves (moving the tetromino up) aren't game actions, so a replay of them would go out of step
+        if debug and not record is None:
+            raise Exception("Pytuino: games can't be recorded in debug mode")
 
-    def __init__(self, debug=False):
         # Store debug parameter
         self._debug = debug
 
-        # Initialise interface
-        self._iface = PytuinoIface()
+        # Initialise interface (default: curses)
+        if iface is None:
+            from iface_curses import PytuinoIface
+            iface = PytuinoIface()
+        # Only changed cells are sent to the screen
+        self._iface = PytuinoIfaceShadow(iface)
 
         # Board store
         self._board = None
 
+        # Replay file to record the game to
+        self._record_path = record
+        self._recorder = None
+
+        # Demo mode, the bot plays by 'pressing' the keys for it's moves
+        self._bot = None
+        self._bot_keys = []
+        # Time of the bot's next move (in milliseconds, of the board's clock)
+        self._bot_move_time = None
+        if demo:
+            from bot_tetris import TetrisBot
+            self._bot = TetrisBot()
+            self._bot_action_keys = {
+                TetrisSim.ACTION_LEFT: self._iface.KEY_LEFT,
+                TetrisSim.ACTION_RIGHT: self._iface.KEY_RIGHT,
+                TetrisSim.ACTION_ROTATE_CLOCKWISE: ord('x'),
+                TetrisSim.ACTION_ROTATE_ANTICLOCKWISE: ord('z'),
+                TetrisSim.ACTION_DOWN: self._iface.KEY_DOWN,
+                TetrisSim.ACTION_DROP: ord(' '),
+            }
+
     def _printd(self, txt, end="\n"):
         """ Print txt if debug flag set """
         if self._debug:
             print(txt, end=end)
 
+    def _record(self, action):
+        """ Record an action (TetrisSim.ACTION_*) if the game is being recorded """
+        if not self._recorder is None:
+            self._recorder.record(action)
+
     def close(self):
         """ Close down interface """
+        if not self._recorder is None:
+            self._recorder.close()
         self._iface.close()
 
     def game_over(self):
@@ -49,29 +88,58 @@ class Pytuino:
         self._board.draw_gameover(self._iface)
         self._iface.redraw()
 
-        # Loop until 'Q' is pressed
+        # Wait until 'Q' is pressed
         while True:
-            # Check for key press
-            key = self._iface.get_key()
+            # (Sending the screen once the link is free, if it was held back)
+            timeout = None
+            if self._iface.is_frame_pending():
+                timeout = self._iface.link_wait()
+            key = self._iface.wait_key(timeout)
+            if self._iface.is_frame_pending():
+                self._iface.redraw()
 
             # Check for quit key
             if key == ord('Q'):
                 break
 
-            # Sleep for a bit
-            time.sleep(0.01)
+    def replay(self, path, speed=1.0, seek=None):
+        """
+        Play back a replay file, returning whether it played to the end (False if 'Q' was pressed)
+
+            speed
+                Playback speed (1 is real time, 0 as fast as possible)
+            seek
+                Time to start from (in seconds)
+        """
+        from replay import ReplayPlayer
+        player = ReplayPlayer(path)
+        if not seek is None:
+            player.seek(int(seek * 1000))
+        finished = player.play(self._iface, speed)
+        self._board = player.get_sim().get_board()
+        return finished
 
     def play(self):
         """ Main routine """
 
         # Generate new board
-        self._board = TetrisBoard()
+        if self._record_path is None:
+            self._board = TetrisBoard()
+        else:
+            # Recorded games need a known seed to be replayed
+            from replay import ReplayRecorder
+            seed = random.SystemRandom().randrange(1 << 32)
+            self._board = TetrisBoard(seed=seed)
+            self._recorder = ReplayRecorder(self._record_path, seed, columns=self._board._columns, rows=self._board._rows)
         if not self._board.iface_check(self._iface):
             raise Exception("Pytuino: screen too small")
 
         # Generate random fill
         #self._board._fill_rand_()
 
+        if not self._bot is None:
+            self._bot_move_time = self._board._clock.now() + (self.demo_move_interval * 1000)
+
         # Loop until 'Q' is pressed
         while True:
             # Flag: Copy the Tetromino to the board
@@ -81,31 +149,76 @@ class Pytuino:
             if self._board.get_current_tetromino() is None:
                 self._board.get_next_tetromino()
                 self._board.tetromino_start()
-
-            # Redraw screen
-            self._board.draw_board(self._iface)
-            self._iface.redraw()
-
-            # Check for key press
-            key = self._iface.get_key()
+                # Work out the bot's moves for the new tetromino (just move it down if there's no placement)
+                if not self._bot is None:
+                    actions = self._bot.choose(self._board)
+                    self._bot_keys = [self._bot_action_keys[action] for action in actions] if actions else []
+
+            # Redraw screen (if anything has changed), or send the frame held back while the link was busy
+            if self._board.needs_redraw():
+                self._board.draw_board(self._iface)
+                self._iface.redraw()
+            elif self._iface.is_frame_pending():
+                self._iface.redraw()
+
+            # Wait for a key press, or until the tetromino is due to move down (no timeout in debug mode)
+            timeout = None
+            if not self._bot is None:
+                timeout = max(0, self._bot_move_time - self._board._clock.now()) / 1000
+            elif not self._debug:
+                timeout = self._board.tetromino_move_auto_timeout() / 1000
+            # Wake to send a held back frame once the link is free
+            if self._iface.is_frame_pending():
+                link_wait = self._iface.link_wait()
+                timeout = link_wait if timeout is None else min(timeout, link_wait)
+            key = self._iface.wait_key(timeout)
+
+            # In demo mode, make the bot's next move if no key was pressed (and it's due)
+            if not self._bot is None and key == -1 and self._board._clock.now() >= self._bot_move_time:
+                key = self._bot_keys.pop(0) if self._bot_keys else self._iface.KEY_DOWN
+                self._bot_move_time = self._board._clock.now() + (self.demo_move_interval * 1000)
+
+            # Redo the layout if the screen has changed size
+            if key == self._iface.KEY_RESIZE:
+                if not self._board.iface_check(self._iface):
+                    raise Exception("Pytuino: screen too small")
 
             # Tetromino rotate
             if key == ord('z') or key == ord('Z'):
+                self._record(TetrisSim.ACTION_ROTATE_ANTICLOCKWISE)
                 self._board.tetromino_rotate(Tetromino.DIR_ANTICLOCKWISE)
             if key == ord('x') or key == ord('X'):
+                self._record(TetrisSim.ACTION_ROTATE_CLOCKWISE)
                 self._board.tetromino_rotate(Tetromino.DIR_CLOCKWISE)
 
             # Tetromino move
-            if key == PytuinoIface.KEY_LEFT:
+            if key == self._iface.KEY_LEFT:
+                self._record(TetrisSim.ACTION_LEFT)
                 self._board.tetromino_move(Tetromino.DIR_LEFT)
-            if key == PytuinoIface.KEY_RIGHT:
+            if key == self._iface.KEY_RIGHT:
+                self._record(TetrisSim.ACTION_RIGHT)
                 self._board.tetromino_move(Tetromino.DIR_RIGHT)
-            if key == PytuinoIface.KEY_UP and self._debug:
+            # (Debug only, games can't be recorded in debug mode)
+            if key == self._iface.KEY_UP and self._debug:
                 self._board.tetromino_move(Tetromino.DIR_UP)
-            # Check for the down key, or timer expiry
-            if key == PytuinoIface.KEY_DOWN or (self._board.tetromino_move_auto() and not self._debug):
+            # Hard drop, the tetromino is fixed where it lands
+            if key == ord(' '):
+                self._record(TetrisSim.ACTION_DROP)
+                self._board.tetromino_drop()
+                affix_tetromino = True
+            # Check for the down key, or timer expiry (catching up any missed moves)
+            moves_down = 0
+            move_action = TetrisSim.ACTION_TICK
+            if key == self._iface.KEY_DOWN:
+                moves_down = 1
+                move_action = TetrisSim.ACTION_DOWN
+            elif not affix_tetromino and not self._debug and self._bot is None:
+                moves_down = self._board.tetromino_move_auto()
+            for move_down in range(0, moves_down):
+                self._record(move_action)
                 if not self._board.tetromino_move(Tetromino.DIR_DOWN):
                     affix_tetromino = True
+                    break
 
             # Affix Tetromino to the board
             if affix_tetromino:
@@ -120,9 +233,6 @@ class Pytuino:
             if key == ord('Q'):
                 break
 
-            # Sleep for a bit
-            time.sleep(0.01)
-
 # Main
 ###############################################################################
 if __name__ == '__main__':
@@ -135,18 +245,66 @@ if __name__ == '__main__':
         "-d", "--debug", help="Print debug information.",
         action="store_true"
     )
+    parser.add_argument(
+        "-a", "--ansi", help="Drive the terminal with ANSI/VT100 escape sequences, instead of curses.",
+        action="store_true"
+    )
+    parser.add_argument(
+        "--demo", help="Demo mode, the computer plays.",
+        action="store_true"
+    )
+    parser.add_argument(
+        "-r", "--record", help="Record the game to the given replay file.",
+        metavar="FILE"
+    )
+    parser.add_argument(
+        "--replay", help="Play back the given replay file.",
+        metavar="FILE"
+    )
+    parser.add_argument(
+        "--speed", help="Replay speed (1 is real time, 0 as fast as possible, default: %(default)s).",
+        type=float, default=1.0
+    )
+    parser.add_argument(
+        "--seek", help="Start the replay from the given time (in seconds).",
+        type=float
+    )
+    parser.add_argument(
+        "-s", "--serial", help="Play on the terminal attached to the given serial device (implies --ansi).",
+        metavar="DEVICE"
+    )
+    parser.add_argument(
+        "-b", "--baud", help="Rate of the link to the terminal in bits per second, frames are dropped rather than queued while it's busy (default: measured from the output queue, --ansi and --serial only).",
+        type=int
+    )
     parser.add_argument(
         "-v", "--version", action="version",
         version = f"{parser.prog} version {Pytuino.version}"
     )
     args = parser.parse_args()
+    if args.debug and args.record:
+        parser.error("games can't be recorded in debug mode (--debug with --record)")
 
     pto = None
     err = None
     try:
-        pto = Pytuino(debug=args.debug)
-        pto.play()
-        pto.game_over()
+        iface = None
+        if args.serial:
+            from iface_ansi import PytuinoIface
+            serial_fd = os.open(args.serial, os.O_RDWR | os.O_NOCTTY)
+            iface = PytuinoIface(output=os.fdopen(serial_fd, "wb", buffering=0, closefd=False), input=serial_fd, columns=80, rows=24, baud=args.baud)
+        elif args.ansi:
+            from iface_ansi import PytuinoIface
+            iface = PytuinoIface(baud=args.baud)
+
+        pto = Pytuino(debug=args.debug, iface=iface, demo=args.demo, record=args.record)
+        if args.replay:
+            # (Quitting part way through a replay doesn't show the end of the game)
+            if pto.replay(args.replay, speed=args.speed, seek=args.seek):
+                pto.game_over()
+        else:
+            pto.play()
+            pto.game_over()
     except Exception as e:
         err = e
     finally:
@@ -156,6 +314,11 @@ if __name__ == '__main__':
             # Print info on exit
             print(f"Screen size: {pto._iface._columns}x{pto._iface._rows}")
             print(f"Number of colours: {pto._iface._max_colours}")
+            frame_stats = pto._iface.get_frame_stats()
+            print(f"Frames sent: {frame_stats['sent']}	Frames dropped: {frame_stats['dropped']}")
+            link_stats = pto._iface.get_link_stats()
+            if not link_stats['rate'] is None and not link_stats['frame_bytes'] is None:
+                print(f"Link rate: {link_stats['rate']:.0f} bytes/sec	Bytes/frame: {link_stats['frame_bytes']:.0f}")
         if not err is None:
             raise err
 
@@ -0,0 +1,394 @@
+#!/usr/bin/env python3
+"""
+Pytuino replays
+
+A replay is the seed and size of the board, followed by the actions made
+(TetrisSim.ACTION_*, gravity included as ACTION_TICK) and the time they were
+made, so a game can be re-simulated exactly. Snapshots of the game (keyframes)
+are added at intervals, so playback can jump to any point in a long game
+without re-simulating it from the start.
+
+File format, numbers are unsigned LEB128 varints (zigzag encoded if signed):
+    Header: MAGIC, version, seed, columns, rows
+    Records: time since the previous record (ms), then either
+        action (1 and up)
+        0, keyframe: time (ms), event index, score, lines, pieces, game over, bags,
+           bag length, bag types, tetromino type (0 for none)[, rotation, column, row],
+           board cells (bottom row first)
+"""
+
+import time
+
+from game_clock import MonotonicClock
+from sim_tetris import TetrisSim
+
+# File identifier, and format version
+MAGIC = b"PYTR"
+VERSION = 1
+
+def varint_encode(value, buffer):
+    """
+    Append an unsigned integer to a bytearray as a varint
+    """
+    while value > 0x7F:
+        buffer.append((value & 0x7F) | 0x80)
+        value >>= 7
+    buffer.append(value)
+
+def varint_decode(data, offset):
+    """
+    Read a varint from data at the given offset, returning a tuple of (value, offset after the varint)
+    """
+    value = 0
+    shift = 0
+    while True:
+        if offset >= len(data):
+            raise EOFError("Replay: truncated varint")
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, offset
+        shift += 7
+
+def zigzag_encode(value):
+    """ Map a signed integer to an unsigned one (0, -1, 1, -2, ... to 0, 1, 2, 3, ...) """
+    return (value << 1) if value >= 0 else ((-value << 1) - 1)
+
+def zigzag_decode(value):
+    """ Reverse zigzag_encode """
+    return (value >> 1) if not value & 1 else -((value + 1) >> 1)
+
+###############################################################################
+class ReplayRecorder:
+###############################################################################
+    """
+    Records the actions of a game to a replay file
+    The actions are also applied to a headless copy of the game, to take the keyframes from
+    """
+
+    def __init__(self, path, seed, columns=10, rows=20, keyframe_interval=10000, clock=None):
+        """
+        Create the replay file
+
+            path
+                Replay file to write
+            seed
+                Seed the game's board was created with
+            columns
+                Board width
+            rows
+                Board height
+            keyframe_interval
+                Time between keyframes (in milliseconds)
+            clock
+                Clock used to time the actions (default: MonotonicClock)
+        """
+        if clock is None:
+            clock = MonotonicClock()
+        self._clock = clock
+        self._start = clock.now()
+        self._tick = 0
+        self._keyframe_interval = keyframe_interval
+        self._keyframe_tick = 0
+        self._events = 0
+
+        self._sim = TetrisSim(columns=columns, rows=rows)
+        self._sim.reset(seed)
+
+        self._file = open(path, 'wb')
+        buffer = bytearray(MAGIC)
+        for value in (VERSION, seed, columns, rows):
+            varint_encode(value, buffer)
+        self._file.write(buffer)
+
+    def close(self):
+        """
+        Finish the replay, with a keyframe of the final state
+        """
+        if self._file is None:
+            return
+        buffer = bytearray()
+        self._write_keyframe(buffer)
+        self._file.write(buffer)
+        self._file.close()
+        self._file = None
+
+    def _write_keyframe(self, buffer):
+        """
+        Append a keyframe of the current state of the game to buffer
+        """
+        snapshot = self._sim.get_snapshot()
+        varint_encode(0, buffer)
+        varint_encode(0, buffer)
+        for value in (self._tick, self._events, snapshot['score'], snapshot['lines'], snapshot['pieces'], int(snapshot['game_over']), snapshot['bags'], len(snapshot['bag'])):
+            varint_encode(value, buffer)
+        for type in snapshot['bag']:
+            varint_encode(type, buffer)
+        if snapshot['tetromino'] is None:
+            varint_encode(0, buffer)
+        else:
+            type, rotation, position_x, position_y = snapshot['tetromino']
+            varint_encode(type, buffer)
+            varint_encode(rotation, buffer)
+            varint_encode(zigzag_encode(position_x), buffer)
+            varint_encode(zigzag_encode(position_y), buffer)
+        for row in snapshot['board']:
+            for cell in row:
+                varint_encode(cell, buffer)
+        self._keyframe_tick = self._tick
+
+    def record(self, action):
+        """
+        Record an action (TetrisSim.ACTION_*) made now
+        """
+        buffer = bytearray()
+        tick = self._clock.now() - self._start
+        # Keyframe before the action, if one is due
+        if tick - self._keyframe_tick >= self._keyframe_interval:
+            self._write_keyframe(buffer)
+        varint_encode(tick - self._tick, buffer)
+        varint_encode(action, buffer)
+        self._tick = tick
+        self._events += 1
+        self._sim.step(action)
+        self._file.write(buffer)
+
+###############################################################################
+class ReplayPlayer:
+###############################################################################
+    """
+    Plays back a replay file, headless or through an interface
+    """
+
+    def __init__(self, path):
+        """
+        Load a replay file
+
+            path
+                Replay file to read
+        """
+        with open(path, 'rb') as replay:
+            data = replay.read()
+        if data[0:len(MAGIC)] != MAGIC:
+            raise ValueError(f"Replay: not a replay file: {path}")
+        offset = len(MAGIC)
+        version, offset = varint_decode(data, offset)
+        if version != VERSION:
+            raise ValueError(f"Replay: unsupported version: {version}")
+        self._seed, offset = varint_decode(data, offset)
+        self._columns, offset = varint_decode(data, offset)
+        self._rows, offset = varint_decode(data, offset)
+
+        # Actions as (time, action), and keyframes as (time, index of the next action, snapshot)
+        self._events = []
+        self._keyframes = []
+        tick = 0
+        while offset < len(data):
+            try:
+                delta, offset = varint_decode(data, offset)
+                action, offset = varint_decode(data, offset)
+                if action == 0:
+                    keyframe, offset = self._read_keyframe(data, offset)
+                    self._keyframes.append(keyframe)
+                    continue
+            except EOFError:
+                # The recording was cut short, play what there is
+                break
+            tick += delta
+            self._events.append((tick, action))
+
+        self._sim = TetrisSim(columns=self._columns, rows=self._rows)
+        self._event_index = 0
+        self.rewind()
+
+    def _read_keyframe(self, data, offset):
+        """
+        Read a keyframe from data at the given offset, returning a tuple of (keyframe, offset after the keyframe)
+        """
+        values = []
+        for value_index in range(0, 8):
+            value, offset = varint_decode(data, offset)
+            values.append(value)
+        tick, event_index, score, lines, pieces, game_over, bags, bag_length = values
+        bag = []
+        for bag_index in range(0, bag_length):
+            type, offset = varint_decode(data, offset)
+            bag.append(type)
+        tetromino = None
+        type, offset = varint_decode(data, offset)
+        if type > 0:
+            rotation, offset = varint_decode(data, offset)
+            position_x, offset = varint_decode(data, offset)
+            position_y, offset = varint_decode(data, offset)
+            tetromino = (type, rotation, zigzag_decode(position_x), zigzag_decode(position_y))
+        board = []
+        for row_index in range(0, self._rows):
+            row = []
+            for column_index in range(0, self._columns):
+                cell, offset = varint_decode(data, offset)
+                row.append(cell)
+            board.append(tuple(row))
+
+        snapshot = {
+            'board': tuple(board),
+            'tetromino': tetromino,
+            'bag': tuple(bag),
+            'bags': bags,
+            'score': score,
+            'lines': lines,
+            'pieces': pieces,
+            'game_over': bool(game_over),
+        }
+        return (tick, event_index, snapshot), offset
+
+    def get_duration(self):
+        """ Return the time of the last action (in milliseconds) """
+        return self._events[-1][0] if self._events else 0
+
+    def get_sim(self):
+        """ Return the simulation being played back """
+        return self._sim
+
+    def get_tick(self):
+        """ Return the time of the last action played (in milliseconds) """
+        return self._events[self._event_index-1][0] if self._event_index > 0 else 0
+
+    def is_finished(self):
+        """ Return whether every action has been played """
+        return self._event_index >= len(self._events)
+
+    def rewind(self):
+        """
+        Go back to the start of the game
+        """
+        self._sim.reset(self._seed)
+        self._event_index = 0
+
+    def seek(self, tick):
+        """
+        Move to the given time (in milliseconds), playing every action up to (and including) that time
+        Starts from the last keyframe before that time, if it's closer than the current position
+        """
+        keyframe = None
+        for keyframe_tick, event_index, snapshot in self._keyframes:
+            if keyframe_tick > tick:
+                break
+            keyframe = (event_index, snapshot)
+        if not keyframe is None and (keyframe[0] > self._event_index or tick < self.get_tick()):
+            self._sim.reset(self._seed)
+            self._sim.set_snapshot(keyframe[1])
+            self._event_index = keyframe[0]
+        elif tick < self.get_tick():
+            self.rewind()
+
+        while self._event_index < len(self._events) and self._events[self._event_index][0] <= tick:
+            self.step()
+
+    def step(self):
+        """
+        Play the next action, returning the same as TetrisSim.step (or None if there are none left)
+        """
+        if self._event_index >= len(self._events):
+            return None
+        tick, action = self._events[self._event_index]
+        self._event_index += 1
+        return self._sim.step(action)
+
+    def play(self, iface, speed=1.0):
+        """
+        Play the replay (from the current position) through an interface
+        Returns whether it played to the end (False if 'Q' was pressed)
+
+            iface
+                Interface to draw the game on
+            speed
+                Playback speed (1 is real time, 0 as fast as possible)
+        """
+        board = self._sim.get_board()
+        if not board.iface_check(iface):
+            raise Exception("Replay: screen too small")
+        board.draw_board(iface)
+        iface.redraw()
+
+        clock = MonotonicClock()
+        start = clock.now()
+        start_tick = self.get_tick()
+        while not self.is_finished():
+            # Wait until the next action is due
+            timeout = 0
+            if speed > 0:
+                due = start + ((self._events[self._event_index][0] - start_tick) / speed)
+                timeout = max(0, due - clock.now()) / 1000
+            # Wake to send a held back frame once the link is free
+            if iface.is_frame_pending():
+                timeout = min(timeout, iface.link_wait())
+            key = iface.wait_key(timeout)
+            if key == ord('Q'):
+                return False
+            if key == iface.KEY_RESIZE:
+                board.iface_check(iface)
+            if speed > 0 and clock.now() < due:
+                if iface.is_frame_pending():
+                    iface.redraw()
+                continue
+
+            self.step()
+            if board.needs_redraw():
+                board.draw_board(iface)
+                iface.redraw()
+            elif iface.is_frame_pending():
+                iface.redraw()
+
+        # Send the last frame, if it was held back
+        while iface.is_frame_pending():
+            iface.wait_key(iface.link_wait())
+            iface.redraw()
+        return True
+
+# Main
+###############################################################################
+if __name__ == '__main__':
+    import argparse
+    import os
+    import tempfile
+
+    from bot_tetris import TetrisBot
+    from game_clock import ManualClock
+
+    parser = argparse.ArgumentParser(
+        description="Pytuino - Re-simulate a replay headless (default: record a bot game)"
+    )
+    parser.add_argument("replay", help="Replay file.", nargs="?")
+    parser.add_argument("--seek", help="Time to seek to (in seconds).", type=float, default=None)
+    args = parser.parse_args()
+
+    path = args.replay
+    if path is None:
+        # Record a bot game, with a new action every 50ms
+        path = os.path.join(tempfile.mkdtemp(), "bot.pytr")
+        clock = ManualClock()
+        sim = TetrisSim()
+        sim.reset(1234)
+        recorder = ReplayRecorder(path, 1234, keyframe_interval=5000, clock=clock)
+        bot = TetrisBot()
+        actions = 0
+        while not sim.is_game_over() and sim.get_state()['pieces'] < 300:
+            for action in bot.choose(sim.get_board()) or [TetrisSim.ACTION_DROP]:
+                clock.advance(50)
+                recorder.record(action)
+                sim.step(action)
+                actions += 1
+        recorder.close()
+        print(f"Recorded: {actions} actions	{os.path.getsize(path)} bytes")
+
+    # Re-simulate at full speed
+    player = ReplayPlayer(path)
+    start = time.perf_counter()
+    if args.seek is None:
+        player.seek(player.get_duration())
+    else:
+        player.seek(int(args.seek * 1000))
+    elapsed = time.perf_counter() - start
+    state = player.get_sim().get_state()
+    print(f"Time: {player.get_tick()/1000:.1f}s	Score: {state['score']}	Lines: {state['lines']}	Pieces: {state['pieces']}	Game over: {state['game_over']}	Seconds: {elapsed:.4f}")
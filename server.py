@@ -0,0 +1,892 @@
+#!/usr/bin/env python3
+"""
+Pytuino game server
+
+Hosts many games from a single process, for telnet users and terminals on
+serial to TCP bridges. Each connection gets it's own game (a TetrisSim, so
+it's own TetrisBoard) drawn through a shadow buffer, so only changed cells are
+sent, and an ANSI interface writing to the socket.
+
+Everything runs on an asyncio event loop: input is fed to the interface as it
+arrives, and draws are coalesced so several changes in one pass of the loop
+make a single frame. The timed events of every game (gravity) are held in a
+single timer wheel, ticked by the loop, so only the games that are due are
+woken. Slow clients get backpressure, while a client's send buffer is over
+the limit nothing more is sent to it, and once it has drained it's sent the
+latest state (so a slow client skips states rather than building a backlog).
+Clients that don't drain at all are disconnected.
+
+Games can also be watched, by connecting to the spectator port. Each frame of
+a game is encoded once and the same bytes sent to the player and every
+spectator, spectators joining part way through (or catching up after falling
+behind) are sent a keyframe of the whole screen.
+"""
+
+import argparse
+import asyncio
+import socket
+
+from iface_ansi import PytuinoIface
+from iface_shadow import PytuinoIfaceShadow
+from sim_tetris import TetrisSim
+from timer_wheel import TimerWheel
+
+# Telnet commands and options
+TELNET_IAC = 255
+TELNET_DONT = 254
+TELNET_DO = 253
+TELNET_WONT = 252
+TELNET_WILL = 251
+TELNET_SB = 250
+TELNET_SE = 240
+TELNET_ECHO = 1
+TELNET_SGA = 3
+TELNET_NAWS = 31
+
+###############################################################################
+class TelnetParser:
+###############################################################################
+    """
+    Separates the terminal's keys from telnet commands, noting any window size reported (NAWS)
+    """
+
+    # Negotiation sent on connection: the server echoes (so the client doesn't), no go-aheads (character mode), and ask for the window size
+    NEGOTIATION = bytes((
+        TELNET_IAC, TELNET_WILL, TELNET_ECHO,
+        TELNET_IAC, TELNET_WILL, TELNET_SGA,
+        TELNET_IAC, TELNET_DO, TELNET_SGA,
+        TELNET_IAC, TELNET_DO, TELNET_NAWS,
+    ))
+
+    STATE_DATA = 0
+    STATE_IAC = 1
+    STATE_OPTION = 2
+    STATE_SB = 3
+    STATE_SB_IAC = 4
+
+    def __init__(self):
+        """ Initialise the parser """
+        self._state = TelnetParser.STATE_DATA
+        self._subnegotiation = bytearray()
+        # Window size reported by the client as (columns, rows), or None
+        self.window_size = None
+
+    def feed(self, data):
+        """
+        Parse data received from the client, returning the terminal's keys
+        """
+        keys = bytearray()
+        for byte in data:
+            if self._state == TelnetParser.STATE_DATA:
+                if byte == TELNET_IAC:
+                    self._state = TelnetParser.STATE_IAC
+                # A return is sent as CR NUL
+                elif byte != 0:
+                    keys.append(byte)
+            elif self._state == TelnetParser.STATE_IAC:
+                if byte == TELNET_IAC:
+                    keys.append(byte)
+                    self._state = TelnetParser.STATE_DATA
+                elif byte == TELNET_SB:
+                    self._subnegotiation = bytearray()
+                    self._state = TelnetParser.STATE_SB
+                elif byte in (TELNET_DO, TELNET_DONT, TELNET_WILL, TELNET_WONT):
+                    self._state = TelnetParser.STATE_OPTION
+                else:
+                    self._state = TelnetParser.STATE_DATA
+            elif self._state == TelnetParser.STATE_OPTION:
+                # Replies to the negotiation, nothing else is offered so they are just accepted
+                self._state = TelnetParser.STATE_DATA
+            elif self._state == TelnetParser.STATE_SB:
+                if byte == TELNET_IAC:
+                    self._state = TelnetParser.STATE_SB_IAC
+                else:
+                    self._subnegotiation.append(byte)
+            elif self._state == TelnetParser.STATE_SB_IAC:
+                if byte == TELNET_SE:
+                    self._subnegotiation_end()
+                    self._state = TelnetParser.STATE_DATA
+                else:
+                    self._subnegotiation.append(byte)
+                    self._state = TelnetParser.STATE_SB
+        return bytes(keys)
+
+    def _subnegotiation_end(self):
+        """
+        Handle a completed subnegotiation (only the window size is of interest)
+        """
+        data = self._subnegotiation
+        if len(data) == 5 and data[0] == TELNET_NAWS:
+            columns = (data[1] << 8) | data[2]
+            rows = (data[3] << 8) | data[4]
+            # Zero means unknown
+            if columns > 0 and rows > 0:
+                self.window_size = (columns, rows)
+
+###############################################################################
+class FrameBroadcast:
+###############################################################################
+    """
+    Output stream of a game's interface, sending each frame to the player and any spectators
+
+    A frame is encoded once (the cells the game's shadow buffer found changed
+    since the last frame) and the same bytes are written to every watcher. A
+    watcher whose send buffer goes over the limit is sent nothing more until
+    it has drained, it then skips to the latest state with a keyframe (the
+    whole screen, from the shadow's front buffer), so the data held for any
+    watcher stays within the limit however slow it is.
+    """
+
+    # Watcher states
+    WATCHER_LIVE = 0
+    WATCHER_KEYFRAME = 1
+    WATCHER_BEHIND = 2
+
+    def __init__(self, server, ready_callback):
+        """
+        Initialise the broadcast
+
+            server
+                GameServer the game belongs to
+            ready_callback
+                Called when a watcher has caught up (so a frame should be drawn for it)
+        """
+        self._server = server
+        self._ready_callback = ready_callback
+        self._loop = asyncio.get_running_loop()
+        # Interface the game is drawn through (set by the game once it's created)
+        # Keyframes are taken from it after a redraw, so they match the frames sent (the shadow's front buffer)
+        self.iface = None
+        # State of each watcher (by the writer of it's connection)
+        self._watchers = {}
+        # Data written by the interface, not yet sent
+        self._frame = []
+        # Statistics
+        self.count = 0
+        self.frames = 0
+        self.keyframes = 0
+        self.frames_skipped = 0
+
+    def write(self, data):
+        """ Add data written by the interface to the frame being built """
+        self._frame.append(data)
+        return len(data)
+
+    def add_watcher(self, writer, keyframe=True):
+        """
+        Start sending frames to a connection
+
+            writer
+                asyncio stream of the connection
+            keyframe
+                Send the whole screen first (the connection is joining part way through)
+        """
+        self._watchers[writer] = FrameBroadcast.WATCHER_KEYFRAME if keyframe else FrameBroadcast.WATCHER_LIVE
+
+    def remove_watcher(self, writer):
+        """ Stop sending frames to a connection """
+        self._watchers.pop(writer, None)
+
+    def get_watchers(self):
+        """ Return the number of connections frames are sent to """
+        return len(self._watchers)
+
+    def is_ready(self):
+        """ Return whether any watcher can be sent a frame (if not, there's no need to draw) """
+        for state in self._watchers.values():
+            if state != FrameBroadcast.WATCHER_BEHIND:
+                return True
+        return False
+
+    def publish(self):
+        """
+        Send the frame drawn since the last publish to every watcher (or a keyframe, to those that need one)
+        """
+        data = b"".join(self._frame)
+        self._frame = []
+        keyframe = None
+        sent = False
+        for writer, state in list(self._watchers.items()):
+            if writer.is_closing():
+                continue
+            if state == FrameBroadcast.WATCHER_BEHIND:
+                if len(data) > 0:
+                    self.frames_skipped += 1
+                continue
+            if state == FrameBroadcast.WATCHER_KEYFRAME:
+                # Encoded once, however many watchers need it
+                if keyframe is None:
+                    keyframe = self.iface.get_keyframe()
+                    self.keyframes += 1
+                writer.write(keyframe)
+                self.count += len(keyframe)
+                self._watchers[writer] = FrameBroadcast.WATCHER_LIVE
+                sent = True
+            elif len(data) > 0:
+                writer.write(data)
+                self.count += len(data)
+                sent = True
+            if writer.transport.get_write_buffer_size() > self._server._write_buffer_limit:
+                self._watchers[writer] = FrameBroadcast.WATCHER_BEHIND
+                self._loop.create_task(self._drain(writer))
+        if sent:
+            self.frames += 1
+
+    async def _drain(self, writer):
+        """
+        Wait for a watcher to catch up, then send it the latest state
+        """
+        try:
+            await asyncio.wait_for(writer.drain(), self._server._drain_timeout)
+        except (asyncio.TimeoutError, ConnectionError):
+            # Not reading what's sent, so give up on it
+            writer.transport.abort()
+            return
+        if writer in self._watchers:
+            self._watchers[writer] = FrameBroadcast.WATCHER_KEYFRAME
+            self._ready_callback()
+
+###############################################################################
+class GameSession:
+###############################################################################
+    """
+    A game played over a single connection
+    """
+
+    def __init__(self, server, reader, writer):
+        """
+        Initialise the session
+
+            server
+                GameServer the session belongs to
+            reader, writer
+                asyncio streams of the connection
+        """
+        self._server = server
+        self._reader = reader
+        self._writer = writer
+        self._loop = asyncio.get_running_loop()
+
+        # Telnet negotiation has to be sent before anything is drawn
+        self._telnet = None
+        if server._telnet:
+            self._telnet = TelnetParser()
+            writer.write(TelnetParser.NEGOTIATION)
+        # Limit the data waiting to be sent, beyond that drawing is paused until it has drained
+        writer.transport.set_write_buffer_limits(high=server._write_buffer_limit)
+
+        # Frames are sent to the player, and any spectators, through the broadcast
+        self._broadcast = FrameBroadcast(server, self._request_draw)
+        self._broadcast.add_watcher(writer, keyframe=False)
+        self._terminal_iface = PytuinoIface(output=self._broadcast, input=-1, columns=server._columns, rows=server._rows)
+        # Only changed cells are sent to the terminal
+        self._iface = PytuinoIfaceShadow(self._terminal_iface)
+        self._broadcast.iface = self._iface
+        self._key_actions = {
+            ord('z'): TetrisSim.ACTION_ROTATE_ANTICLOCKWISE,
+            ord('Z'): TetrisSim.ACTION_ROTATE_ANTICLOCKWISE,
+            ord('x'): TetrisSim.ACTION_ROTATE_CLOCKWISE,
+            ord('X'): TetrisSim.ACTION_ROTATE_CLOCKWISE,
+            self._iface.KEY_LEFT: TetrisSim.ACTION_LEFT,
+            self._iface.KEY_RIGHT: TetrisSim.ACTION_RIGHT,
+            self._iface.KEY_DOWN: TetrisSim.ACTION_DOWN,
+            ord(' '): TetrisSim.ACTION_DROP,
+        }
+
+        self._sim = TetrisSim()
+        self._sim.reset()
+        self._pieces = 1
+        # Flag: The screen is large enough for the board
+        self._screen_ok = self._sim.get_board().iface_check(self._iface)
+
+        # Gravity timer (a Timer of the server's wheel, reused for each tetromino)
+        self._gravity_timer = None
+        # Flag: A draw has been scheduled
+        self._draw_pending = False
+        self._closed = False
+        # Spectators watching the game
+        self._spectators = []
+
+    def _schedule_gravity(self):
+        """
+        (Re)start the gravity timer, the tetromino is moved down a full interval from now
+        """
+        self._gravity_timer = self._server.set_timer(self._gravity_timer, self._sim.get_board()._tetroino_move_interval, self._gravity)
+
+    def _gravity(self):
+        """
+        Gravity timer expired, move the tetromino down
+        """
+        self._step(TetrisSim.ACTION_TICK)
+        # Unless a new tetromino has restarted it
+        if not self._gravity_timer.is_active() and not self._sim.is_game_over():
+            self._schedule_gravity()
+
+    def _step(self, action):
+        """
+        Apply an action to the game
+        """
+        if self._sim.is_game_over():
+            return
+        state, lines, game_over = self._sim.step(action)
+        if game_over:
+            self._gravity_timer.cancel()
+        elif state['pieces'] != self._pieces:
+            # A new tetromino gets a full interval before it moves down
+            self._pieces = state['pieces']
+            self._schedule_gravity()
+        self._request_draw()
+
+    def _handle_keys(self):
+        """
+        Handle the keys waiting in the interface, returning False if the player has quit
+        """
+        while True:
+            key = self._iface.get_key()
+            if key == -1:
+                return True
+            if key == ord('Q'):
+                return False
+            # Ctrl-L redraws the whole screen (after line noise, or a terminal reset)
+            if key == self._iface.KEY_RESIZE or key == 0x0C:
+                self._iface.invalidate()
+                self._screen_ok = self._sim.get_board().iface_check(self._iface)
+                self._request_draw()
+                continue
+            action = self._key_actions.get(key)
+            if not action is None:
+                self._step(action)
+
+    def _request_draw(self):
+        """
+        Draw the game once the loop has handled everything else waiting (so changes are coalesced in to one frame)
+        """
+        if self._draw_pending or self._closed:
+            return
+        self._draw_pending = True
+        self._loop.call_soon(self._draw)
+
+    def _draw(self):
+        """
+        Draw the game, unless every watcher is still catching up (in which case it's drawn once one has)
+        """
+        self._draw_pending = False
+        if self._closed or not self._broadcast.is_ready():
+            return
+
+        board = self._sim.get_board()
+        if not self._screen_ok:
+            self._iface.clear_screen()
+            self._iface.print_str("Screen too small", columns=0, rows=0)
+        elif self._sim.is_game_over():
+            board.draw_board(self._iface, override_colour=254)
+            board.draw_gameover(self._iface)
+        elif board.needs_redraw():
+            board.draw_board(self._iface)
+        self._iface.redraw()
+        self._broadcast.publish()
+
+    def add_spectator(self, spectator):
+        """
+        Start sending the game to a spectator, beginning with a keyframe on the next draw
+        """
+        self._spectators.append(spectator)
+        self._broadcast.add_watcher(spectator._writer)
+        self._request_draw()
+
+    def remove_spectator(self, spectator):
+        """
+        Stop sending the game to a spectator
+        """
+        if spectator in self._spectators:
+            self._spectators.remove(spectator)
+        self._broadcast.remove_watcher(spectator._writer)
+
+    async def run(self):
+        """
+        Play the game until the player quits, or disconnects
+        """
+        self._schedule_gravity()
+        self._request_draw()
+        try:
+            while True:
+                data = await self._reader.read(1024)
+                if not data:
+                    break
+                if not self._telnet is None:
+                    data = self._telnet.feed(data)
+                    if not self._telnet.window_size is None:
+                        self._terminal_iface.resize(*self._telnet.window_size)
+                        self._telnet.window_size = None
+                self._terminal_iface.feed(data)
+                if not self._handle_keys():
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            self.close()
+
+    def close(self):
+        """
+        End the session, returning the terminal to it's normal settings if still connected
+        """
+        if self._closed:
+            return
+        self._closed = True
+        if not self._gravity_timer is None:
+            self._gravity_timer.cancel()
+        # Spectators move on to another game (before the terminal is reset for the player)
+        for spectator in list(self._spectators):
+            spectator.watch_next()
+        if not self._writer.is_closing():
+            self._iface.close()
+            self._broadcast.publish()
+            self._writer.close()
+
+###############################################################################
+class SpectatorSession:
+###############################################################################
+    """
+    A connection watching the games being played
+    Frames are sent as drawn for the player, so the terminal needs to be at least as large as the player's
+    """
+
+    def __init__(self, server, reader, writer):
+        """
+        Initialise the session
+
+            server
+                GameServer the session belongs to
+            reader, writer
+                asyncio streams of the connection
+        """
+        self._server = server
+        self._reader = reader
+        self._writer = writer
+
+        self._telnet = None
+        if server._telnet:
+            self._telnet = TelnetParser()
+            writer.write(TelnetParser.NEGOTIATION)
+        writer.transport.set_write_buffer_limits(high=server._write_buffer_limit)
+
+        # Game being watched (None while waiting for one)
+        self._game = None
+        self._closed = False
+
+    def watch(self, game):
+        """
+        Watch the given game (None to wait for the next to start)
+        """
+        if not self._game is None:
+            self._game.remove_spectator(self)
+        self._game = game
+        if self._closed or self._writer.is_closing():
+            return
+        if game is None:
+            self._writer.write(b"\x1b[0m\x1b[H\x1b[2JWaiting for a game to start (N: next game, Q: quit)\r\n")
+        else:
+            game.add_spectator(self)
+
+    def watch_next(self):
+        """
+        Move on to the game after the one being watched (in the order they started)
+        """
+        games = [game for game in self._server._sessions if not game._closed]
+        if len(games) == 0:
+            self.watch(None)
+            return
+        index = 0
+        if self._game in games:
+            index = (games.index(self._game) + 1) % len(games)
+        self.watch(games[index])
+
+    def is_waiting(self):
+        """ Return whether the spectator is waiting for a game to start """
+        return self._game is None and not self._closed
+
+    async def run(self):
+        """
+        Watch games until the spectator quits, or disconnects
+        """
+        self.watch_next()
+        try:
+            while True:
+                data = await self._reader.read(1024)
+                if not data:
+                    break
+                if not self._telnet is None:
+                    data = self._telnet.feed(data)
+                if b"Q" in data:
+                    break
+                if b"n" in data or b"N" in data:
+                    self.watch_next()
+                elif b"\x0c" in data and not self._game is None:
+                    # Redraw the whole screen, by rejoining the game
+                    self._game.remove_spectator(self)
+                    self._game.add_spectator(self)
+        except ConnectionError:
+            pass
+        finally:
+            self.close()
+
+    def close(self):
+        """
+        End the session
+        """
+        if self._closed:
+            return
+        self._closed = True
+        if not self._game is None:
+            self._game.remove_spectator(self)
+            self._game = None
+        if not self._writer.is_closing():
+            self._writer.write(b"\x1b[0m\x1b[?25h\r\n")
+            self._writer.close()
+
+###############################################################################
+class GameServer:
+###############################################################################
+    """
+    Accepts connections, starting a game for each
+    """
+
+    def __init__(self, host="127.0.0.1", port=2323, telnet=True, columns=80, rows=24, max_sessions=1000, write_buffer_limit=16384, drain_timeout=30, spectate_port=None, max_spectators=1000):
+        """
+        Initialise the server (start to listen)
+
+            host, port
+                Address to listen on (port 0 picks a free port)
+            telnet
+                Negotiate with the client as a telnet server (disable for raw TCP, e.g. serial bridges)
+            columns, rows
+                Screen size, if the client doesn't report it
+            max_sessions
+                Maximum number of games at once
+            write_buffer_limit
+                Data waiting to be sent to a client (in bytes) beyond which drawing is paused
+            drain_timeout
+                Time (in seconds) a client can take to catch up before it's disconnected
+            spectate_port
+                Port spectators connect to, to watch the games (None for no spectators, 0 picks a free port)
+            max_spectators
+                Maximum number of spectators at once
+        """
+        self._host = host
+        self._port = port
+        self._telnet = telnet
+        self._columns = columns
+        self._rows = rows
+        self._max_sessions = max_sessions
+        self._write_buffer_limit = write_buffer_limit
+        self._drain_timeout = drain_timeout
+        self._spectate_port = spectate_port
+        self._max_spectators = max_spectators
+
+        self._server = None
+        self._spectate_server = None
+        # Sessions being played, and spectators, and the task running each
+        self._sessions = {}
+        self._spectators = {}
+        # Timers of every session, and the loop's handle of the next tick and it's time (None when there are no timers)
+        self._timers = TimerWheel()
+        self._timers_handle = None
+        self._timers_wake = None
+        # Statistics of sessions that have finished
+        self._sessions_total = 0
+        self._bytes_sent = 0
+        self._frames = 0
+        self._keyframes = 0
+        self._frames_skipped = 0
+
+    async def start(self):
+        """
+        Start listening for connections
+        """
+        self._server = await asyncio.start_server(self._connected, self._host, self._port)
+        if not self._spectate_port is None:
+            self._spectate_server = await asyncio.start_server(self._spectator_connected, self._host, self._spectate_port)
+
+    async def close(self):
+        """
+        Stop listening, and end every session
+        """
+        self._server.close()
+        if not self._spectate_server is None:
+            self._spectate_server.close()
+        tasks = list(self._spectators.values()) + list(self._sessions.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await self._server.wait_closed()
+        if not self._spectate_server is None:
+            await self._spectate_server.wait_closed()
+
+    def get_port(self):
+        """ Return the port being listened on """
+        return self._server.sockets[0].getsockname()[1]
+
+    def get_spectate_port(self):
+        """ Return the port spectators connect to (None if there are no spectators) """
+        if self._spectate_server is None:
+            return None
+        return self._spectate_server.sockets[0].getsockname()[1]
+
+    def get_stats(self):
+        """
+        Return the server statistics as a dictionary
+            sessions: Number of games being played
+            sessions_total: Number of games started
+            spectators: Number of spectators watching
+            bytes_sent: Bytes sent to clients (players and spectators)
+            frames: Frames sent (each encoded once, however many watch it)
+            keyframes: Keyframes sent (to spectators joining, and clients catching up)
+            frames_skipped: Frames not sent to a client as it was catching up
+        """
+        broadcasts = [session._broadcast for session in self._sessions]
+        return {
+            'sessions': len(self._sessions),
+            'sessions_total': self._sessions_total,
+            'spectators': len(self._spectators),
+            'bytes_sent': self._bytes_sent + sum(broadcast.count for broadcast in broadcasts),
+            'frames': self._frames + sum(broadcast.frames for broadcast in broadcasts),
+            'keyframes': self._keyframes + sum(broadcast.keyframes for broadcast in broadcasts),
+            'frames_skipped': self._frames_skipped + sum(broadcast.frames_skipped for broadcast in broadcasts),
+        }
+
+    def set_timer(self, timer, delay, callback):
+        """
+        Start a timer (or restart an existing one) to call callback after the given delay (in milliseconds)
+        Returns the Timer, which can be restarted by passing it back
+        """
+        deadline = self._timers.now() + delay
+        if timer is None:
+            timer = self._timers.schedule(deadline, callback)
+        else:
+            self._timers.reschedule(timer, deadline)
+        self._timers_schedule()
+        return timer
+
+    def _timers_schedule(self):
+        """
+        Wake the loop when the next timer is due (an earlier wake, from a timer since moved later, is just a wasted tick)
+        """
+        wake = self._timers.next_deadline()
+        if not self._timers_handle is None:
+            if not wake is None and wake >= self._timers_wake:
+                return
+            self._timers_handle.cancel()
+            self._timers_handle = None
+        if not wake is None:
+            self._timers_wake = wake
+            self._timers_handle = asyncio.get_running_loop().call_later(max(0, wake - self._timers.now()) / 1000, self._timers_tick)
+
+    def _timers_tick(self):
+        """
+        Fire the timers that are due
+        """
+        self._timers_handle = None
+        self._timers.advance()
+        self._timers_schedule()
+
+    async def _connected(self, reader, writer):
+        """
+        Handle a new connection
+        """
+        if len(self._sessions) >= self._max_sessions:
+            writer.write(b"Server full\r\n")
+            writer.close()
+            return
+        # Frames are sent in a single write, so send them straight away
+        tmp_socket = writer.get_extra_info('socket')
+        if not tmp_socket is None and tmp_socket.family in (socket.AF_INET, socket.AF_INET6):
+            tmp_socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+        session = GameSession(self, reader, writer)
+        self._sessions[session] = asyncio.current_task()
+        self._sessions_total += 1
+        # Spectators waiting for a game can watch this one
+        for spectator in self._spectators:
+            if spectator.is_waiting():
+                spectator.watch(session)
+        try:
+            await session.run()
+        except asyncio.CancelledError:
+            # Server closing
+            pass
+        finally:
+            self._sessions.pop(session, None)
+            broadcast = session._broadcast
+            self._bytes_sent += broadcast.count
+            self._frames += broadcast.frames
+            self._keyframes += broadcast.keyframes
+            self._frames_skipped += broadcast.frames_skipped
+
+    async def _spectator_connected(self, reader, writer):
+        """
+        Handle a new spectator connection
+        """
+        if len(self._spectators) >= self._max_spectators:
+            writer.write(b"Server full\r\n")
+            writer.close()
+            return
+        tmp_socket = writer.get_extra_info('socket')
+        if not tmp_socket is None and tmp_socket.family in (socket.AF_INET, socket.AF_INET6):
+            tmp_socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+        spectator = SpectatorSession(self, reader, writer)
+        self._spectators[spectator] = asyncio.current_task()
+        try:
+            await spectator.run()
+        except asyncio.CancelledError:
+            # Server closing
+            pass
+        finally:
+            spectator.close()
+            self._spectators.pop(spectator, None)
+
+# Main
+###############################################################################
+async def loopback_client(port, duration, seed):
+    """
+    Connect to the server and press random keys for a while, returning the number of bytes received
+    """
+    import random
+
+    rnd = random.Random(seed)
+    keys = (b"z", b"x", b"\x1b[D", b"\x1b[C", b"\x1b[B")
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    received = 0
+    async def read():
+        nonlocal received
+        while True:
+            data = await reader.read(65536)
+            if not data:
+                break
+            received += len(data)
+    read_task = asyncio.create_task(read())
+
+    loop = asyncio.get_running_loop()
+    end = loop.time() + duration
+    while loop.time() < end:
+        writer.write(rnd.choice(keys))
+        await asyncio.sleep(rnd.uniform(0.05, 0.2))
+    writer.write(b"Q")
+    await writer.drain()
+    await read_task
+    writer.close()
+    return received
+
+async def loopback_spectator(port, duration):
+    """
+    Watch the games for a while, returning the number of bytes received
+    """
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    received = 0
+    async def read():
+        nonlocal received
+        while True:
+            data = await reader.read(65536)
+            if not data:
+                break
+            received += len(data)
+    read_task = asyncio.create_task(read())
+    await asyncio.sleep(duration)
+    writer.write(b"Q")
+    await writer.drain()
+    await read_task
+    writer.close()
+    return received
+
+async def loopback_test(server, clients, duration, spectators=0):
+    """
+    Play games with loopback clients (and spectators watching them), reporting the data sent and CPU used
+    """
+    import time
+
+    start = time.perf_counter()
+    start_cpu = time.process_time()
+    tmp_tasks = [loopback_client(server.get_port(), duration, seed) for seed in range(0, clients)]
+    # Spectators join once the games have started, and leave before they end
+    if spectators > 0:
+        await asyncio.sleep(0.1)
+        tmp_tasks += [loopback_spectator(server.get_spectate_port(), duration - 0.5) for spectator_index in range(0, spectators)]
+    received = await asyncio.gather(*tmp_tasks)
+    elapsed = time.perf_counter() - start
+    cpu = time.process_time() - start_cpu
+    stats = server.get_stats()
+    print(f"Clients: {clients}	Spectators: {spectators}	Seconds: {elapsed:.1f}	Bytes/sec: {sum(received)/elapsed:.0f}	Frames/sec: {stats['frames']/elapsed:.0f}	Keyframes: {stats['keyframes']}	Skipped: {stats['frames_skipped']}	CPU: {cpu/elapsed*100:.0f}% (clients included)")
+
+async def main(args):
+    """ Run the server (and the loopback test if asked) """
+    port = args.port
+    if port is None:
+        # The loopback test can use any free port
+        port = 0 if args.loopback else 2323
+    spectate_port = args.spectate_port
+    if spectate_port is None and args.spectators > 0:
+        spectate_port = 0
+    server = GameServer(host=args.host, port=port, telnet=not args.raw, columns=args.columns, rows=args.rows, max_sessions=args.max_sessions, spectate_port=spectate_port)
+    await server.start()
+    print(f"Listening on {args.host}:{server.get_port()}")
+    if not server.get_spectate_port() is None:
+        print(f"Spectators on {args.host}:{server.get_spectate_port()}")
+    try:
+        if args.loopback:
+            await loopback_test(server, args.loopback, args.duration, args.spectators)
+        else:
+            await server._server.serve_forever()
+    finally:
+        await server.close()
+
+if __name__ == '__main__':
+    # Build option parser
+    parser = argparse.ArgumentParser(
+        description="Pytuino - Game server, a game for each telnet (or raw TCP) connection"
+    )
+    parser.add_argument(
+        "--host", help="Address to listen on (default: %(default)s).",
+        default="127.0.0.1"
+    )
+    parser.add_argument(
+        "-p", "--port", help="Port to listen on (default: 2323, or any free port for the loopback test).",
+        type=int
+    )
+    parser.add_argument(
+        "--raw", help="Raw TCP, no telnet negotiation (e.g. for serial to TCP bridges).",
+        action="store_true"
+    )
+    parser.add_argument(
+        "--columns", help="Screen width if the client doesn't report it (default: %(default)s).",
+        type=int, default=80
+    )
+    parser.add_argument(
+        "--rows", help="Screen height if the client doesn't report it (default: %(default)s).",
+        type=int, default=24
+    )
+    parser.add_argument(
+        "--max-sessions", help="Maximum number of games at once (default: %(default)s).",
+        type=int, default=1000
+    )
+    parser.add_argument(
+        "-s", "--spectate-port", help="Port spectators can connect to, to watch the games (default: none, 0 picks a free port).",
+        type=int
+    )
+    parser.add_argument(
+        "--loopback", help="Test the server with the given number of loopback clients pressing random keys, then exit.",
+        type=int, metavar="CLIENTS"
+    )
+    parser.add_argument(
+        "--duration", help="Length of the loopback test in seconds (default: %(default)s).",
+        type=float, default=10
+    )
+    parser.add_argument(
+        "--spectators", help="Number of spectators watching the loopback test (default: %(default)s).",
+        type=int, default=0
+    )
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(main(args))
+    except KeyboardInterrupt:
+        pass
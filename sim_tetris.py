@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+Pytuino headless simulation
+
+Runs the Tetris board without an interface or real time. The game is advanced
+one action at a time, with gravity being just another action, so games can be
+simulated as fast as the board allows (bot evaluation, regression testing).
+"""
+
+from board_bitboard import TetrisBitBoard
+from board_tetris import Tetromino
+from game_clock import ManualClock
+
+###############################################################################
+class TetrisSim:
+###############################################################################
+    """
+    Headless Tetris game, advanced by step(action)
+    """
+
+    ACTION_NONE = 0
+    ACTION_LEFT = 1
+    ACTION_RIGHT = 2
+    ACTION_ROTATE_CLOCKWISE = 3
+    ACTION_ROTATE_ANTICLOCKWISE = 4
+    ACTION_DOWN = 5
+    ACTION_TICK = 6
+    ACTION_DROP = 7
+
+    def __init__(self, columns=10, rows=20, board_class=TetrisBitBoard):
+        """
+        Initialise the simulation (call reset to start a game)
+
+            columns
+                Board width
+            rows
+                Board height
+            board_class
+                Board implementation to simulate (TetrisBitBoard, or TetrisBoard)
+        """
+        self._columns = columns
+        self._rows = rows
+        self._board_class = board_class
+
+        self._board = None
+        self._game_over = True
+        # Game statistics
+        self._lines = 0
+        self._pieces = 0
+
+    def _spawn(self):
+        """
+        Start the next tetromino if there is none in play
+        """
+        if self._board.get_current_tetromino() is None:
+            self._board.get_next_tetromino()
+            self._board.tetromino_start()
+            self._pieces += 1
+
+    def get_board(self):
+        """ Return the simulated board """
+        return self._board
+
+    def get_state(self):
+        """
+        Return a snapshot of the game state as a dictionary
+            board: Tuple of rows (bottom first), each a tuple of cells (0 for empty)
+            tetromino: Current tetromino as (type, rotation, column, row), or None
+            next: Type of the next tetromino
+            score, lines, pieces: Game statistics
+            game_over: Whether the game has finished
+        """
+        tetromino = self._board.get_current_tetromino()
+        if not tetromino is None:
+            tetromino = (tetromino.get_type(), tetromino.get_rotation(), tetromino.get_posX(), tetromino.get_posY())
+        return {
+            'board': tuple(tuple(row) for row in self._board._board[0:self._rows]),
+            'tetromino': tetromino,
+            'next': self._board.get_next_tetromino(remove=False).get_type(),
+            'score': self._board._score,
+            'lines': self._lines,
+            'pieces': self._pieces,
+            'game_over': self._game_over,
+        }
+
+    def get_snapshot(self):
+        """
+        Return the state of the game, which can be restored with set_snapshot (see TetrisBoard.get_snapshot)
+        Additionally includes the game statistics (lines, pieces, game_over)
+        """
+        snapshot = self._board.get_snapshot()
+        snapshot['lines'] = self._lines
+        snapshot['pieces'] = self._pieces
+        snapshot['game_over'] = self._game_over
+        return snapshot
+
+    def set_snapshot(self, snapshot):
+        """
+        Restore the state of the game from a snapshot
+        The game must be the same size, and for snapshots without the random state, reset with the same seed
+        """
+        self._board.set_snapshot(snapshot)
+        self._lines = snapshot['lines']
+        self._pieces = snapshot['pieces']
+        self._game_over = snapshot['game_over']
+
+    def is_game_over(self):
+        """ Return whether the game has finished """
+        return self._game_over
+
+    def reset(self, seed=None):
+        """
+        Start a new game, returning it's state
+
+            seed
+                Seed for the tetromino order (default: seeded from the system)
+        """
+        # Time never moves, gravity only happens with ACTION_TICK
+        self._board = self._board_class(columns=self._columns, rows=self._rows, clock=ManualClock(), seed=seed)
+        self._game_over = False
+        self._lines = 0
+        self._pieces = 0
+        self._spawn()
+        return self.get_state()
+
+    def step(self, action):
+        """
+        Apply an action to the game (as Pytuino.play does for a key press/timer expiry)
+        Returns a tuple of (state, lines cleared by this action, game over)
+        """
+        if self._game_over:
+            return self.get_state(), 0, True
+
+        # Flag: Copy the Tetromino to the board
+        affix_tetromino = False
+
+        if action == TetrisSim.ACTION_ROTATE_ANTICLOCKWISE:
+            self._board.tetromino_rotate(Tetromino.DIR_ANTICLOCKWISE)
+        elif action == TetrisSim.ACTION_ROTATE_CLOCKWISE:
+            self._board.tetromino_rotate(Tetromino.DIR_CLOCKWISE)
+        elif action == TetrisSim.ACTION_LEFT:
+            self._board.tetromino_move(Tetromino.DIR_LEFT)
+        elif action == TetrisSim.ACTION_RIGHT:
+            self._board.tetromino_move(Tetromino.DIR_RIGHT)
+        elif action == TetrisSim.ACTION_DOWN or action == TetrisSim.ACTION_TICK:
+            if not self._board.tetromino_move(Tetromino.DIR_DOWN):
+                affix_tetromino = True
+        elif action == TetrisSim.ACTION_DROP:
+            self._board.tetromino_drop()
+            affix_tetromino = True
+
+        # Affix Tetromino to the board
+        lines = 0
+        if affix_tetromino:
+            if not self._board.tetromino_attach():
+                # If it cant attach, it's game over
+                self._game_over = True
+                return self.get_state(), 0, True
+
+            # Remove full lines & update score
+            lines = self._board.remove_completed_rows()
+            self._board.update_score(lines)
+            self._lines += lines
+
+            # Start the next tetromino, so it's part of the returned state
+            self._spawn()
+
+        return self.get_state(), lines, self._game_over
+
+# Main
+###############################################################################
+if __name__ == '__main__':
+    import random
+    import time
+
+    # Play random games, and report the speed
+    sim = TetrisSim()
+    rnd = random.Random(0)
+    actions = [TetrisSim.ACTION_LEFT, TetrisSim.ACTION_RIGHT, TetrisSim.ACTION_ROTATE_CLOCKWISE, TetrisSim.ACTION_TICK, TetrisSim.ACTION_TICK]
+
+    num_games = 100
+    num_steps = 0
+    start = time.perf_counter()
+    for seed in range(0, num_games):
+        sim.reset(seed)
+        game_over = False
+        while not game_over:
+            state, lines, game_over = sim.step(rnd.choice(actions))
+            num_steps += 1
+    elapsed = time.perf_counter() - start
+    print(f"Games: {num_games}	Steps: {num_steps}	Games/sec: {num_games/elapsed:.1f}	Steps/sec: {num_steps/elapsed:.0f}")
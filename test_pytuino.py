@@ -0,0 +1,662 @@
+#!/usr/bin/env python3
+"""
+Pytuino tests
+
+Checks of the engines, and the parts built on them, that run headless (no
+terminal is needed). Run with 'python3 -m unittest test_pytuino' (or pytest).
+"""
+
+import asyncio
+import io
+import os
+import random
+import socket
+import tempfile
+import unittest
+
+from bot_tetris import TetrisBot
+from game_clock import ManualClock
+from sim_tetris import TetrisSim
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+###############################################################################
+@unittest.skipIf(np is None, "NumPy is not installed")
+class TestTetrisBatch(unittest.TestCase):
+###############################################################################
+    """
+    Batch engine (board_batch.py)
+    """
+
+    def test_matches_sim(self):
+        """ Games of the batch play the same as TetrisSim, given the same seeds and random actions """
+        from board_batch import TetrisBatch
+
+        actions = np.array([TetrisSim.ACTION_LEFT, TetrisSim.ACTION_RIGHT, TetrisSim.ACTION_ROTATE_CLOCKWISE, TetrisSim.ACTION_ROTATE_ANTICLOCKWISE,
+                            TetrisSim.ACTION_TICK, TetrisSim.ACTION_TICK, TetrisSim.ACTION_DROP])
+        num_games = 200
+        for columns in (4, 6, 10):
+            batch = TetrisBatch(num_games, columns=columns)
+            batch.reset(seeds=list(range(0, num_games)))
+            sims = [TetrisSim(columns=columns) for seed in range(0, num_games)]
+            for seed in range(0, num_games):
+                sims[seed].reset(seed)
+            rng = np.random.default_rng(0)
+            while not batch.get_game_over().all():
+                step_actions = rng.choice(actions, size=num_games)
+                batch_lines, batch_game_over = batch.step(step_actions)
+                types, rotations, positions_x, positions_y = batch.get_tetrominos()
+                for game in range(0, num_games):
+                    if sims[game].is_game_over():
+                        continue
+                    state, lines, game_over = sims[game].step(int(step_actions[game]))
+                    message = f"Columns: {columns}	Game: {game}"
+                    self.assertEqual(lines, batch_lines[game], message)
+                    self.assertEqual(game_over, batch_game_over[game], message)
+                    self.assertEqual(state['score'], batch.get_scores()[game], message)
+                    self.assertEqual(state['board'], tuple(tuple(int(cell) for cell in row) for row in batch.get_boards()[game]), message)
+                    if not game_over:
+                        self.assertEqual(state['tetromino'], (types[game], rotations[game], positions_x[game], positions_y[game]), message)
+                        self.assertEqual(state['next'], batch.get_next()[game], message)
+            if columns == 4:
+                # (Narrow boards fill rows quickly, so line clears are covered)
+                self.assertGreater(batch.get_lines().sum(), 0)
+
+    def test_queue_after_game_over(self):
+        """
+        Once a game is over, the queue is still trimmed to what the games being played need, while their order
+        carries on as TetrisBoard deals it (and the game that's over keeps it's next tetromino)
+        """
+        from board_batch import TetrisBatch
+        from board_tetris import TetrisBoard
+
+        batch = TetrisBatch(3)
+        batch.reset(seeds=[0, 1, 2])
+        next_over = batch.get_next()[0]
+        batch._game_over[0] = True
+        types = [batch.get_tetrominos()[0][1]]
+        widest = 0
+        for piece_index in range(0, 2000):
+            batch._spawn(np.array([1, 2]))
+            types.append(batch.get_tetrominos()[0][1])
+            widest = max(widest, batch._queue.shape[1])
+        self.assertLessEqual(widest, 2 * TetrisBatch.BAG_CHUNK * len(TetrisBatch.BAG_TYPES))
+        self.assertEqual(batch.get_next()[0], next_over)
+
+        board = TetrisBoard(clock=ManualClock(), seed=1)
+        expected = []
+        for piece_index in range(0, len(types)):
+            expected.append(board.get_next_tetromino().get_type())
+            board._tetromino = None
+        self.assertEqual(types, expected)
+
+###############################################################################
+class TestReplay(unittest.TestCase):
+###############################################################################
+    """
+    Replays (replay.py), and the snapshots they're built on
+    """
+
+    def setUp(self):
+        """ Create a directory for the replay files """
+        self._directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self._directory.cleanup)
+
+    def _record_bot_game(self, seed=1234, max_pieces=300):
+        """
+        Record a bot game, with a new action every 50ms
+        Returns the path of the replay, and the state after each action
+        """
+        from replay import ReplayRecorder
+
+        path = os.path.join(self._directory.name, "bot.pytr")
+        clock = ManualClock()
+        sim = TetrisSim()
+        sim.reset(seed)
+        recorder = ReplayRecorder(path, seed, keyframe_interval=5000, clock=clock)
+        bot = TetrisBot()
+        states = []
+        while not sim.is_game_over() and sim.get_state()['pieces'] < max_pieces:
+            for action in bot.choose(sim.get_board()) or [TetrisSim.ACTION_DROP]:
+                clock.advance(50)
+                recorder.record(action)
+                sim.step(action)
+                states.append(sim.get_state())
+        recorder.close()
+        return path, states
+
+    def test_seek(self):
+        """ Seeking (backwards, so from keyframes) gives the state the game was in at that time """
+        from replay import ReplayPlayer
+
+        path, states = self._record_bot_game()
+        player = ReplayPlayer(path)
+        self.assertGreater(len(player._keyframes), 1)
+        for tick in range(player.get_duration(), 49, -7919):
+            player.seek(tick)
+            self.assertEqual(player.get_sim().get_state(), states[(tick // 50) - 1], f"Time: {tick}ms")
+
+        # Playing on from a keyframe stays in step
+        player.seek(0)
+        while not player.is_finished():
+            player.step()
+        self.assertEqual(player.get_sim().get_state(), states[-1])
+
+    def test_play(self):
+        """ Playing through an interface leaves the last state of the game on screen """
+        from iface_ansi import PytuinoIface
+        from iface_shadow import PytuinoIfaceShadow
+        from replay import ReplayPlayer
+        from vt_screen import VirtualScreen
+
+        path, states = self._record_bot_game(max_pieces=20)
+        player = ReplayPlayer(path)
+        output = io.BytesIO()
+        self.assertTrue(player.play(PytuinoIfaceShadow(PytuinoIface(output=output, input=-1, columns=80, rows=24)), speed=0))
+        self.assertTrue(player.is_finished())
+
+        # Compare with the board drawn from scratch
+        screen = VirtualScreen(80, 24)
+        screen.feed(output.getvalue())
+        expected_output = io.BytesIO()
+        iface = PytuinoIface(output=expected_output, input=-1, columns=80, rows=24)
+        board = player.get_sim().get_board()
+        board.iface_check(iface)
+        board.draw_board(iface)
+        iface.redraw()
+        expected_screen = VirtualScreen(80, 24)
+        expected_screen.feed(expected_output.getvalue())
+        self.assertEqual(screen.get_text(), expected_screen.get_text())
+
+    def test_play_quit(self):
+        """ Pressing 'Q' stops playing part way through """
+        from iface_ansi import PytuinoIface
+        from replay import ReplayPlayer
+
+        path, states = self._record_bot_game(max_pieces=20)
+        player = ReplayPlayer(path)
+        iface = PytuinoIface(output=io.BytesIO(), input=-1, columns=80, rows=24)
+        iface.feed(b"Q")
+        self.assertFalse(player.play(iface, speed=1))
+        self.assertFalse(player.is_finished())
+
+    def test_debug_not_recorded(self):
+        """ Debug moves aren't game actions, so games can't be recorded in debug mode """
+        from pytuino import Pytuino
+
+        with self.assertRaises(Exception):
+            Pytuino(debug=True, iface=object(), record=os.path.join(self._directory.name, "debug.pytr"))
+
+    def _play_bot(self, sim, pieces):
+        """ Let the bot place the given number of tetrominos, returning the state after each action """
+        bot = TetrisBot()
+        states = []
+        end_pieces = sim.get_state()['pieces'] + pieces
+        while not sim.is_game_over() and sim.get_state()['pieces'] < end_pieces:
+            for action in bot.choose(sim.get_board()) or [TetrisSim.ACTION_DROP]:
+                states.append(sim.step(action)[0])
+        return states
+
+    def test_snapshot(self):
+        """ Restoring a snapshot deals the same tetrominos, with or without a seed """
+        for seed in (None, 1234):
+            sim = TetrisSim()
+            sim.reset(seed)
+            self._play_bot(sim, 10)
+            snapshot = sim.get_snapshot()
+            expected = self._play_bot(sim, 30)
+            self.assertFalse(sim.is_game_over())
+
+            restored_sim = TetrisSim()
+            restored_sim.reset(seed)
+            restored_sim.set_snapshot(snapshot)
+            self.assertEqual(self._play_bot(restored_sim, 30), expected, f"Seed: {seed}")
+
+        # Without the random state (as in a replay), it's rebuilt from the seed, so the board must have one
+        del snapshot['random']
+        restored_sim.reset(1234)
+        restored_sim.set_snapshot(snapshot)
+        self.assertEqual(self._play_bot(restored_sim, 30), expected)
+        restored_sim.reset(None)
+        with self.assertRaises(Exception):
+            restored_sim.set_snapshot(snapshot)
+
+###############################################################################
+class TestTimerWheel(unittest.TestCase):
+###############################################################################
+    """
+    Timer wheel (timer_wheel.py)
+    """
+
+    def test_fire(self):
+        """ Timers fire on time, with rescheduling, cancelling, and timers beyond the range of the wheel """
+        from timer_wheel import TimerWheel
+
+        clock = ManualClock()
+        wheel = TimerWheel(resolution=10, slot_bits=4, levels=3, clock=clock)
+        rnd = random.Random(0)
+        fired = []
+        previous_now = 0
+        expected = {}
+        timers = []
+        for timer_index in range(0, 5000):
+            deadline = rnd.randrange(0, 100000)
+            timers.append(wheel.schedule(deadline, lambda timer_index: fired.append((previous_now, clock.now(), timer_index)), timer_index))
+            expected[timer_index] = deadline
+        for timer_index in rnd.sample(range(0, 5000), 1000):
+            deadline = rnd.randrange(0, 100000)
+            wheel.reschedule(timers[timer_index], deadline)
+            expected[timer_index] = deadline
+        for timer_index in rnd.sample(range(0, 5000), 500):
+            wheel.cancel(timers[timer_index])
+            expected.pop(timer_index, None)
+
+        while clock.now() <= 100000:
+            previous_now = clock.now()
+            clock.advance(rnd.randrange(1, 50))
+            wheel.advance()
+        for previous_now, now, timer_index in fired:
+            # Fired by the first advance past the end of the tick the deadline is in (timers already due fire on the next tick)
+            due = max(-(-expected[timer_index] // 10), 1) * 10
+            self.assertTrue(due <= now and previous_now < due, f"Timer {timer_index} due at {expected[timer_index]} fired at {now}")
+        self.assertEqual(sorted(timer_index for previous_now, now, timer_index in fired), sorted(expected))
+        self.assertEqual(len(wheel), 0)
+
+    def test_next_deadline(self):
+        """ Advancing only at the next deadline fires every timer on time """
+        from timer_wheel import TimerWheel
+
+        clock = ManualClock()
+        wheel = TimerWheel(resolution=10, slot_bits=4, levels=3, clock=clock)
+        self.assertIsNone(wheel.next_deadline())
+        rnd = random.Random(0)
+        fired = []
+        deadlines = [rnd.randrange(0, 100000) for timer_index in range(0, 1000)]
+        for deadline in deadlines:
+            wheel.schedule(deadline, lambda deadline: fired.append((clock.now(), deadline)), deadline)
+        while len(wheel) > 0:
+            next_deadline = wheel.next_deadline()
+            self.assertGreater(next_deadline, clock.now())
+            clock.set(next_deadline)
+            wheel.advance()
+        for now, deadline in fired:
+            self.assertTrue(deadline <= now < max(-(-deadline // 10), 1) * 10 + 10, f"Timer due at {deadline} fired at {now}")
+        self.assertEqual(sorted(deadline for now, deadline in fired), sorted(deadlines))
+        self.assertIsNone(wheel.next_deadline())
+
+###############################################################################
+class TestVirtualScreen(unittest.TestCase):
+###############################################################################
+    """
+    Virtual terminal (vt_screen.py)
+    """
+
+    def test_bot_games(self):
+        """
+        Bot games (so lines are cleared, scrolling the board) played through the ANSI interface parse to the screen
+        the interface thinks it has drawn, after every frame
+        """
+        from iface_ansi import PytuinoIface
+        from vt_screen import VirtualScreen
+
+        bot = TetrisBot(lookahead=False)
+        for columns, rows, has_scroll_region in ((80, 24, True), (80, 24, False), (30, 50, True)):
+            output = io.BytesIO()
+            iface = PytuinoIface(output=output, input=-1, columns=columns, rows=rows, has_scroll_region=has_scroll_region)
+            screen = VirtualScreen(columns, rows)
+            sim = TetrisSim()
+            sim.reset(0)
+            sim.get_board().iface_check(iface)
+            actions = []
+            frames = 0
+            lines = 0
+            game_over = False
+            while not game_over and frames < 1000:
+                if not actions:
+                    actions = bot.choose(sim.get_board()) or [TetrisSim.ACTION_DROP]
+                state, tmp_lines, game_over = sim.step(actions.pop(0))
+                lines += tmp_lines
+                sim.get_board().draw_board(iface)
+                iface.redraw()
+                screen.feed(output.getvalue())
+                output.seek(0)
+                output.truncate()
+                frames += 1
+                self.assertEqual(screen.get_text(), [u"".join(row) for row in iface._screen_txt],
+                                 f"Screen: {columns}x{rows}	Scroll region: {has_scroll_region}	Frames: {frames}")
+            self.assertGreater(lines, 0)
+
+###############################################################################
+class TestTournament(unittest.TestCase):
+###############################################################################
+    """
+    Bot tournament (tournament.py)
+    """
+
+    def test_max_pieces(self):
+        """ A game stops once max_pieces tetrominos have been placed (a good bot would play forever) """
+        from tournament import parse_config, play_game
+
+        name, weights, lookahead = config = parse_config("default")
+        for max_pieces in (1, 5, 37):
+            result = play_game(config, 7, max_pieces=max_pieces)
+            self.assertGreater(result['steps'], 0)
+            self.assertEqual(result['pieces'], max_pieces)
+            self.assertFalse(result['game_over'])
+
+            # Play the same steps, and count the tetrominos on the board (4 cells each, less the cleared rows)
+            sim = TetrisSim()
+            sim.reset(7)
+            bot = TetrisBot(lookahead=lookahead, weights=weights)
+            steps = 0
+            while steps < result['steps']:
+                for action in bot.choose(sim.get_board()) or [TetrisSim.ACTION_DROP]:
+                    state = sim.step(action)[0]
+                    steps += 1
+            cells = sum(1 for row in state['board'] for cell in row if cell)
+            self.assertEqual(steps, result['steps'])
+            self.assertEqual((cells + (state['lines'] * len(state['board'][0]))) // 4, max_pieces)
+
+###############################################################################
+class TestAnsiIface(unittest.TestCase):
+###############################################################################
+    """
+    ANSI interface (iface_ansi.py)
+    """
+
+    def test_line_feed(self):
+        """ Line feeds only move the cursor down on a terminal with output processing off (not a socket or pipe) """
+        from iface_ansi import PytuinoIface
+
+        output = io.BytesIO()
+        iface = PytuinoIface(output=output, input=-1, columns=80, rows=24)
+        sim = TetrisSim()
+        sim.reset(0)
+        sim.get_board().iface_check(iface)
+        for action in [TetrisSim.ACTION_TICK] * 20 + [TetrisSim.ACTION_DROP] * 5:
+            sim.step(action)
+            sim.get_board().draw_board(iface)
+            iface.redraw()
+        self.assertNotIn(b"\n", output.getvalue())
+
+        try:
+            import termios
+        except ImportError:
+            return
+        master_fd, slave_fd = os.openpty()
+        self.addCleanup(os.close, master_fd)
+        with os.fdopen(slave_fd, "wb", buffering=0) as output:
+            iface = PytuinoIface(output=output, input=-1, columns=80, rows=24)
+            try:
+                self.assertFalse(termios.tcgetattr(slave_fd)[1] & termios.OPOST)
+                iface._move_cursor(5, 3)
+                self.assertEqual(iface._plan_move(5, 4), "\n")
+            finally:
+                iface._buffer = []
+                iface.close()
+
+    def test_link_pacing(self):
+        """
+        Through the shadow buffer, frames are held back while the link is busy sending the last one, replaced by any
+        later frame (counted as dropped), and sent once it's free
+        """
+        from iface_ansi import PytuinoIface
+        from iface_shadow import PytuinoIfaceShadow
+        from vt_screen import VirtualScreen
+
+        clock = ManualClock()
+        output = io.BytesIO()
+        iface = PytuinoIfaceShadow(PytuinoIface(output=output, input=-1, columns=80, rows=24, baud=2400, clock=clock))
+        # (Setting up the terminal is sent first)
+        clock.advance(int(iface.link_wait() * 1000) + 1)
+        setup = len(output.getvalue())
+        sim = TetrisSim()
+        sim.reset(0)
+        board = sim.get_board()
+        board.iface_check(iface)
+        board.draw_board(iface)
+        iface.redraw()
+        self.assertEqual(iface.get_frame_stats(), {'sent': 1, 'dropped': 0})
+        self.assertFalse(iface.is_frame_pending())
+
+        # The first frame takes the 2400 baud (240 bytes/sec) link a while to send
+        sent = len(output.getvalue())
+        self.assertAlmostEqual(iface.link_wait(), (sent - setup) / 240, places=2)
+        for action in (TetrisSim.ACTION_LEFT, TetrisSim.ACTION_LEFT, TetrisSim.ACTION_TICK):
+            sim.step(action)
+            board.draw_board(iface)
+            iface.redraw()
+            self.assertTrue(iface.is_frame_pending())
+        self.assertEqual(len(output.getvalue()), sent)
+        self.assertEqual(iface.get_frame_stats(), {'sent': 1, 'dropped': 2})
+
+        # Part way through, the link is still busy
+        clock.advance(int(iface.link_wait() * 500))
+        iface.redraw()
+        self.assertTrue(iface.is_frame_pending())
+        self.assertEqual(len(output.getvalue()), sent)
+
+        # Once sent, the latest frame goes
+        clock.advance(int(iface.link_wait() * 1000) + 1)
+        self.assertEqual(iface.link_wait(), 0)
+        iface.redraw()
+        self.assertFalse(iface.is_frame_pending())
+        self.assertGreater(len(output.getvalue()), sent)
+        self.assertEqual(iface.get_frame_stats(), {'sent': 2, 'dropped': 2})
+        self.assertEqual(iface.get_link_stats()['rate'], 240)
+
+        # The screen shows the latest state
+        screen = VirtualScreen(80, 24)
+        screen.feed(output.getvalue())
+        expected_output = io.BytesIO()
+        expected_iface = PytuinoIface(output=expected_output, input=-1, columns=80, rows=24)
+        board.iface_check(expected_iface)
+        board.draw_board(expected_iface)
+        expected_iface.redraw()
+        expected_screen = VirtualScreen(80, 24)
+        expected_screen.feed(expected_output.getvalue())
+        self.assertEqual(screen.get_text(), expected_screen.get_text())
+
+###############################################################################
+class TestGameServer(unittest.IsolatedAsyncioTestCase):
+###############################################################################
+    """
+    Game server (server.py), played and watched over loopback connections
+    """
+
+    async def _start(self, **kwargs):
+        """ Start a server on a free port, closed at the end of the test """
+        from server import GameServer
+
+        server = GameServer(port=0, **kwargs)
+        await server.start()
+        self.addAsyncCleanup(server.close)
+        return server
+
+    async def _connect(self, port, screen, telnet=False, receive_buffer=None):
+        """
+        Connect to the server, feeding what's received to a VirtualScreen (after the telnet negotiation, if telnet)
+        Returns the connection's writer, and an Event which pauses reading while set
+
+            receive_buffer
+                Size of the socket's receive buffer, and the stream's limit (default: the system's)
+        """
+        from server import TelnetParser
+
+        tmp_socket = socket.socket()
+        if not receive_buffer is None:
+            tmp_socket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, receive_buffer)
+        tmp_socket.setblocking(False)
+        await asyncio.get_running_loop().sock_connect(tmp_socket, ("127.0.0.1", port))
+        if receive_buffer is None:
+            reader, writer = await asyncio.open_connection(sock=tmp_socket)
+        else:
+            # (The stream stops reading the socket once it holds twice it's limit)
+            reader, writer = await asyncio.open_connection(sock=tmp_socket, limit=receive_buffer)
+        paused = asyncio.Event()
+
+        async def read():
+            negotiation = b""
+            while True:
+                if paused.is_set():
+                    await asyncio.sleep(0.01)
+                    continue
+                data = await reader.read(65536)
+                if not data:
+                    break
+                if telnet and len(negotiation) < len(TelnetParser.NEGOTIATION):
+                    length = len(TelnetParser.NEGOTIATION) - len(negotiation)
+                    negotiation += data[:length]
+                    data = data[length:]
+                    self.assertTrue(TelnetParser.NEGOTIATION.startswith(negotiation))
+                screen.feed(data)
+        task = asyncio.create_task(read())
+
+        async def close():
+            # (Anything that failed while reading is raised here)
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+            writer.close()
+        self.addAsyncCleanup(close)
+        return writer, paused
+
+    async def _wait_for(self, condition, message, timeout=5):
+        """ Wait for a condition (a function returning True once met), failing the test if it takes too long """
+        loop = asyncio.get_running_loop()
+        end = loop.time() + timeout
+        while not condition():
+            if loop.time() > end:
+                self.fail(message)
+            await asyncio.sleep(0.01)
+
+    def _model(self, session):
+        """ Return the text a session's interface has drawn on the player's screen """
+        return [u"".join(row) for row in session._terminal_iface._screen_txt]
+
+    async def test_session(self):
+        """
+        A connection gets a game, sized by telnet (NAWS), moved by keys and gravity, and cleaned up on disconnect
+        """
+        from vt_screen import VirtualScreen
+
+        server = await self._start(telnet=True)
+        screen = VirtualScreen(100, 40)
+        writer, paused = await self._connect(server.get_port(), screen, telnet=True)
+        await self._wait_for(lambda: len(server._sessions) == 1, "No session started")
+        session = next(iter(server._sessions))
+
+        # Window size reported, so the game is laid out for it
+        writer.write(bytes((255, 250, 31, 0, 100, 0, 40, 255, 240)))
+        await self._wait_for(lambda: session._terminal_iface.get_size() == (100, 40), "Window size not taken")
+        await self._wait_for(lambda: screen.get_text() == self._model(session), "Screen differs after resizing")
+        self.assertNotEqual(screen.get_text(), [" " * 100] * 40)
+
+        # Keys move the tetromino
+        board = session._sim.get_board()
+        column = board.get_current_tetromino().get_posX()
+        before = screen.get_text()
+        writer.write(b"\x1b[D")
+        await self._wait_for(lambda: board.get_current_tetromino().get_posX() == column - 1, "Left key not handled")
+        await self._wait_for(lambda: screen.get_text() == self._model(session) and screen.get_text() != before, "Screen not updated by a key")
+        writer.write(b" ")
+        await self._wait_for(lambda: session._sim.get_state()['pieces'] == 2, "Drop key not handled")
+
+        # Gravity moves the tetromino down on it's own (quickened for the test)
+        board._tetroino_move_interval = 50
+        session._schedule_gravity()
+        row = board.get_current_tetromino().get_posY()
+        await self._wait_for(lambda: board.get_current_tetromino().get_posY() < row, "Gravity didn't move the tetromino")
+        await self._wait_for(lambda: screen.get_text() == self._model(session), "Screen differs after gravity")
+
+        # Disconnecting ends the session, and it's timers
+        writer.close()
+        await self._wait_for(lambda: len(server._sessions) == 0, "Session not ended on disconnect")
+        self.assertTrue(session._closed)
+        self.assertEqual(len(server._timers), 0)
+        self.assertEqual(server.get_stats()['sessions_total'], 1)
+
+    def _cells(self, screen):
+        """ Return every cell of a VirtualScreen (character and attributes) """
+        return [[screen.get_cell(column, row) for column in range(0, 80)] for row in range(0, 24)]
+
+    async def test_spectator_join(self):
+        """ A spectator joining part way through a game is sent a keyframe, after which it sees what the player sees """
+        from vt_screen import VirtualScreen
+
+        server = await self._start(telnet=False, spectate_port=0)
+        player_screen = VirtualScreen(80, 24)
+        player, paused = await self._connect(server.get_port(), player_screen)
+        await self._wait_for(lambda: len(server._sessions) == 1, "No session started")
+        session = next(iter(server._sessions))
+        for key in (b"z", b"\x1b[D", b" ", b"x", b"\x1b[C", b"\x1b[C", b" "):
+            player.write(key)
+            await asyncio.sleep(0.01)
+        await self._wait_for(lambda: session._sim.get_state()['pieces'] == 3, "Keys not handled")
+        await self._wait_for(lambda: player_screen.get_text() == self._model(session), "Player's screen differs")
+
+        spectator_screen = VirtualScreen(80, 24)
+        spectator, spectator_paused = await self._connect(server.get_spectate_port(), spectator_screen)
+        await self._wait_for(lambda: self._cells(spectator_screen) == self._cells(player_screen), "Spectator's screen differs after joining")
+        self.assertEqual(session._broadcast.keyframes, 1)
+
+        # Then follows the game
+        for key in (b"\x1b[D", b"\x1b[D", b" ", b"z"):
+            player.write(key)
+            await asyncio.sleep(0.01)
+        await self._wait_for(lambda: session._sim.get_state()['pieces'] == 4, "Keys not handled")
+        await self._wait_for(lambda: player_screen.get_text() == self._model(session), "Player's screen differs")
+        await self._wait_for(lambda: self._cells(spectator_screen) == self._cells(player_screen), "Spectator's screen differs")
+        self.assertEqual(spectator_screen.get_cursor(), player_screen.get_cursor())
+
+    async def test_spectator_stalled(self):
+        """
+        A spectator that stops reading is skipped (what's held for it stays within the limit, plus a frame), and is
+        sent a keyframe of the latest state once it reads again
+        """
+        from server import FrameBroadcast
+        from vt_screen import VirtualScreen
+
+        write_buffer_limit = 4096
+        server = await self._start(telnet=False, spectate_port=0, write_buffer_limit=write_buffer_limit)
+        player_screen = VirtualScreen(80, 24)
+        player, paused = await self._connect(server.get_port(), player_screen)
+        await self._wait_for(lambda: len(server._sessions) == 1, "No session started")
+        session = next(iter(server._sessions))
+        spectator_screen = VirtualScreen(80, 24)
+        spectator, spectator_paused = await self._connect(server.get_spectate_port(), spectator_screen, receive_buffer=1024)
+        await self._wait_for(lambda: len(server._spectators) == 1, "No spectator started")
+        await self._wait_for(lambda: self._cells(spectator_screen) == self._cells(player_screen), "Spectator's screen differs after joining")
+        # (Small socket buffers, so the connection backs up quickly)
+        spectator_writer = next(iter(server._spectators))._writer
+        spectator_writer.get_extra_info('socket').setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 1024)
+
+        # Full redraws (Ctrl-L) make large frames
+        spectator_paused.set()
+        largest_buffer = 0
+        behind = False
+        for key_index in range(0, 200):
+            player.write(b"\x0c" if key_index % 2 else b"z")
+            await asyncio.sleep(0.002)
+            largest_buffer = max(largest_buffer, spectator_writer.transport.get_write_buffer_size())
+            behind |= session._broadcast._watchers.get(spectator_writer) == FrameBroadcast.WATCHER_BEHIND
+        self.assertTrue(behind)
+        self.assertGreater(session._broadcast.frames_skipped, 0)
+        self.assertLessEqual(largest_buffer, write_buffer_limit + len(session._iface.get_keyframe()))
+
+        # Caught up with a keyframe
+        keyframes = session._broadcast.keyframes
+        spectator_paused.clear()
+        await self._wait_for(lambda: player_screen.get_text() == self._model(session), "Player's screen differs")
+        await self._wait_for(lambda: self._cells(spectator_screen) == self._cells(player_screen), "Spectator's screen differs after catching up")
+        self.assertGreater(session._broadcast.keyframes, keyframes)
+
+# Main
+###############################################################################
+if __name__ == '__main__':
+    unittest.main()
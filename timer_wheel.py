@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+Pytuino timer wheel
+
+Holds the deadlines of many games (gravity, and any other timed events) in a
+hierarchical timer wheel, so advancing time only touches the timers that are
+due, rather than checking every game on every tick.
+
+Time is divided in to ticks (resolution milliseconds). The first level of the
+wheel has a slot for each of the next 'slots' ticks, each level above has
+slots covering 'slots' times as many ticks as the one below. A timer is put
+in the lowest level it fits in, and when the wheel comes round to a slot of
+an upper level its timers are moved down (cascaded) to where they now fit.
+Scheduling, rescheduling and cancelling are constant time.
+"""
+
+from game_clock import MonotonicClock
+
+###############################################################################
+class Timer:
+###############################################################################
+    """
+    A timer held in a TimerWheel
+    """
+
+    __slots__ = ('_wheel', '_deadline', '_callback', '_args', '_slot')
+
+    def __init__(self, wheel, deadline, callback, args):
+        """ Initialise the timer (use TimerWheel.schedule) """
+        self._wheel = wheel
+        self._deadline = deadline
+        self._callback = callback
+        self._args = args
+        # Slot of the wheel holding the timer (None once fired, or cancelled)
+        self._slot = None
+
+    def cancel(self):
+        """ Stop the timer from firing """
+        if not self._slot is None:
+            del self._slot[self]
+            self._slot = None
+            self._wheel._count -= 1
+
+    def get_deadline(self):
+        """ Return the time the timer fires (in milliseconds) """
+        return self._deadline
+
+    def is_active(self):
+        """ Return whether the timer is still to fire """
+        return not self._slot is None
+
+###############################################################################
+class TimerWheel:
+###############################################################################
+    """
+    Hierarchical timer wheel
+    """
+
+    def __init__(self, resolution=10, slot_bits=8, levels=4, clock=None):
+        """
+        Initialise the timer wheel
+
+            resolution
+                Length of a tick (in milliseconds)
+            slot_bits
+                Number of slots of each level (as a power of 2)
+            levels
+                Number of levels (timers further ahead than all the levels cover are held in the top level until nearer)
+            clock
+                Clock timers are scheduled against (default: MonotonicClock)
+        """
+        if clock is None:
+            clock = MonotonicClock()
+        self._clock = clock
+        self._resolution = resolution
+        self._slot_bits = slot_bits
+        self._slot_mask = (1 << slot_bits) - 1
+        self._levels = levels
+
+        # Slots of each level, as dictionaries of timers (insertion ordered, with constant time removal)
+        self._wheel = [[{} for slot_index in range(0, 1 << slot_bits)] for level in range(0, levels)]
+        # Current tick, all timers due by the end of it have fired
+        self._tick = clock.now() // resolution
+        # Number of timers
+        self._count = 0
+
+    def __len__(self):
+        """ Return the number of timers """
+        return self._count
+
+    def _insert(self, timer, earliest_tick):
+        """
+        Put a timer in the slot for it's deadline (or the slot of earliest_tick if that's later)
+        """
+        # Timers never fire early, so they go in the tick their deadline rounds up to
+        tick = max(-(-timer._deadline // self._resolution), earliest_tick)
+        delta = tick - self._tick
+        level = 0
+        while level < self._levels - 1 and delta >> (self._slot_bits * (level + 1)):
+            level += 1
+        if delta >> (self._slot_bits * (level + 1)):
+            # Beyond the top level, park it in the furthest slot (it's re-inserted from there)
+            tick = self._tick + (self._slot_mask << (self._slot_bits * level))
+        slot = self._wheel[level][(tick >> (self._slot_bits * level)) & self._slot_mask]
+        slot[timer] = None
+        timer._slot = slot
+
+    def schedule(self, deadline, callback, *args):
+        """
+        Call callback(*args) at the given time, returning the Timer
+
+            deadline
+                Time to fire (in milliseconds, of the wheel's clock)
+        """
+        timer = Timer(self, deadline, callback, args)
+        # Timers already due fire on the next tick
+        self._insert(timer, self._tick + 1)
+        self._count += 1
+        return timer
+
+    def schedule_in(self, delay, callback, *args):
+        """
+        Call callback(*args) after the given delay (in milliseconds), returning the Timer
+        """
+        return self.schedule(self._clock.now() + delay, callback, *args)
+
+    def reschedule(self, timer, deadline):
+        """
+        Move a timer to a new deadline (restarting it if it has fired, or been cancelled)
+        """
+        if timer._slot is None:
+            self._count += 1
+        else:
+            del timer._slot[timer]
+        timer._deadline = deadline
+        self._insert(timer, self._tick + 1)
+
+    def cancel(self, timer):
+        """
+        Stop a timer from firing
+        """
+        timer.cancel()
+
+    def _cascade(self, level):
+        """
+        Move the timers of the current slot of a level down to the levels below
+        """
+        slot = self._wheel[level][(self._tick >> (self._slot_bits * level)) & self._slot_mask]
+        if len(slot) == 0:
+            return
+        timers = list(slot)
+        slot.clear()
+        # The current tick is yet to fire
+        for timer in timers:
+            self._insert(timer, self._tick)
+
+    def advance(self, now=None):
+        """
+        Fire every timer due by the given time (default: the clock's current time)
+        Returns the number of timers fired
+        """
+        if now is None:
+            now = self._clock.now()
+        target = now // self._resolution
+        fired = 0
+        while self._tick < target:
+            if self._count == 0:
+                # Nothing to fire, so jump straight there
+                self._tick = target
+                break
+            self._tick += 1
+
+            # At the start of a rotation of a level, the timers of the next slot up are due within it
+            level = 1
+            while level < self._levels and (self._tick & ((1 << (self._slot_bits * level)) - 1)) == 0:
+                level += 1
+            for cascade_level in range(level - 1, 0, -1):
+                self._cascade(cascade_level)
+
+            slot = self._wheel[0][self._tick & self._slot_mask]
+            while len(slot) > 0:
+                timer = next(iter(slot))
+                del slot[timer]
+                timer._slot = None
+                self._count -= 1
+                fired += 1
+                # The callback can schedule, reschedule and cancel timers (anything due now fires on the next tick)
+                timer._callback(*timer._args)
+        return fired
+
+    def next_deadline(self):
+        """
+        Return the time (in milliseconds) advance next needs calling to fire a timer, or None if there are no timers
+        This can be earlier than any timer is due, when the wheel comes round to a slot of an upper level to move it's timers down
+        """
+        if self._count == 0:
+            return None
+        # The next slot of the first level with timers, up to the start of it's next rotation (where the level above cascades)
+        rotation_tick = ((self._tick >> self._slot_bits) + 1) << self._slot_bits
+        for tick in range(self._tick + 1, rotation_tick):
+            if len(self._wheel[0][tick & self._slot_mask]) > 0:
+                return tick * self._resolution
+        return rotation_tick * self._resolution
+
+    def now(self):
+        """ Return the current time of the wheel's clock (in milliseconds) """
+        return self._clock.now()
+
+    def get_resolution(self):
+        """ Return the length of a tick (in milliseconds) """
+        return self._resolution
+
+# Main
+###############################################################################
+if __name__ == '__main__':
+    from game_clock import ManualClock
+
+    # Schedule a few timers, and advance straight to each deadline in turn
+    clock = ManualClock()
+    wheel = TimerWheel(clock=clock)
+    for delay in (5, 250, 1000, 60000):
+        wheel.schedule_in(delay, lambda delay: print(f"Timer: {delay}ms	Fired: {clock.now()}ms"), delay)
+    while len(wheel) > 0:
+        clock.set(wheel.next_deadline())
+        wheel.advance()
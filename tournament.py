@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+Pytuino bot tournament
+
+Plays headless games for every combination of bot configuration and seed,
+spread across a pool of processes. The result of each game is written to the
+report (CSV, or JSON lines) as soon as it finishes, so an interrupted
+tournament can be resumed by running it again with the same report, only the
+games missing from the report are played.
+"""
+
+import argparse
+import concurrent.futures
+import csv
+import json
+import os
+import time
+
+from bot_tetris import TetrisBot
+from sim_tetris import TetrisSim
+
+# Report fields (in order), pieces are the tetrominos placed
+REPORT_FIELDS = ('config', 'seed', 'lines', 'score', 'pieces', 'steps', 'game_over', 'seconds')
+
+# Bots of this process, by configuration (so the placement caches are kept between games)
+_bots = {}
+
+def pieces_placed(state):
+    """
+    Return the number of tetrominos placed in a game, from it's state (TetrisSim.get_state)
+    The state counts the tetrominos started, including the one in play (or the one that couldn't be placed at game over)
+    """
+    return state['pieces'] - (0 if state['tetromino'] is None else 1)
+
+def play_game(config, seed, max_pieces=1000, columns=10, rows=20):
+    """
+    Play a single game with the given bot configuration, returning the result as a dictionary (see REPORT_FIELDS)
+
+        config
+            Bot configuration as (name, weights, lookahead)
+        seed
+            Seed for the tetromino order
+        max_pieces
+            Stop the game once this many tetrominos have been placed (a good bot can play forever)
+    """
+    name, weights, lookahead = config
+    bot = _bots.get(config)
+    if bot is None:
+        bot = TetrisBot(lookahead=lookahead, weights=weights)
+        _bots[config] = bot
+
+    start = time.perf_counter()
+    sim = TetrisSim(columns=columns, rows=rows)
+    state = sim.reset(seed)
+    game_over = False
+    steps = 0
+    while not game_over and pieces_placed(state) < max_pieces:
+        actions = bot.choose(sim.get_board())
+        if actions is None:
+            # Nowhere to go, so just let it drop
+            actions = [TetrisSim.ACTION_DROP]
+        for action in actions:
+            state, lines, game_over = sim.step(action)
+            steps += 1
+
+    return {
+        'config': name,
+        'seed': seed,
+        'lines': state['lines'],
+        'score': state['score'],
+        'pieces': pieces_placed(state),
+        'steps': steps,
+        'game_over': game_over,
+        'seconds': round(time.perf_counter() - start, 3),
+    }
+
+def parse_config(txt):
+    """
+    Parse a bot configuration given as NAME[:WEIGHTS[:greedy]]
+        WEIGHTS: Comma separated heuristic weights (aggregate height, lines, holes, bumpiness)
+        greedy: Don't look ahead to the next tetromino
+    """
+    fields = txt.split(':')
+    if len(fields) > 3 or len(fields[0]) == 0:
+        raise argparse.ArgumentTypeError(f"Bad bot configuration: {txt}")
+    weights = TetrisBot.WEIGHTS
+    if len(fields) > 1 and len(fields[1]) > 0:
+        try:
+            weights = tuple(float(weight) for weight in fields[1].split(','))
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"Bad bot weights: {fields[1]}")
+        if len(weights) != len(TetrisBot.WEIGHTS):
+            raise argparse.ArgumentTypeError(f"Need {len(TetrisBot.WEIGHTS)} bot weights: {fields[1]}")
+    lookahead = True
+    if len(fields) > 2:
+        if fields[2] != 'greedy':
+            raise argparse.ArgumentTypeError(f"Bad bot option: {fields[2]}")
+        lookahead = False
+    return (fields[0], weights, lookahead)
+
+def read_report(path):
+    """
+    Read the results already in a report, returning them as a list of dictionaries
+    A partly written last result (from being interrupted) is ignored, so the game is played again
+    """
+    results = []
+    if not os.path.exists(path):
+        return results
+    with open(path, newline='') as report:
+        if path.endswith('.json'):
+            for line in report:
+                try:
+                    results.append(json.loads(line))
+                except ValueError:
+                    continue
+        else:
+            for row in csv.DictReader(report):
+                if not row.get('seconds'):
+                    continue
+                results.append(row)
+    return results
+
+def write_summary(results):
+    """
+    Print the average result of each bot configuration, and the games per second of a single worker
+    """
+    configs = {}
+    for result in results:
+        configs.setdefault(result['config'], []).append(result)
+    for name, config_results in configs.items():
+        num_games = len(config_results)
+        lines = sum(int(result['lines']) for result in config_results) / num_games
+        score = sum(int(result['score']) for result in config_results) / num_games
+        pieces = sum(int(result['pieces']) for result in config_results) / num_games
+        seconds = sum(float(result['seconds']) for result in config_results)
+        games_per_sec = num_games / seconds if seconds > 0 else 0
+        print(f"Config: {name}	Games: {num_games}	Lines: {lines:.1f}	Score: {score:.1f}	Pieces: {pieces:.1f}	Games/sec: {games_per_sec:.2f}")
+
+# Main
+###############################################################################
+if __name__ == '__main__':
+    # Build option parser
+    parser = argparse.ArgumentParser(
+        description="Pytuino - Play bot configurations against each other over a range of seeds"
+    )
+    parser.add_argument(
+        "-c", "--config", help="Bot configuration as NAME[:WEIGHTS[:greedy]] (repeatable, default: default, and greedy).",
+        type=parse_config, action="append", metavar="CONFIG"
+    )
+    parser.add_argument(
+        "-n", "--seeds", help="Number of seeds (games) per configuration (default: %(default)s).",
+        type=int, default=10
+    )
+    parser.add_argument(
+        "--seed-start", help="First seed (default: %(default)s).",
+        type=int, default=0
+    )
+    parser.add_argument(
+        "-p", "--max-pieces", help="Stop each game once this many tetrominos have been placed (default: %(default)s).",
+        type=int, default=1000
+    )
+    parser.add_argument(
+        "-w", "--workers", help="Number of worker processes (default: number of CPUs).",
+        type=int, default=None
+    )
+    parser.add_argument(
+        "-o", "--output", help="Report file, CSV, or JSON lines if it ends in .json (default: %(default)s).",
+        default="tournament.csv"
+    )
+    args = parser.parse_args()
+
+    configs = args.config
+    if configs is None:
+        configs = [parse_config("default"), parse_config("greedy::greedy")]
+
+    # Skip the games already in the report
+    results = read_report(args.output)
+    played = set((result['config'], int(result['seed'])) for result in results)
+    games = [(config, seed) for config in configs for seed in range(args.seed_start, args.seed_start + args.seeds) if not (config[0], seed) in played]
+    print(f"Games: {len(games)}	Already played: {len(played)}")
+
+    start = time.perf_counter()
+    num_played = 0
+    json_report = args.output.endswith('.json')
+    write_header = not os.path.exists(args.output) or os.path.getsize(args.output) == 0
+    # Start on a new line, after any partly written result
+    partial_line = False
+    if not write_header:
+        with open(args.output, 'rb') as report:
+            report.seek(-1, os.SEEK_END)
+            partial_line = report.read(1) != b"\n"
+    with open(args.output, 'a', newline='') as report:
+        if partial_line:
+            report.write("\n")
+        writer = None
+        if not json_report:
+            writer = csv.DictWriter(report, fieldnames=REPORT_FIELDS)
+            if write_header:
+                writer.writeheader()
+
+        executor = concurrent.futures.ProcessPoolExecutor(max_workers=args.workers)
+        try:
+            futures = [executor.submit(play_game, config, seed, args.max_pieces) for config, seed in games]
+            # Write each result as it finishes, so nothing is lost if interrupted
+            for future in concurrent.futures.as_completed(futures):
+                result = future.result()
+                if json_report:
+                    report.write(json.dumps(result) + "\n")
+                else:
+                    writer.writerow(result)
+                report.flush()
+                results.append(result)
+                num_played += 1
+                print(f"Config: {result['config']}	Seed: {result['seed']}	Lines: {result['lines']}	Score: {result['score']}	Pieces: {result['pieces']}	Seconds: {result['seconds']}")
+        except KeyboardInterrupt:
+            print("Interrupted, run again to play the remaining games")
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    elapsed = time.perf_counter() - start
+    write_summary(results)
+    if elapsed > 0:
+        print(f"Played: {num_played}	Seconds: {elapsed:.1f}	Games/sec: {num_played/elapsed:.2f}")
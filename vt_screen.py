@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+Pytuino virtual terminal
+
+Parses the output sent to a terminal (text, control characters and the
+ANSI/VT100 escape sequences the ANSI interface uses) in to a grid of cells, as
+the terminal would display it. Used to check what a client of the server
+actually sees, without a real terminal.
+"""
+
+import codecs
+
+###############################################################################
+class VirtualScreen:
+###############################################################################
+    """
+    Screen of a VT100 style terminal (autowrap on, line feed only moves down)
+    """
+
+    # Attribute state after a reset (bold, reverse, foreground, background), colours as SGR parameters
+    SGR_RESET = (False, False, None, None)
+
+    STATE_GROUND = 0
+    STATE_ESC = 1
+    STATE_CSI = 2
+
+    def __init__(self, columns=80, rows=24):
+        """
+        Initialise a blank screen
+
+            columns
+                Screen width
+            rows
+                Screen height
+        """
+        self._columns = columns
+        self._rows = rows
+        self._txt = [[' '] * columns for i in range(rows)]
+        self._attr = [[VirtualScreen.SGR_RESET] * columns for i in range(rows)]
+        self._decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+
+        # Cursor position, and whether the next character wraps to the next line (written to the last column)
+        self._cursor_column = 0
+        self._cursor_row = 0
+        self._wrap_pending = False
+        self._cursor_visible = True
+        self._sgr = VirtualScreen.SGR_RESET
+        # Scroll region (top and bottom rows)
+        self._scroll_top = 0
+        self._scroll_bottom = rows - 1
+
+        # Parser state, and the parameters of the escape sequence being parsed
+        self._state = VirtualScreen.STATE_GROUND
+        self._params = ""
+
+        # Statistics
+        self.clears = 0
+        self.bytes = 0
+
+    def get_cursor(self):
+        """ Return the cursor position as (column, row) """
+        return (self._cursor_column, self._cursor_row)
+
+    def get_text(self):
+        """ Return the text on screen as a list of rows """
+        return [u"".join(row) for row in self._txt]
+
+    def get_cell(self, column, row):
+        """ Return a cell as (character, (bold, reverse, foreground, background)) """
+        return (self._txt[row][column], self._attr[row][column])
+
+    def feed(self, data):
+        """
+        Parse output sent to the terminal (bytes), returning whether anything on screen changed
+        """
+        self.bytes += len(data)
+        changed = False
+        for char in self._decoder.decode(data):
+            if self._state == VirtualScreen.STATE_GROUND:
+                if char >= ' ':
+                    changed |= self._put(char)
+                elif char == '\x1b':
+                    self._state = VirtualScreen.STATE_ESC
+                elif char == '\r':
+                    self._cursor_column = 0
+                    self._wrap_pending = False
+                elif char == '\n':
+                    changed |= self._line_feed()
+                elif char == '\b':
+                    self._cursor_column = max(0, self._cursor_column - 1)
+                    self._wrap_pending = False
+            elif self._state == VirtualScreen.STATE_ESC:
+                if char == '[':
+                    self._params = ""
+                    self._state = VirtualScreen.STATE_CSI
+                else:
+                    # Other escape sequences aren't used, so ignore them
+                    self._state = VirtualScreen.STATE_GROUND
+            elif self._state == VirtualScreen.STATE_CSI:
+                if '0' <= char <= '9' or char in ';?':
+                    self._params += char
+                else:
+                    changed |= self._csi(char, self._params)
+                    self._state = VirtualScreen.STATE_GROUND
+        return changed
+
+    def _put(self, char):
+        """
+        Write a character at the cursor, returning whether it changed the cell
+        """
+        if self._wrap_pending:
+            self._cursor_column = 0
+            self._line_feed()
+            self._wrap_pending = False
+        row = self._cursor_row
+        column = self._cursor_column
+        changed = self._txt[row][column] != char or self._attr[row][column] != self._sgr
+        self._txt[row][column] = char
+        self._attr[row][column] = self._sgr
+        if column == self._columns - 1:
+            self._wrap_pending = True
+        else:
+            self._cursor_column += 1
+        return changed
+
+    def _line_feed(self):
+        """
+        Move the cursor down, scrolling the scroll region at it's bottom, returning whether the screen changed
+        """
+        self._wrap_pending = False
+        if self._cursor_row == self._scroll_bottom:
+            self._insert_delete_lines(self._scroll_top, -1)
+            return True
+        if self._cursor_row < self._rows - 1:
+            self._cursor_row += 1
+        return False
+
+    def _insert_delete_lines(self, row, lines):
+        """
+        Insert blank lines at the given row (or delete them, if lines is negative) within the scroll region
+        """
+        bottom = self._scroll_bottom + 1
+        blank_txt = [[' '] * self._columns for i in range(abs(lines))]
+        blank_attr = [[self._sgr] * self._columns for i in range(abs(lines))]
+        if lines > 0:
+            self._txt[row:bottom] = (blank_txt + self._txt[row:bottom])[0:bottom-row]
+            self._attr[row:bottom] = (blank_attr + self._attr[row:bottom])[0:bottom-row]
+        else:
+            self._txt[row:bottom] = (self._txt[row:bottom] + blank_txt)[-lines:]
+            self._attr[row:bottom] = (self._attr[row:bottom] + blank_attr)[-lines:]
+
+    def _csi(self, command, params):
+        """
+        Handle a control sequence, returning whether the screen changed
+        """
+        private = params.startswith('?')
+        values = [int(value) if value else None for value in params.lstrip('?').split(';')]
+        first = values[0] if values[0] else 1
+        self._wrap_pending = False
+
+        if private:
+            if values[0] == 25:
+                self._cursor_visible = command == 'h'
+        elif command == 'H' or command == 'f':
+            row = first
+            column = values[1] if len(values) > 1 and values[1] else 1
+            self._cursor_row = min(row, self._rows) - 1
+            self._cursor_column = min(column, self._columns) - 1
+        elif command == 'A':
+            self._cursor_row = max(self._cursor_row - first, 0)
+        elif command == 'B':
+            self._cursor_row = min(self._cursor_row + first, self._rows - 1)
+        elif command == 'C':
+            self._cursor_column = min(self._cursor_column + first, self._columns - 1)
+        elif command == 'D':
+            self._cursor_column = max(self._cursor_column - first, 0)
+        elif command == 'J':
+            # Only the whole screen erase is used
+            if values[0] == 2:
+                self._txt = [[' '] * self._columns for i in range(self._rows)]
+                self._attr = [[self._sgr] * self._columns for i in range(self._rows)]
+                self.clears += 1
+                return True
+        elif command == 'K':
+            row = self._cursor_row
+            for column in range(self._cursor_column, self._columns):
+                self._txt[row][column] = ' '
+                self._attr[row][column] = self._sgr
+            return True
+        elif command == 'L':
+            if self._scroll_top <= self._cursor_row <= self._scroll_bottom:
+                self._insert_delete_lines(self._cursor_row, first)
+                return True
+        elif command == 'M':
+            if self._scroll_top <= self._cursor_row <= self._scroll_bottom:
+                self._insert_delete_lines(self._cursor_row, -first)
+                return True
+        elif command == 'r':
+            top = first
+            bottom = values[1] if len(values) > 1 and values[1] else self._rows
+            if top < bottom:
+                self._scroll_top = top - 1
+                self._scroll_bottom = min(bottom, self._rows) - 1
+            self._cursor_row = 0
+            self._cursor_column = 0
+        elif command == 'm':
+            self._sgr = self._sgr_apply(self._sgr, values)
+        return False
+
+    def _sgr_apply(self, sgr, values):
+        """
+        Return the attribute state after applying SGR parameters
+        """
+        bold, reverse, foreground, background = sgr
+        index = 0
+        while index < len(values):
+            value = values[index] or 0
+            if value == 0:
+                bold, reverse, foreground, background = VirtualScreen.SGR_RESET
+            elif value == 1:
+                bold = True
+            elif value == 22:
+                bold = False
+            elif value == 7:
+                reverse = True
+            elif value == 27:
+                reverse = False
+            elif 30 <= value <= 37:
+                foreground = value - 30
+            elif value == 39:
+                foreground = None
+            elif 40 <= value <= 47:
+                background = value - 40
+            elif value == 49:
+                background = None
+            elif value in (38, 48) and index + 2 < len(values) and values[index + 1] == 5:
+                # 256 colour palette
+                if value == 38:
+                    foreground = values[index + 2]
+                else:
+                    background = values[index + 2]
+                index += 2
+            index += 1
+        return (bold, reverse, foreground, background)
+
+# Main
+###############################################################################
+if __name__ == '__main__':
+    # Parse a few escape sequences, and show the screen they leave
+    screen = VirtualScreen(40, 6)
+    screen.feed(b"\x1b[2J\x1b[2;3HPytuino\x1b[4;3H\x1b[1;7mvirtual\x1b[0m screen\x1b[2;1H\x1b[1L")
+    for row in screen.get_text():
+        print(f"|{row}|")
+    print(f"Cursor: {screen.get_cursor()}	Bytes: {screen.bytes}")